@@ -1,21 +1,35 @@
 from flask import Flask, jsonify
+from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from app.config import Config
+from app.utils.logger import logger
 
 # 初始化数据库
 db = SQLAlchemy()
+login_manager = LoginManager()
 
 def create_app(config_class=Config):
     app = Flask(__name__, template_folder='templates')
     app.config.from_object(config_class)
 
-    # 初始化扩展
+    # 初始化扩展（引擎参数由配置生成）
+    from app.utils.db import add_db_indexes, close_read_session, configure_database, instrument_engines
+    configure_database(app)
     db.init_app(app)
+    app.teardown_appcontext(close_read_session)
+    login_manager.init_app(app)
+
+    from app.utils.cache import cache
+    cache.init_app(app)
 
     # 注册蓝图
     from app.api.routes import api
     app.register_blueprint(api, url_prefix='/api')
 
+    # 调度的任务在应用上下文中执行
+    from app.api.routes import task_scheduler
+    task_scheduler.init_app(app)
+
     # 添加根路由
     @app.route('/')
     def index():
@@ -25,8 +39,20 @@ def create_app(config_class=Config):
             'api_docs': '/api'
         })
 
-    # 创建数据库表
+    # 创建数据库表，并为已有的表补建索引
     with app.app_context():
+        instrument_engines(app)
         db.create_all()
+        try:
+            add_db_indexes()
+        except Exception as e:
+            # 索引只影响查询性能，补建失败不阻止启动，可稍后用flask create-indexes重试
+            logger.error(f"Failed to add database indexes: {str(e)}")
+
+    @app.cli.command('create-indexes')
+    def create_indexes():
+        """为已有数据库补建模型上声明的索引"""
+        created = add_db_indexes()
+        print(f"Created {len(created)} indexes: {', '.join(created)}" if created else "All indexes exist")
 
     return app
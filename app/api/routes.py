@@ -1,20 +1,43 @@
 # backend/app/api/routes.py
-from flask import Blueprint, request, jsonify, render_template
+import json
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, render_template, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.orm import load_only
 from app.services.automation_service import AutomationService
 from app.services.llm_service import LLMService
-from app.models.task import Task
+from app.services.retry_policy import RetryBudget
+from app.services.scheduler import DevicePool, TaskScheduler
+from app.services.task_prestart import TaskPrestart, predict_launch
+from app.services.task_queue import TaskQueue
+from app.services.execution_journal import ExecutionJournal
+from app.models.task import Task, TaskResult, TaskStatus
 from app.models.device import Device
 from app.models.user import User  # 添加User模型导入
 from app import db
-import asyncio
 from app.utils.logger import logger
-from app.utils.exceptions import TaskError, format_error_response
+from app.utils.exceptions import DeviceError, TaskError, format_error_response
+from app.config import Config
 from app.utils.auth import require_api_key, require_admin
+from app.utils.db import read_session
+from app.utils.http_client import LoopThread
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_rows
 
 api = Blueprint('api', __name__)
 automation_service = AutomationService()
 llm_service = LLMService()
+# 请求路径上的LLM调用在共享的后台事件循环上执行，跨请求复用连接池
+llm_loop = LoopThread('llm-requests')
+
+async def run_llm(func, *args, **kwargs):
+    """在共享的LLM事件循环上调用LLM服务（带应用上下文）并等待结果"""
+    app = current_app._get_current_object()
+
+    async def call():
+        with app.app_context():
+            return await func(*args, **kwargs)
+
+    return await llm_loop.run(call())
 
 # 添加根路由
 @api.route('/')
@@ -40,24 +63,64 @@ def health_check():
 async def create_task():
     try:
         data = request.json
-        device_id = data.get('device_id')
+        device_id = data.get('device_id')  # 不指定时由调度器选择满足要求的空闲设备
+        requirements = data.get('requirements') or {}
         input_type = data.get('input_type')
         input_content = data.get('input')
-
-        logger.info(f"Creating new task for device {device_id}",
+        # 流式规划：租到设备后边生成计划边执行，只支持文本输入
+        stream = bool(data.get('stream')) and input_type == 'text'
+        try:
+            priority = task_queue.priority_of(data.get('priority'))
+        except ValueError as e:
+            raise TaskError(str(e))
+
+        logger.info(f"Creating new task for device {device_id or 'any'}",
                    extra={'device_id': device_id})
 
-        if not device_id or not input_content:
+        if not input_content:
             raise TaskError("Missing required fields")
 
-        # 根据输入类型选择不同的处理方法
-        if input_type == 'text':
-            execution_plan = await llm_service.analyze_text_input(input_content)
-        elif input_type == 'audio':
-            execution_plan = await llm_service.analyze_audio_input(input_content)
+        # 同步设备池，并选出用于生成执行计划的设备
+        devices = Device.query.all()
+        task_scheduler.sync_devices(devices)
+        if device_id:
+            device = next((d for d in devices if d.device_id == device_id), None)
         else:
+            device = next((d for d in devices if DevicePool.matches(d.capabilities, requirements)), None)
+        if device is None:
+            raise TaskError("No device matches the task requirements")
+
+        if input_type not in ('text', 'audio'):
             raise TaskError("Invalid input type")
 
+        # 流式规划的计划在执行阶段边生成边执行
+        execution_plan = None
+        prestart = None
+        if not stream:
+            # 规划期间并行连接、预热空闲的设备（设备池状态在调度线程上读取）；
+            # 只有指定了设备时才按指令预测并提前启动应用，调度器可能把任务分给其他设备。
+            # 设备池只知道本进程租出的设备，独立worker进程执行中的任务要查队列。
+            # 预热在调度循环上运行，不随请求的事件循环结束
+            if (Config.TASK_PRESTART_ENABLED and task_scheduler.is_idle(device.device_id)
+                    and not task_queue.device_busy(device.device_id)):
+                package = None
+                if device_id and input_type == 'text':
+                    package = predict_launch(input_content, Config.APP_PACKAGES)
+                prestart = task_scheduler.call(TaskPrestart(
+                    automation_service, device.device_id, package, Config.TASK_PRESTART_TIMEOUT
+                ).start)
+
+            # 根据输入类型选择不同的处理方法
+            try:
+                if input_type == 'text':
+                    execution_plan = await run_llm(llm_service.analyze_text_input, input_content, device)
+                else:
+                    execution_plan = await run_llm(llm_service.analyze_audio_input, input_content)
+            except BaseException:
+                if prestart is not None:
+                    task_scheduler.spawn(prestart.abort())
+                raise
+
         # 创建任务
         task = Task(
             device_id=device_id,
@@ -66,15 +129,21 @@ async def create_task():
         )
         task.execution_steps = execution_plan
         db.session.add(task)
-        db.session.commit()
-
-        # 连接设备
-        device_connected = await automation_service.connect_device(device_id)
-        if not device_connected:
-            raise TaskError("Failed to connect to device")
-
-        # 开始执行任务
-        asyncio.create_task(execute_task(task.id))
+        db.session.flush()
+
+        # 预热的收尾（等待预热结束，计划与预测不一致时回滚）在后台进行，不阻塞响应；
+        # 本进程执行该任务前会等待其完成，独立worker进程则可能与之并行
+        if prestart is not None:
+            task_scheduler.prepare(task.id, prestart.reconcile(execution_plan))
+
+        # 任务和队列项在同一事务中提交；worker领取后交给调度器租用设备并执行
+        task_queue.enqueue(
+            task.id,
+            priority=priority,
+            user_id=current_user.id,
+            device_id=device_id,
+            requirements=requirements
+        )
 
         logger.info(f"Task {task.id} created successfully",
                    extra={'task_id': task.id, 'device_id': device_id})
@@ -89,6 +158,12 @@ async def create_task():
                     extra={'device_id': device_id if device_id else None})
         return jsonify(format_error_response(e)), 500
 
+@api.route('/tasks/queue', methods=['GET'])
+@login_required
+def get_task_queue():
+    """持久化任务队列按状态和优先级通道的统计"""
+    return jsonify(task_queue.get_stats())
+
 @api.route('/tasks/<int:task_id>', methods=['GET'])
 @login_required
 def get_task(task_id):
@@ -101,12 +176,84 @@ def get_task(task_id):
 @api.route('/tasks', methods=['GET'])
 @login_required
 def get_tasks():
-    # 普通用户只能看到自己的任务，管理员可以看到所有任务
-    if current_user.role == 'admin':
-        tasks = Task.query.all()
+    """分页列出任务
+
+    按(start_time, id)倒序做键集分页，未开始的任务排在最前；支持按状态、结果、设备、
+    时间范围过滤，fields指定返回字段（默认不含execution_steps和step_results）。
+    响应边查询边输出：{"items": [...], "next_cursor": "..."}，next_cursor为空表示没有下一页。
+    """
+    try:
+        query, fields, limit, cursor = _task_list_query(request.args)
+    except TaskError as e:
+        return jsonify(format_error_response(e)), 400
+
+    def generate():
+        yield '{"items": ['
+        last = None
+        for count, task in enumerate(keyset_rows(query, Task.start_time, Task.id, cursor, limit + 1)):
+            if count == limit:
+                # 多取的一行只用于判断是否还有下一页
+                yield '], "next_cursor": ' + json.dumps(encode_cursor(last.start_time, last.id)) + '}'
+                return
+            yield (',' if last is not None else '') + json.dumps(task.to_dict(fields), ensure_ascii=False)
+            last = task
+        yield '], "next_cursor": null}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def _task_list_query(args):
+    """解析任务列表的查询参数，返回(过滤后的查询, 字段, 每页条数, 游标)"""
+    limit = args.get('limit', Config.TASK_LIST_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, Config.TASK_LIST_MAX_LIMIT))
+
+    if args.get('fields'):
+        fields = [name.strip() for name in args['fields'].split(',') if name.strip()]
+        unknown = [name for name in fields if name not in Task.FIELDS]
+        if unknown:
+            raise TaskError(f"Unknown task fields: {', '.join(unknown)}")
     else:
-        tasks = Task.query.filter_by(user_id=current_user.id).all()
-    return jsonify([task.to_dict() for task in tasks])
+        fields = [name for name in Task.FIELDS if name not in Task.HEAVY_FIELDS]
+    # 游标需要id和start_time
+    columns = set(fields) | {'id', 'start_time'}
+    # 列表查询可以容忍复制延迟，配置了只读副本时查询副本
+    query = read_session().query(Task).options(load_only(*(getattr(Task, name) for name in columns)))
+
+    # 普通用户只能看到自己的任务，管理员可以看到所有任务并按用户过滤
+    if current_user.role != 'admin':
+        query = query.filter(Task.user_id == current_user.id)
+    elif args.get('user_id'):
+        query = query.filter(Task.user_id == args.get('user_id', type=int))
+
+    if args.get('status'):
+        query = query.filter(Task.status.in_(_parse_enums(TaskStatus, args['status'], 'status')))
+    if args.get('result'):
+        query = query.filter(Task.result.in_(_parse_enums(TaskResult, args['result'], 'result')))
+    if args.get('device_id'):
+        query = query.filter(Task.device_id == args['device_id'])
+    if args.get('since'):
+        query = query.filter(Task.start_time >= _parse_datetime(args['since'], 'since'))
+    if args.get('until'):
+        query = query.filter(Task.start_time < _parse_datetime(args['until'], 'until'))
+    cursor = None
+    if args.get('cursor'):
+        try:
+            cursor = decode_cursor(args['cursor'])
+        except ValueError as e:
+            raise TaskError(str(e))
+
+    return query, fields, limit, cursor
+
+def _parse_enums(enum, value: str, name: str):
+    try:
+        return [enum(item.strip()) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise TaskError(f"Invalid {name}: {value}")
+
+def _parse_datetime(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise TaskError(f"Invalid {name}: {value}")
 
 @api.route('/devices', methods=['GET'])
 @login_required
@@ -128,6 +275,12 @@ def get_devices():
         logger.error("Failed to get devices", exc_info=True)
         return jsonify(format_error_response(e)), 500
 
+@api.route('/devices/pool', methods=['GET'])
+@login_required
+def get_device_pool():
+    """设备池队列长度与利用率"""
+    return jsonify(task_scheduler.get_stats())
+
 @api.route('/devices/<string:device_id>', methods=['GET'])
 @login_required
 def get_device(device_id):
@@ -197,40 +350,93 @@ def update_user(user_id):
         logger.error(f"Failed to update user: {user_id}", exc_info=True)
         return jsonify(format_error_response(e)), 500
 
-async def execute_task(task_id):
-    """异步执行任务"""
+async def execute_task(task_id, device_id, can_failover=False):
+    """在调度器租用的设备上执行任务"""
     task = Task.query.get(task_id)
     if not task:
         return
 
-    try:
-        task.status = 'running'
-        db.session.commit()
+    # 步骤结果批量写入，剩余的结果与任务完成状态在同一次提交中写入
+    journal = ExecutionJournal(
+        task_id,
+        directory=Config.EXECUTION_JOURNAL_DIR,
+        batch_size=Config.EXECUTION_JOURNAL_BATCH_SIZE,
+        flush_interval=Config.EXECUTION_JOURNAL_FLUSH_INTERVAL
+    )
 
-        for step in task.execution_steps:
-            success = await automation_service.execute_action(
-                task.device_id, 
-                step
-            )
-            if not success:
-                raise Exception(f"Failed to execute step: {step}")
+    def finish(result, error_message=None):
+        if task.start_time is None:
+            task.start_execution(commit=False)
+        journal.flush(commit=False)
+        task.complete_execution(result, error_message)
+
+    try:
+        # 连接失败时如果还能转移，任务保持等待状态交回调度器
+        await automation_service.connect_device(device_id)
+
+        task.device_id = device_id
+        task.start_execution()
+
+        retry_budget = RetryBudget(Config.TASK_RETRY_BUDGET)
+        try:
+            if task.execution_steps is None:
+                # 流式规划：第一步的执行与后续步骤的生成重叠，计划完整生成后才保存
+                device = Device.query.filter_by(device_id=device_id).first()
+                plan = []
+                await automation_service.execute_stream(
+                    device_id,
+                    llm_service.stream_text_input(task.user_input, device, task.context_id),
+                    retry_budget,
+                    plan,
+                    step_hook=journal.record
+                )
+                task.execution_steps = plan
+            else:
+                await automation_service.execute_plan(
+                    device_id, task.execution_steps, retry_budget, step_hook=journal.record
+                )
+        finally:
+            # 转移到其他设备重新执行时累加
+            task.retry_count = (task.retry_count or 0) + retry_budget.retries
+
+        finish(TaskResult.SUCCESS)
 
-        task.status = 'completed'
-        task.result = {'success': True}
-        db.session.commit()
-        
         logger.info(f"Task {task_id} completed successfully",
-                   extra={'task_id': task_id})
+                   extra={'task_id': task_id, 'device_id': device_id})
+
+    except DeviceError as e:
+        if can_failover:
+            raise
+        finish(TaskResult.DEVICE_ERROR, str(e))
+        logger.error(f"Task {task_id} failed on device {device_id}: {str(e)}",
+                    exc_info=True, extra={'task_id': task_id, 'device_id': device_id})
+        raise
 
     except Exception as e:
-        task.status = 'failed'
-        task.result = {'error': str(e)}
-        db.session.commit()
-        
+        finish(TaskResult.FAILURE, str(e))
+
         logger.error(f"Task {task_id} failed: {str(e)}",
                     exc_info=True, extra={'task_id': task_id})
 
-<<<<<<< HEAD
+    finally:
+        journal.close()
+
+device_pool = DevicePool(
+    max_concurrent_tasks=Config.SCHEDULER_MAX_CONCURRENT_TASKS,
+    max_tasks_per_user=Config.SCHEDULER_MAX_TASKS_PER_USER,
+    unhealthy_cooldown=Config.SCHEDULER_DEVICE_COOLDOWN
+)
+task_scheduler = TaskScheduler(
+    device_pool,
+    execute_task,
+    max_failovers=Config.SCHEDULER_MAX_FAILOVERS
+)
+task_queue = TaskQueue(
+    visibility_timeout=Config.TASK_QUEUE_VISIBILITY_TIMEOUT,
+    max_attempts=Config.TASK_QUEUE_MAX_ATTEMPTS,
+    priorities=Config.TASK_QUEUE_PRIORITIES
+)
+
 @api.route('/test')
 def test_page():
     return render_template('test.html')
@@ -238,93 +444,28 @@ def test_page():
 @api.route('/test/llm', methods=['POST'])
 @login_required
 async def test_llm():
-=======
-# 自动化测试
-@api.route('/test/auto', methods=['POST'])
-async def create_task_test(task_data):
-    # 模拟调用 create_task 接口
-    from flask import Flask, request
-    app = Flask(__name__)
-    with app.test_request_context('/tasks', method='POST', json=task_data):
-        response = await create_task()
-        return response.get_json()
-    
-def get_task_test(task_id):
-    # 模拟调用 get_task 接口
-    from flask import Flask, request
-    app = Flask(__name__)
-    with app.test_request_context(f'/tasks/{task_id}', method='GET'):
-        response = get_task(task_id)
-        return response.get_json()
-
-async def wait_for_task_completion(task_id, timeout=30):
-    import time
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        task = Task.query.get(task_id)
-        if task.status in ['completed', 'failed']:
-            break
-        await asyncio.sleep(1)
-    else:
-        raise TimeoutError(f"Task {task_id} did not complete within {timeout} seconds")
-async def test_auto():
->>>>>>> 6c147b24167bdfa1032c9398fdff06cd64a5fc9d
     try:
         data = request.json
         device_id = data.get('device_id')
-        input_type = data.get('input_type', 'text')  # 默认为文本输入
         text_input = data.get('input')
-<<<<<<< HEAD
-        
+
         if not text_input:
             return jsonify({'error': 'No input provided'}), 400
-            
-        # 调用LLM服务
-        execution_steps = await llm_service.analyze_text_input(text_input)
-        
-=======
 
-        # 检查必要参数
-        if not device_id or not text_input:
-            return jsonify({'error': 'Missing required fields'}), 400
-
-        # 创建任务
-        task_data = {
-            'device_id': device_id,
-            'input_type': input_type,
-            'input': text_input
-        }
-        create_response = await create_task_test(task_data)
+        # 未指定设备时使用任意已登记的设备生成计划
+        query = Device.query.filter_by(device_id=device_id) if device_id else Device.query
+        device = query.first()
+        if device is None:
+            return jsonify({'error': 'No device available'}), 400
 
-        # 检查任务是否创建成功
-        if create_response.get('status') != 'pending':
-            return jsonify({
-                'error': 'Failed to create task',
-                'response': create_response
-            }), 500
-
-        task_id = create_response.get('task_id')
-
-        # 等待任务执行完成
-        await wait_for_task_completion(task_id)
-
-        # 获取任务结果
-        task_result = get_task_test(task_id)
+        # 调用LLM服务
+        execution_steps = await run_llm(llm_service.analyze_text_input, text_input, device)
 
->>>>>>> 6c147b24167bdfa1032c9398fdff06cd64a5fc9d
         return jsonify({
             'status': 'success',
-            'task_id': task_id,
-            'result': task_result
+            'execution_steps': execution_steps
         })
 
     except Exception as e:
-<<<<<<< HEAD
         logger.error("LLM test failed", exc_info=True)
         return jsonify(format_error_response(e)), 500
-=======
-        return jsonify({
-            'error': str(e),
-            'status': 'error'
-        }), 500
->>>>>>> 6c147b24167bdfa1032c9398fdff06cd64a5fc9d
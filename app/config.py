@@ -12,30 +12,152 @@ class Config:
     
     # SQLAlchemy设置
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # 建议保持False以提高性能
+
+    # 数据库连接池，create_app据此生成引擎参数（见app/utils/db.py）
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # 常驻连接数
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))  # 高峰时可额外创建的连接数
+    DB_POOL_TIMEOUT = 30  # 等待空闲连接的超时(秒)
+    DB_POOL_RECYCLE = 1800  # 连接最长使用时间(秒)，避免使用被数据库端关闭的连接
+    DB_SQLITE_BUSY_TIMEOUT = 5000  # SQLite等待写锁的时间(毫秒)
+    # 只读副本，任务列表和统计查询使用；为空时这些查询也走主库
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
     
     # 阿里云百炼API配置（已提供）
-    DASHSCOPE_API_KEY = 'sk-4a6e5901c20f43139c2c84d8e9bd50f2'
+    DASHSCOPE_API_KEY = os.environ.get('DASHSCOPE_API_KEY', 'sk-4a6e5901c20f43139c2c84d8e9bd50f2')
+    # 可指向本地的模拟服务（见tests/fakes），用于基准测试
+    DASHSCOPE_BASE_URL = os.environ.get('DASHSCOPE_BASE_URL', 'https://dashscope.aliyuncs.com').rstrip('/')
+    TEXT_GENERATION_PATH = '/api/v1/services/aigc/text-generation/generation'
+    MULTIMODAL_GENERATION_PATH = '/api/v1/services/aigc/multimodal-generation/generation'
     
     # 模型配置
     MODELS = {
         'text': {
             'name': 'qwen-plus',
-            'api_url': 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'
+            'api_url': DASHSCOPE_BASE_URL + TEXT_GENERATION_PATH
         },
         'vision': {
             'name': 'qwen-vl-max',
-            'api_url': 'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation'
+            'api_url': DASHSCOPE_BASE_URL + MULTIMODAL_GENERATION_PATH
         },
         'ocr': {
             'name': 'qwen-vl-ocr',
-            'api_url': 'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation'
+            'api_url': DASHSCOPE_BASE_URL + MULTIMODAL_GENERATION_PATH
         },
         'audio': {
             'name': 'qwen-audio-turbo',
-            'api_url': 'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation'
+            'api_url': DASHSCOPE_BASE_URL + MULTIMODAL_GENERATION_PATH
         }
     }
     
+    # LLM响应缓存配置（L2），无Redis时可使用SimpleCache或FileSystemCache
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'RedisCache')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/1')
+    CACHE_DIR = os.environ.get('CACHE_DIR', 'instance/cache')  # FileSystemCache使用
+    CACHE_DEFAULT_TIMEOUT = 300
+
+    # 进程内L1缓存
+    LLM_CACHE_L1_MAXSIZE = 1024  # 最大条目数
+    LLM_CACHE_L1_TTL = 120  # 条目最长存活时间(秒)
+    LLM_CACHE_COMPRESS_LEVEL = 6  # L2值的zlib压缩级别
+
+    # LLM HTTP连接池配置
+    LLM_HTTP_POOL_LIMIT = 100  # 连接池总连接数上限
+    LLM_HTTP_POOL_LIMIT_PER_HOST = 20  # 单个主机的连接数上限
+    LLM_HTTP_KEEPALIVE_TIMEOUT = 30  # 空闲连接保活时间(秒)
+    LLM_HTTP_DNS_CACHE_TTL = 300  # DNS缓存时间(秒)
+    LLM_HTTP_CONNECT_TIMEOUT = 5  # 建立连接超时(秒)
+    LLM_HTTP_READ_TIMEOUT = 60  # 读取响应超时(秒)
+
+    # 设备I/O线程池大小（所有设备共享，每台设备内部串行）
+    DEVICE_IO_MAX_WORKERS = 32
+
+    # 任务调度配置
+    SCHEDULER_MAX_CONCURRENT_TASKS = int(os.environ.get('SCHEDULER_MAX_CONCURRENT_TASKS', 64))  # 全局同时执行的任务数
+    SCHEDULER_MAX_TASKS_PER_USER = int(os.environ.get('SCHEDULER_MAX_TASKS_PER_USER', 5))  # 单用户同时执行的任务数
+    SCHEDULER_MAX_FAILOVERS = 2  # 设备故障时最多转移的次数
+    SCHEDULER_DEVICE_COOLDOWN = 60  # 故障设备重新参与分配前的冷却时间(秒)
+
+    # 持久化任务队列配置
+    TASK_QUEUE_VISIBILITY_TIMEOUT = 120  # 领取后多久未续期视为worker已失联(秒)
+    TASK_QUEUE_MAX_ATTEMPTS = 3  # 因worker失联被重新领取的最多次数
+    TASK_QUEUE_POLL_INTERVAL = 1.0  # 空闲时轮询队列的间隔(秒)
+    TASK_QUEUE_PRIORITIES = {'high': 10, 'normal': 0, 'low': -10}  # 优先级通道
+    TASK_WORKER_CONCURRENCY = int(os.environ.get('TASK_WORKER_CONCURRENCY', 8))  # 每个worker同时执行的任务数
+    # 是否在Web进程内运行worker；通过worker.py单独部署worker时设为0
+    TASK_QUEUE_INLINE_WORKER = os.environ.get('TASK_QUEUE_INLINE_WORKER', '1') == '1'
+
+    # 任务列表分页
+    TASK_LIST_DEFAULT_LIMIT = 50
+    TASK_LIST_MAX_LIMIT = 200
+
+    # 步骤结果写后日志配置
+    EXECUTION_JOURNAL_DIR = os.environ.get('EXECUTION_JOURNAL_DIR', 'instance/journal')  # 本地日志目录，为空时不写日志文件
+    EXECUTION_JOURNAL_BATCH_SIZE = 20  # 缓冲多少条结果后批量写入
+    EXECUTION_JOURNAL_FLUSH_INTERVAL = 2.0  # 距上次写入超过该时间(秒)时写入
+
+    # 任务启动流水线：LLM规划期间并行连接、预热设备，并按预测提前启动应用
+    TASK_PRESTART_ENABLED = True
+    TASK_PRESTART_TIMEOUT = 15  # 规划完成后最多再等待预热的时间(秒)
+    APP_PACKAGES = {  # 指令中的应用名 -> 包名，用于预测计划的第一步launch_app
+        '微信': 'com.tencent.mm',
+        '支付宝': 'com.eg.android.AlipayGphone',
+        '淘宝': 'com.taobao.taobao',
+        '设置': 'com.android.settings',
+        '浏览器': 'com.android.browser',
+        '相机': 'com.android.camera'
+    }
+
+    # 视觉请求截图配置
+    SCREENSHOT_MAX_EDGE = 1280  # 长边缩放上限(像素)，0表示不缩放
+    SCREENSHOT_FORMAT = 'JPEG'  # JPEG/WEBP/PNG
+    SCREENSHOT_QUALITY = 80  # JPEG/WEBP编码质量
+
+    # 视觉定位屏幕缓存配置
+    SCREEN_CACHE_HASH_SIZE = 16  # dHash边长，哈希位数为其平方
+    SCREEN_CACHE_MAX_DISTANCE = 8  # 视为同一屏幕的最大汉明距离
+    SCREEN_CACHE_MAX_SCREENS = 32  # 每台设备保留的屏幕状态数
+    SCREEN_CACHE_TTL = 300  # 屏幕状态缓存时间(秒)
+
+    # 控件索引配置
+    HIERARCHY_INDEX_TTL = 5  # 无操作时控件索引的最长复用时间(秒)
+    HIERARCHY_FUZZY_MIN_SCORE = 0.6  # 模糊匹配的最低相似度
+    HIERARCHY_FUZZY_MARGIN = 0.1  # 模糊匹配须领先其他候选的相似度差值
+
+    # 屏幕变化通知配置
+    SCREEN_WATCH_INTERVAL = 0.2  # 轮询窗口摘要的最小间隔(秒)
+    SCREEN_SETTLE_TIME = 0.4  # 摘要保持不变多久视为界面稳定(秒)
+    SCREEN_SETTLE_TIMEOUT = 3  # 滑动等操作后等待界面稳定的上限(秒)
+    LOOP_MAX_IDLE_ITERATIONS = 2  # until循环中屏幕连续无变化的最多次数
+
+    # 分层元素定位配置
+    LOCATOR_TIER_BUDGETS = {  # 每层的时间预算(秒)，None表示不限
+        'cache': None,
+        'hierarchy': 3,
+        'ocr': 8,
+        'vision': 45
+    }
+    LOCATOR_OCR_MAX_EDGE = 960  # OCR裁剪图的长边上限(像素)
+    VISION_BATCH_MAX_TARGETS = 4  # 一次视觉请求最多定位的目标数（含当前目标）
+
+    # 动作重试策略（只作用于基础动作，组合动作不重试）
+    RETRY_DEFAULT_POLICY = {
+        'max_attempts': 3,
+        'base_delay': 0.5,  # 第一次重试前的等待(秒)，之后按multiplier倍增
+        'max_delay': 8.0,
+        'multiplier': 2.0,
+        'jitter': 0.5
+    }
+    RETRY_ACTION_POLICIES = {  # 按动作类型覆盖默认策略
+        'assert': {'max_attempts': 1},  # 断言不成立是结果而不是故障
+        'wait': {'max_attempts': 1},  # 等待动作自带超时
+        'launch_app': {'base_delay': 1.0}
+    }
+    RETRY_ERROR_POLICIES = {  # 按异常类名覆盖，优先于动作类型
+        'DeviceError': {'max_attempts': 1},  # 设备故障交给调度器转移
+        'LLMError': {'max_attempts': 2, 'base_delay': 2.0}
+    }
+    TASK_RETRY_BUDGET = 120  # 每个任务的重试时间预算(秒)，超出后不再重试
+
     WEBSOCKET_PORT = 8765
 
     # 安全相关配置
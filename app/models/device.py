@@ -3,6 +3,8 @@ from datetime import datetime
 from app import db
 from dataclasses import dataclass
 from typing import Dict, Optional
+import hashlib
+import json
 
 class DeviceType(Enum):
     """设备类型"""
@@ -41,8 +43,12 @@ class DeviceCapability:
 
 class Device(db.Model):
     """设备模型"""
+    __table_args__ = (
+        db.Index('ix_device_status', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    device_id = db.Column(db.String(64), unique=True, nullable=False)
+    device_id = db.Column(db.String(64), unique=True, nullable=False)  # 唯一约束自带索引
     name = db.Column(db.String(64))
     type = db.Column(db.Enum(DeviceType), default=DeviceType.UNKNOWN)
     status = db.Column(db.Enum(DeviceStatus), default=DeviceStatus.OFFLINE)
@@ -104,6 +110,16 @@ class Device(db.Model):
             "capabilities": self.capabilities
         }
 
+    def capability_fingerprint(self) -> str:
+        """生成设备能力指纹，同型号、同状态的设备指纹相同"""
+        payload = json.dumps({
+            'type': getattr(self.type, 'value', self.type),
+            'status': getattr(self.status, 'value', self.status),
+            'platform_version': self.platform_version,
+            'capabilities': self.capabilities
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
     def to_dict(self) -> Dict:
         """转换为字典格式"""
         return {
@@ -1,7 +1,8 @@
 from enum import Enum
 from datetime import datetime
 from app import db
-from typing import Dict, List, Optional
+from sqlalchemy import func
+from typing import Dict, List, Optional, Sequence
 import json
 
 class TaskStatus(Enum):
@@ -21,6 +22,17 @@ class TaskResult(Enum):
 
 class Task(db.Model):
     """任务模型"""
+    __table_args__ = (
+        # 任务列表按(start_time, id)键集分页，按用户、设备过滤时使用对应的前缀索引
+        db.Index('ix_task_start_time_id', 'start_time', 'id'),
+        db.Index('ix_task_user_start_time_id', 'user_id', 'start_time', 'id'),
+        db.Index('ix_task_device_start_time_id', 'device_id', 'start_time', 'id'),
+        # 同一上下文的任务按开始时间排列（get_tasks_by_context）
+        db.Index('ix_task_context_start_time', 'context_id', 'start_time'),
+        # 提示词优化按结束时间取最近的任务
+        db.Index('ix_task_end_time', 'end_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     device_id = db.Column(db.String(64), db.ForeignKey('device.device_id'))
@@ -34,7 +46,7 @@ class Task(db.Model):
     start_time = db.Column(db.DateTime)
     end_time = db.Column(db.DateTime)
     execution_duration = db.Column(db.Float)  # 秒
-    step_results = db.Column(db.JSON)  # 每个步骤的执行结果
+    step_results = db.Column(db.JSON)  # 每个步骤的执行结果（旧数据），新结果写入TaskStepResult
     retry_count = db.Column(db.Integer, default=0)
     
     # 上下文信息
@@ -46,11 +58,20 @@ class Task(db.Model):
     llm_token_count = db.Column(db.Integer)  # 使用的token数量
     prompt_template = db.Column(db.String(32))  # 使用的提示词模板
 
-    def start_execution(self):
+    # 步骤结果子表，只追加
+    steps = db.relationship(
+        'TaskStepResult',
+        order_by='TaskStepResult.seq',
+        lazy='dynamic',
+        cascade='all, delete-orphan'
+    )
+
+    def start_execution(self, commit: bool = True):
         """开始执行任务"""
         self.status = TaskStatus.RUNNING
         self.start_time = datetime.utcnow()
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
     def complete_execution(self, result: TaskResult, error_message: str = None):
         """完成任务执行"""
@@ -62,39 +83,77 @@ class Task(db.Model):
         db.session.commit()
 
     def record_step_result(self, step_index: int, success: bool, error: str = None):
-        """记录步骤执行结果"""
-        if not self.step_results:
-            self.step_results = []
-            
-        self.step_results.append({
-            'step_index': step_index,
-            'success': success,
-            'error': error,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        """记录步骤执行结果（追加一行，不重写已有结果；批量写入见ExecutionJournal）"""
+        seq = db.session.query(func.max(TaskStepResult.seq)).filter_by(task_id=self.id).scalar()
+        db.session.add(TaskStepResult(
+            task_id=self.id,
+            seq=(seq or 0) + 1,
+            step_index=step_index,
+            success=success,
+            error=error
+        ))
         db.session.commit()
 
-    def to_dict(self) -> Dict:
-        """转换为字典格式"""
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'device_id': self.device_id,
-            'user_input': self.user_input,
-            'execution_steps': self.execution_steps,
-            'status': self.status.value,
-            'result': self.result.value if self.result else None,
-            'error_message': self.error_message,
-            'start_time': self.start_time.isoformat() if self.start_time else None,
-            'end_time': self.end_time.isoformat() if self.end_time else None,
-            'execution_duration': self.execution_duration,
-            'step_results': self.step_results,
-            'retry_count': self.retry_count,
-            'context_id': self.context_id,
-            'previous_task_id': self.previous_task_id
-        }
+    def get_step_results(self) -> List[Dict]:
+        """按记录顺序返回步骤结果，兼容旧的JSON列"""
+        results = [step.to_dict() for step in self.steps]
+        return results or (self.step_results or [])
+
+    # to_dict各字段的取值函数，列表接口按fields只计算（和加载）需要的字段
+    FIELDS = {
+        'id': lambda task: task.id,
+        'user_id': lambda task: task.user_id,
+        'device_id': lambda task: task.device_id,
+        'user_input': lambda task: task.user_input,
+        'execution_steps': lambda task: task.execution_steps,
+        'status': lambda task: task.status.value,
+        'result': lambda task: task.result.value if task.result else None,
+        'error_message': lambda task: task.error_message,
+        'start_time': lambda task: task.start_time.isoformat() if task.start_time else None,
+        'end_time': lambda task: task.end_time.isoformat() if task.end_time else None,
+        'execution_duration': lambda task: task.execution_duration,
+        'step_results': lambda task: task.get_step_results(),
+        'retry_count': lambda task: task.retry_count,
+        'context_id': lambda task: task.context_id,
+        'previous_task_id': lambda task: task.previous_task_id
+    }
+    # 列表默认不返回的大字段
+    HEAVY_FIELDS = ('execution_steps', 'step_results')
+
+    def to_dict(self, fields: Optional[Sequence[str]] = None) -> Dict:
+        """转换为字典格式，fields指定时只包含这些字段"""
+        return {name: self.FIELDS[name](self) for name in (fields or self.FIELDS)}
 
     @staticmethod
     def get_tasks_by_context(context_id: str) -> List['Task']:
         """获取同一上下文的所有任务"""
         return Task.query.filter_by(context_id=context_id).order_by(Task.start_time).all()
+
+class TaskStepResult(db.Model):
+    """任务步骤的执行结果，按任务内序号只追加"""
+    __tablename__ = 'task_step_result'
+    __table_args__ = (
+        # 日志重放按(任务, 序号)去重
+        db.UniqueConstraint('task_id', 'seq', name='uq_task_step_result_seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, index=True)
+    seq = db.Column(db.Integer, nullable=False)  # 任务内的记录序号，重新执行时继续递增
+    step_index = db.Column(db.Integer, nullable=False)  # 在执行计划中的位置
+    action = db.Column(db.String(32))
+    success = db.Column(db.Boolean, nullable=False)
+    error = db.Column(db.Text)
+    duration = db.Column(db.Float)  # 秒
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self) -> Dict:
+        """转换为字典格式（与旧的step_results条目一致）"""
+        return {
+            'step_index': self.step_index,
+            'action': self.action,
+            'success': self.success,
+            'error': self.error,
+            'duration': self.duration,
+            'timestamp': self.created_at.isoformat() if self.created_at else None
+        }
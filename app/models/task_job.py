@@ -0,0 +1,57 @@
+from enum import Enum
+from datetime import datetime
+from app import db
+from typing import Dict
+
+class JobStatus(Enum):
+    """队列任务状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class TaskJob(db.Model):
+    """持久化任务队列中的一项，worker领取后在可见性超时前需要续期"""
+    __tablename__ = 'task_job'
+    __table_args__ = (
+        # 领取时按状态过滤、按优先级和入队顺序排序
+        db.Index('ix_task_job_claim', 'status', 'priority', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, unique=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # 数值越大越先执行
+    status = db.Column(db.Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+
+    # 调度参数
+    user_id = db.Column(db.Integer)
+    device_id = db.Column(db.String(64))  # 为空时由调度器选择满足要求的设备
+    requirements = db.Column(db.JSON)
+
+    # 领取与重试
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 被领取的次数
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 之前不会被领取
+    locked_by = db.Column(db.String(128))  # 领取该任务的worker
+    locked_until = db.Column(db.DateTime)  # 可见性超时，过期后视为worker已失联
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> Dict:
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'priority': self.priority,
+            'status': self.status.value,
+            'device_id': self.device_id,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'locked_by': self.locked_by,
+            'locked_until': self.locked_until.isoformat() if self.locked_until else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
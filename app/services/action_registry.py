@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from types import MethodType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.services.plan_compiler import ActionNode
+
+@dataclass
+class ActionDefinition:
+    """一种动作的参数定义、处理函数和开销信息"""
+    type: Any  # ActionType
+    description: str
+    params: Dict = field(default_factory=dict)
+    composite: bool = False  # 参数中包含子动作，处理函数接收设备ID
+    changes_screen: bool = False  # 执行后必然切换到其他屏幕
+    exclusive: bool = True  # 需要独占设备触控/输入，不能与同一设备上的其他手势交错
+    cost: float = 0.5  # 典型耗时(秒)，用于估算计划执行时间
+    handler: Optional[Callable] = None  # AutomationService上未绑定的处理方法
+
+class ActionRegistry:
+    """动作注册表：提示词目录、计划校验和执行分派共用同一份定义"""
+
+    def __init__(self):
+        self._definitions: Dict[Any, ActionDefinition] = {}
+        # 提示词模板和校验器使用的动作目录，注册时同步更新
+        self.catalogue: Dict[Any, Dict] = {}
+
+    def register(self, action_type, description: str, params: Optional[Dict] = None, **options) -> ActionDefinition:
+        """注册动作定义"""
+        definition = ActionDefinition(action_type, description, params or {}, **options)
+        self._definitions[action_type] = definition
+        self.catalogue[action_type] = {'description': description, 'params': definition.params}
+        return definition
+
+    def handler(self, action_type) -> Callable:
+        """装饰器：把AutomationService的方法登记为动作的处理函数"""
+        def decorator(fn):
+            self._definitions[action_type].handler = fn
+            return fn
+        return decorator
+
+    def __getitem__(self, action_type) -> ActionDefinition:
+        return self._definitions[action_type]
+
+    def __contains__(self, action_type) -> bool:
+        return action_type in self._definitions
+
+    def __iter__(self) -> Iterator[ActionDefinition]:
+        return iter(self._definitions.values())
+
+    @property
+    def composite_types(self) -> Tuple:
+        return tuple(d.type for d in self if d.composite)
+
+    def bind(self, instance) -> Dict[Any, Callable]:
+        """生成动作类型到已绑定处理方法的分派表"""
+        missing = [d.type.value for d in self if d.handler is None]
+        if missing:
+            raise RuntimeError(f"Actions without handler: {', '.join(missing)}")
+        return {d.type: MethodType(d.handler, instance) for d in self}
+
+    def is_exclusive(self, node: ActionNode) -> bool:
+        """动作是否需要独占设备：组合动作只要包含独占的子动作即为独占"""
+        definition = self._definitions[node.type]
+        if not definition.composite:
+            return definition.exclusive
+        return any(self.is_exclusive(child) for child in _children(node))
+
+    def estimate(self, nodes: Sequence[ActionNode]) -> float:
+        """按各动作的典型耗时估算编译后计划的执行时间(秒)"""
+        total = 0.0
+        for node in nodes:
+            children = _children(node)
+            if not children:
+                total += self._definitions[node.type].cost
+            elif node.params.get('times'):
+                # 固定次数的循环
+                total += node.params['times'] * self.estimate(children)
+            else:
+                total += self.estimate(children)
+        return total
+
+def _children(node: ActionNode) -> List[ActionNode]:
+    """组合动作参数中的子动作节点"""
+    children = []
+    for value in node.params.values():
+        # ActionNode本身也是元组，需先判断
+        if isinstance(value, ActionNode):
+            children.append(value)
+        elif isinstance(value, tuple):
+            children.extend(child for child in value if isinstance(child, ActionNode))
+    return children
@@ -3,35 +3,22 @@ import uiautomator2 as u2
 from app.utils.logger import logger
 from app.utils.exceptions import DeviceError, AutomationError
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
 from dataclasses import dataclass
-from functools import wraps
 import asyncio
-import base64
-from io import BytesIO
-from PIL import Image
-from app.services.llm_service import LLMService
-from app.utils.cache import cache_llm_response
-
-# 重试装饰器
-def retry_on_error(max_retries=3, delay=1):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    logger.warning(
-                        f"Action failed (attempt {attempt + 1}/{max_retries}): {str(e)}"
-                    )
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(delay)
-            raise last_error
-        return wrapper
-    return decorator
+import time
+from collections import deque
+from app.services.screen_cache import ScreenStateCache, dhash
+from app.services.screenshot import CapturedScreen, ScreenshotPipeline
+from app.services.device_io import DeviceIO
+from app.services.hierarchy_index import ElementMatch, HierarchyCache, HierarchyIndex
+from app.services.locator import ElementLocator
+from app.services.action_registry import ActionRegistry
+from app.services.plan_compiler import ActionNode, PlanCompiler
+from app.services.retry_policy import RetryBudget, RetryEngine, current_budget, error_chain
+from app.services.screen_watcher import ScreenWatcher
+from app.utils.monitoring import action_latency, hierarchy_lookups, vision_batch_targets
+from app.config import Config
 
 class ActionType(Enum):
     """扩展的自动化动作类型"""
@@ -74,232 +61,437 @@ class ActionParam:
     default: Optional[Union[str, int, float, bool, list, dict]] = None
     validator: Optional[callable] = None
 
-# 扩展的动作定义
-AVAILABLE_ACTIONS = {
-    ActionType.CLICK: {
-        "description": "点击指定元素",
-        "params": {
-            "target": ActionParam(
-                name="target",
-                type=str,
-                description="目标元素文本/ID/坐标"
-            ),
-            "timeout": ActionParam(
-                name="timeout",
-                type=int,
-                required=False,
-                description="等待元素超时时间(秒)",
-                default=10
-            ),
-            "retry": ActionParam(
-                name="retry",
-                type=bool,
-                required=False,
-                description="是否启用重试机制",
-                default=True
-            )
-        }
+# 动作注册表：参数定义、处理函数和开销信息
+ACTION_REGISTRY = ActionRegistry()
+
+ACTION_REGISTRY.register(
+    ActionType.CLICK,
+    "点击指定元素",
+    params={
+        "target": ActionParam(
+            name="target",
+            type=str,
+            description="目标元素文本/ID/坐标"
+        ),
+        "timeout": ActionParam(
+            name="timeout",
+            type=int,
+            required=False,
+            description="等待元素超时时间(秒)",
+            default=10
+        ),
+        "retry": ActionParam(
+            name="retry",
+            type=bool,
+            required=False,
+            description="是否启用重试机制",
+            default=True
+        )
     },
-    
-    ActionType.INPUT: {
-        "description": "输入文本",
-        "params": {
-            "text": ActionParam(
-                name="text",
-                type=str,
-                description="要输入的文本"
-            ),
-            "clear": ActionParam(
-                name="clear",
-                type=bool,
-                required=False,
-                description="是否先清空输入框",
-                default=True
-            )
-        }
+    cost=1.0
+)
+
+ACTION_REGISTRY.register(
+    ActionType.INPUT,
+    "输入文本",
+    params={
+        "text": ActionParam(
+            name="text",
+            type=str,
+            description="要输入的文本"
+        ),
+        "clear": ActionParam(
+            name="clear",
+            type=bool,
+            required=False,
+            description="是否先清空输入框",
+            default=True
+        )
     },
-    
-    ActionType.SWIPE: {
-        "description": "滑动屏幕",
-        "params": {
-            "direction": ActionParam(
-                name="direction",
-                type=str,
-                description="滑动方向(up/down/left/right)"
-            ),
-            "duration": ActionParam(
-                name="duration",
-                type=float,
-                required=False,
-                description="滑动持续时间(秒)",
-                default=0.5
-            )
-        }
+    cost=0.5
+)
+
+ACTION_REGISTRY.register(
+    ActionType.SWIPE,
+    "滑动屏幕",
+    params={
+        "direction": ActionParam(
+            name="direction",
+            type=str,
+            description="滑动方向(up/down/left/right)"
+        ),
+        "duration": ActionParam(
+            name="duration",
+            type=float,
+            required=False,
+            description="滑动持续时间(秒)",
+            default=0.5
+        )
     },
-    
-    ActionType.LAUNCH_APP: {
-        "description": "启动应用",
-        "params": {
-            "package": ActionParam(
-                name="package",
-                type=str,
-                description="应用包名"
-            ),
-            "wait_activity": ActionParam(
-                name="wait_activity",
-                type=str,
-                required=False,
-                description="等待出现的Activity名称"
-            )
-        }
+    changes_screen=True, cost=0.8
+)
+
+ACTION_REGISTRY.register(
+    ActionType.LAUNCH_APP,
+    "启动应用",
+    params={
+        "package": ActionParam(
+            name="package",
+            type=str,
+            description="应用包名"
+        ),
+        "wait_activity": ActionParam(
+            name="wait_activity",
+            type=str,
+            required=False,
+            description="等待出现的Activity名称"
+        )
     },
-    
-    ActionType.WAIT: {
-        "description": "等待元素出现或指定时间",
-        "params": {
-            "target": ActionParam(
-                name="target",
-                type=str,
-                required=False,
-                description="等待的元素"
-            ),
-            "timeout": ActionParam(
-                name="timeout",
-                type=int,
-                required=False,
-                description="等待时间(秒)",
-                default=10
-            )
-        }
+    changes_screen=True, cost=2.0
+)
+
+ACTION_REGISTRY.register(
+    ActionType.WAIT,
+    "等待元素出现或指定时间",
+    params={
+        "target": ActionParam(
+            name="target",
+            type=str,
+            required=False,
+            description="等待的元素"
+        ),
+        "timeout": ActionParam(
+            name="timeout",
+            type=int,
+            required=False,
+            description="等待时间(秒)",
+            default=10
+        )
     },
-    
-    ActionType.ASSERT: {
-        "description": "断言元素存在或状态",
-        "params": {
-            "target": ActionParam(
-                name="target",
-                type=str,
-                description="断言目标元素"
-            ),
-            "condition": ActionParam(
-                name="condition",
-                type=str,
-                description="断言条件(exists/not_exists/contains_text)"
-            ),
-            "value": ActionParam(
-                name="value",
-                type=str,
-                required=False,
-                description="断言值"
-            )
-        }
+    exclusive=False, cost=1.0
+)
+
+ACTION_REGISTRY.register(
+    ActionType.ASSERT,
+    "断言元素存在或状态",
+    params={
+        "target": ActionParam(
+            name="target",
+            type=str,
+            description="断言目标元素"
+        ),
+        "condition": ActionParam(
+            name="condition",
+            type=str,
+            description="断言条件(exists/not_exists/contains_text)"
+        ),
+        "value": ActionParam(
+            name="value",
+            type=str,
+            required=False,
+            description="断言值"
+        )
     },
-    
-    ActionType.SEQUENCE: {
-        "description": "按顺序执行多个动作",
-        "params": {
-            "actions": ActionParam(
-                name="actions",
-                type=list,
-                description="要执行的动作列表"
-            ),
-            "continue_on_error": ActionParam(
-                name="continue_on_error",
-                type=bool,
-                required=False,
-                description="出错时是否继续执行",
-                default=False
-            )
-        }
+    exclusive=False, cost=0.3
+)
+
+ACTION_REGISTRY.register(
+    ActionType.LONG_CLICK,
+    "长按指定元素",
+    params={
+        "target": ActionParam(
+            name="target",
+            type=str,
+            description="目标元素文本/ID"
+        ),
+        "duration": ActionParam(
+            name="duration",
+            type=float,
+            required=False,
+            description="按住时间(秒)",
+            default=1.0
+        )
     },
-    
-    ActionType.PARALLEL: {
-        "description": "并行执行多个动作",
-        "params": {
-            "actions": ActionParam(
-                name="actions",
-                type=list,
-                description="要并行执行的动作列表"
-            ),
-            "timeout": ActionParam(
-                name="timeout",
-                type=int,
-                required=False,
-                description="总体超时时间(秒)",
-                default=30
-            )
-        }
+    cost=1.5
+)
+
+ACTION_REGISTRY.register(
+    ActionType.PINCH,
+    "双指缩放",
+    params={
+        "direction": ActionParam(
+            name="direction",
+            type=str,
+            description="缩放方向(in缩小/out放大)",
+            validator=lambda value: value in ('in', 'out')
+        ),
+        "target": ActionParam(
+            name="target",
+            type=str,
+            required=False,
+            description="缩放的元素，不指定时缩放整个页面"
+        ),
+        "percent": ActionParam(
+            name="percent",
+            type=int,
+            required=False,
+            description="双指移动距离占元素大小的百分比",
+            default=50
+        )
     },
-    
-    ActionType.CONDITIONAL: {
-        "description": "条件执行",
-        "params": {
-            "condition": ActionParam(
-                name="condition",
-                type=dict,
-                description="条件检查动作"
-            ),
-            "if_true": ActionParam(
-                name="if_true",
-                type=dict,
-                description="条件为真时执行的动作"
-            ),
-            "if_false": ActionParam(
-                name="if_false",
-                type=dict,
-                required=False,
-                description="条件为假时执行的动作"
-            )
-        }
+    cost=1.0
+)
+
+ACTION_REGISTRY.register(
+    ActionType.BACK,
+    "按返回键",
+    changes_screen=True,
+    cost=0.3
+)
+
+ACTION_REGISTRY.register(
+    ActionType.HOME,
+    "回到桌面",
+    changes_screen=True,
+    cost=0.3
+)
+
+ACTION_REGISTRY.register(
+    ActionType.SEQUENCE,
+    "按顺序执行多个动作",
+    params={
+        "actions": ActionParam(
+            name="actions",
+            type=list,
+            description="要执行的动作列表"
+        ),
+        "continue_on_error": ActionParam(
+            name="continue_on_error",
+            type=bool,
+            required=False,
+            description="出错时是否继续执行",
+            default=False
+        )
     },
-    
-    ActionType.LOOP: {
-        "description": "循环执行动作",
-        "params": {
-            "action": ActionParam(
-                name="action",
-                type=dict,
-                description="要循环执行的动作"
-            ),
-            "times": ActionParam(
-                name="times",
-                type=int,
-                required=False,
-                description="循环次数",
-                default=None
-            ),
-            "until": ActionParam(
-                name="until",
-                type=dict,
-                required=False,
-                description="循环终止条件",
-                default=None
-            ),
-            "max_iterations": ActionParam(
-                name="max_iterations",
-                type=int,
-                required=False,
-                description="最大循环次数",
-                default=100
-            )
-        }
-    }
+    composite=True
+)
+
+ACTION_REGISTRY.register(
+    ActionType.PARALLEL,
+    "并行执行多个动作",
+    params={
+        "actions": ActionParam(
+            name="actions",
+            type=list,
+            description="要并行执行的动作列表"
+        ),
+        "timeout": ActionParam(
+            name="timeout",
+            type=int,
+            required=False,
+            description="总体超时时间(秒)",
+            default=30
+        )
+    },
+    composite=True
+)
+
+ACTION_REGISTRY.register(
+    ActionType.CONDITIONAL,
+    "条件执行",
+    params={
+        "condition": ActionParam(
+            name="condition",
+            type=dict,
+            description="条件检查动作"
+        ),
+        "if_true": ActionParam(
+            name="if_true",
+            type=dict,
+            description="条件为真时执行的动作"
+        ),
+        "if_false": ActionParam(
+            name="if_false",
+            type=dict,
+            required=False,
+            description="条件为假时执行的动作"
+        )
+    },
+    composite=True
+)
+
+ACTION_REGISTRY.register(
+    ActionType.LOOP,
+    "循环执行动作",
+    params={
+        "action": ActionParam(
+            name="action",
+            type=dict,
+            description="要循环执行的动作"
+        ),
+        "times": ActionParam(
+            name="times",
+            type=int,
+            required=False,
+            description="循环次数",
+            default=None
+        ),
+        "until": ActionParam(
+            name="until",
+            type=dict,
+            required=False,
+            description="循环终止条件",
+            default=None
+        ),
+        "max_iterations": ActionParam(
+            name="max_iterations",
+            type=int,
+            required=False,
+            description="最大循环次数",
+            default=100
+        )
+    },
+    composite=True
+)
+
+# 提示词模板、响应分析和计划编译使用的动作目录
+AVAILABLE_ACTIONS = ACTION_REGISTRY.catalogue
+
+# 参数中包含子动作的组合动作
+COMPOSITE_ACTIONS = ACTION_REGISTRY.composite_types
+
+# 可能改变屏幕内容的设备调用，执行后当前屏幕的控件索引失效
+SCREEN_MUTATING_OPERATIONS = {
+    'click', 'long_click', 'swipe', 'send_keys', 'clear_text', 'app_start', 'app_stop', 'press', 'pinch'
 }
 
+# 说明设备已断开的异常（也可能被处理函数包装在AutomationError中）
+DEVICE_LOST_ERRORS = (DeviceError, ConnectionError, u2.exceptions.ConnectError)
+
+def plan_lookahead(steps: Sequence[ActionNode], limit: int) -> List[str]:
+    """收集后续步骤中可能在当前屏幕上的点击目标"""
+    targets = []
+    for step in steps:
+        # 执行后屏幕必然切换的动作之后不再收集
+        if len(targets) >= limit or ACTION_REGISTRY[step.type].changes_screen:
+            break
+        if step.type == ActionType.CLICK:
+            target = step.params.get('target')
+            if target not in targets:
+                targets.append(target)
+            # 点击通常会切换屏幕，之后步骤的目标不在当前截图上
+            break
+    return targets
+
 class AutomationService:
-    def __init__(self):
+    def __init__(self, llm_service=None, connector=None):
+        # llm_service模块依赖本模块的动作定义，因此在这里延迟导入
+        from app.services.llm_service import LLMService
         self.devices = {}
-        self.llm_service = LLMService()
+        self.device_ids = {}  # id(设备对象) -> 设备ID，用作设备通道的键
+        self.llm_service = llm_service or LLMService()
+        self.connector = connector  # 设备连接函数，默认使用u2.connect
+        self.device_io = DeviceIO(max_workers=Config.DEVICE_IO_MAX_WORKERS)
+        self.screen_cache = ScreenStateCache(
+            max_distance=Config.SCREEN_CACHE_MAX_DISTANCE,
+            max_screens=Config.SCREEN_CACHE_MAX_SCREENS,
+            ttl=Config.SCREEN_CACHE_TTL
+        )
+        self.screenshot_pipeline = ScreenshotPipeline(
+            max_edge=Config.SCREENSHOT_MAX_EDGE,
+            image_format=Config.SCREENSHOT_FORMAT,
+            quality=Config.SCREENSHOT_QUALITY
+        )
+        self.hierarchy_cache = HierarchyCache(ttl=Config.HIERARCHY_INDEX_TTL)
+        self.lookahead = {}  # 设备ID -> 执行计划中后续的点击目标
+        self.plan_compiler = PlanCompiler(AVAILABLE_ACTIONS, COMPOSITE_ACTIONS)
+        self._handlers = ACTION_REGISTRY.bind(self)  # 动作类型 -> 处理方法
+        self.action_hooks = []  # 动作计时钩子
+        self.retry_engine = RetryEngine.from_config(Config)
+        self.watchers = {}  # 设备ID -> ScreenWatcher
+        self.locator = ElementLocator(
+            self,
+            budgets=Config.LOCATOR_TIER_BUDGETS,
+            min_score=Config.HIERARCHY_FUZZY_MIN_SCORE,
+            margin=Config.HIERARCHY_FUZZY_MARGIN,
+            hash_size=Config.SCREEN_CACHE_HASH_SIZE,
+            ocr_max_edge=Config.LOCATOR_OCR_MAX_EDGE
+        )
+
+    def _device_key(self, device) -> str:
+        """获取设备的唯一标识"""
+        return self.device_ids.get(id(device)) or getattr(device, 'serial', None) or str(id(device))
+
+    async def _device_call(self, device, operation: str, fn, *args, **kwargs):
+        """在设备专属通道上执行阻塞的uiautomator2调用，不阻塞事件循环"""
+        device_key = self._device_key(device)
+        try:
+            return await self.device_io.call(device_key, operation, fn, *args, **kwargs)
+        finally:
+            if operation in SCREEN_MUTATING_OPERATIONS:
+                self.hierarchy_cache.invalidate(device_key)
+                watcher = self.watchers.get(device_key)
+                if watcher is not None:
+                    watcher.mark_stale()
+
+    async def _get_hierarchy(self, device) -> Optional[HierarchyIndex]:
+        """获取当前屏幕的控件索引，屏幕未变化时复用"""
+        device_key = self._device_key(device)
+        index = self.hierarchy_cache.get(device_key)
+        if index is not None:
+            return index
+        try:
+            # 导出和解析都在设备通道的线程上完成
+            index = await self.device_io.call(
+                device_key,
+                'dump_hierarchy',
+                lambda: HierarchyIndex.from_xml(device.dump_hierarchy())
+            )
+        except Exception as e:
+            logger.warning(f"Failed to dump hierarchy: {str(e)}", extra={'device_id': device_key})
+            return None
+        self.hierarchy_cache.set(device_key, index)
+        return index
+
+    def _watcher(self, device) -> ScreenWatcher:
+        """获取设备的屏幕变化通知器"""
+        device_key = self._device_key(device)
+        watcher = self.watchers.get(device_key)
+        if watcher is None:
+            watcher = ScreenWatcher(
+                dump=lambda: self.device_io.call(
+                    device_key, 'dump_hierarchy', device.dump_hierarchy, compressed=True
+                ),
+                # 等待期间屏幕自行变化（加载完成、动画结束）时控件索引也需失效
+                on_change=lambda: self.hierarchy_cache.invalidate(device_key),
+                interval=Config.SCREEN_WATCH_INTERVAL,
+                settle=Config.SCREEN_SETTLE_TIME
+            )
+            self.watchers[device_key] = watcher
+        return watcher
+
+    async def _find_in_hierarchy(self, device, target: str, fuzzy: bool = True) -> Optional[ElementMatch]:
+        """在控件索引中查找目标元素"""
+        index = await self._get_hierarchy(device)
+        if index is None:
+            return None
+        match = index.find(
+            target, fuzzy=fuzzy, min_score=Config.HIERARCHY_FUZZY_MIN_SCORE, margin=Config.HIERARCHY_FUZZY_MARGIN
+        )
+        hierarchy_lookups.labels(result='hit' if match else 'miss').inc()
+        return match
 
     async def connect_device(self, device_id):
         """连接设备"""
         try:
             logger.info(f"Connecting to device: {device_id}")
             if device_id not in self.devices:
-                device = u2.connect(device_id)
+                connect = self.connector or u2.connect
+                device = await self.device_io.call(device_id, 'connect', connect, device_id)
                 # 开启uiautomator2的toast监控
-                device.watcher.start()
+                await self.device_io.call(device_id, 'watcher_start', device.watcher.start)
                 self.devices[device_id] = device
+                self.device_ids[id(device)] = device_id
                 logger.info(f"Successfully connected to device: {device_id}")
             return True
         except Exception as e:
@@ -307,149 +499,286 @@ class AutomationService:
                         extra={'device_id': device_id})
             raise DeviceError(f"Failed to connect device: {str(e)}")
 
-    def validate_action(self, action: Dict) -> bool:
-        """验证动作格式是否正确"""
-        try:
-            # 检查动作类型是否存在
-            action_type = ActionType(action.get('type'))
-            if action_type not in AVAILABLE_ACTIONS:
-                raise AutomationError(f"Unknown action type: {action_type}")
+    def _connected(self, device_id: str):
+        device = self.devices.get(device_id)
+        if not device:
+            raise DeviceError("Device not connected")
+        return device
 
-            action_spec = AVAILABLE_ACTIONS[action_type]
-            params = action.get('params', {})
+    async def warmup(self, device_id: str):
+        """预热设备：导出首屏控件索引、记录窗口摘要并截一次图（首次截图通常明显较慢）"""
+        device = self._connected(device_id)
+        await self._get_hierarchy(device)
+        await self._watcher(device).poll()
+        await self._grab_screenshot(device)
 
-            # 检查必需参数
-            for param_name, param_spec in action_spec['params'].items():
-                if param_spec.required and param_name not in params:
-                    raise AutomationError(
-                        f"Missing required parameter '{param_name}' for action '{action_type}'"
-                    )
+    async def current_app(self, device_id: str) -> Optional[str]:
+        """获取前台应用的包名"""
+        device = self._connected(device_id)
+        current = await self.device_io.call(device_id, 'app_current', device.app_current)
+        return current.get('package')
 
-            # 检查参数类型
-            for param_name, param_value in params.items():
-                if param_name not in action_spec['params']:
-                    raise AutomationError(
-                        f"Unknown parameter '{param_name}' for action '{action_type}'"
-                    )
-                param_spec = action_spec['params'][param_name]
-                if not isinstance(param_value, param_spec.type):
-                    raise AutomationError(
-                        f"Invalid type for parameter '{param_name}', "
-                        f"expected {param_spec.type.__name__}"
-                    )
+    async def stop_app(self, device_id: str, package: str, restore: Optional[str] = None):
+        """停止应用，并按需切回之前的前台应用"""
+        device = self._connected(device_id)
+        await self._device_call(device, 'app_stop', device.app_stop, package)
+        if restore and restore != package:
+            await self._device_call(device, 'app_start', device.app_start, restore)
 
-            return True
+    def validate_action(self, action: Dict) -> bool:
+        """验证动作格式是否正确"""
+        self.compile(action)
+        return True
 
-        except ValueError as e:
-            raise AutomationError(f"Invalid action: {str(e)}")
+    def compile(self, action: Union[Dict, ActionNode]) -> ActionNode:
+        """把动作编译为已校验、已填入默认值的节点"""
+        try:
+            return self.plan_compiler.compile_action(action)
+        except AutomationError:
+            raise
         except Exception as e:
             logger.error(f"Action validation failed: {str(e)}", exc_info=True)
             raise AutomationError(f"Action validation failed: {str(e)}")
 
-    @retry_on_error(max_retries=3, delay=1)
-    async def execute_action(self, device_id: str, action: Dict) -> bool:
+    async def execute_action(self, device_id: str, action: Union[Dict, ActionNode]) -> bool:
         """执行自动化动作"""
+        # 只在入口校验一次，重试和子动作直接使用编译后的节点
+        return await self.execute_node(device_id, self.compile(action))
+
+    def add_action_hook(self, hook: Callable[[ActionNode, float, Optional[Exception]], None]):
+        """注册动作计时钩子，每个动作处理函数结束后以(节点, 耗时, 异常)调用"""
+        self.action_hooks.append(hook)
+
+    async def execute_node(self, device_id: str, node: ActionNode) -> bool:
+        """执行编译后的动作节点，只在基础动作上按重试策略重试"""
+        if ACTION_REGISTRY[node.type].composite:
+            return await self._run_handler(device_id, node)
+        return await self.retry_engine.run(node.value, lambda: self._run_handler(device_id, node))
+
+    async def _run_handler(self, device_id: str, node: ActionNode) -> bool:
+        """调用动作的处理函数并计时"""
+        error = None
+        started = time.perf_counter()
         try:
-            self.validate_action(action)
-            device = self.devices.get(device_id)
-            if not device:
-                raise AutomationError("Device not connected")
-
-            action_type = ActionType(action['type'])
-            params = action.get('params', {})
-
-            if action_type == ActionType.CLICK:
-                # 使用动态点击替换静态点击
-                return await self._execute_dynamic_click(
-                    device,
-                    params['target'],
-                    fallback_to_text=params.get('fallback_to_text', True)
-                )
-            elif action_type == ActionType.INPUT:
-                await self._execute_input(device, params)
-            elif action_type == ActionType.SWIPE:
-                await self._execute_swipe(device, params)
-            elif action_type == ActionType.LAUNCH_APP:
-                await self._execute_launch_app(device, params)
-            elif action_type == ActionType.WAIT:
-                await self._execute_wait(device, params)
-            elif action_type == ActionType.ASSERT:
-                await self._execute_assert(device, params)
-            elif action_type == ActionType.SEQUENCE:
-                return await self._execute_sequence(device_id, params)
-            elif action_type == ActionType.PARALLEL:
-                return await self._execute_parallel(device_id, params)
-            elif action_type == ActionType.CONDITIONAL:
-                return await self._execute_conditional(device_id, params)
-            elif action_type == ActionType.LOOP:
-                return await self._execute_loop(device_id, params)
-            else:
-                raise AutomationError(f"Unsupported action type: {action_type}")
+            if ACTION_REGISTRY[node.type].composite:
+                return await self._handlers[node.type](device_id, node.params)
+
+            device = self._connected(device_id)
+            result = await self._handlers[node.type](device, node.params)
+            # 基础动作成功时返回True（点击等处理函数自身返回结果）
+            return True if result is None else result
 
         except Exception as e:
+            error = e
             logger.error(
                 f"Action execution failed: {str(e)}", 
                 exc_info=True,
                 extra={'device_id': device_id}
             )
+            # 设备断开不是动作失败：保持DeviceError，由调度器转移到其他设备
+            lost = next((cause for cause in error_chain(e) if isinstance(cause, DEVICE_LOST_ERRORS)), None)
+            if isinstance(lost, DeviceError):
+                raise lost
+            if lost is not None:
+                raise DeviceError(f"Device connection lost: {str(lost)}") from e
             raise AutomationError(f"Action execution failed: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - started
+            action_latency.labels(action=node.value).observe(elapsed)
+            for hook in self.action_hooks:
+                try:
+                    hook(node, elapsed, error)
+                except Exception as e:
+                    logger.warning(f"Action hook failed: {str(e)}")
+
+    async def execute_plan(
+        self,
+        device_id: str,
+        steps: List[Dict],
+        retry_budget: Optional[RetryBudget] = None,
+        step_hook: Optional[Callable[[ActionNode, float, Optional[Exception]], None]] = None
+    ) -> bool:
+        """逐步执行计划，视觉定位时顺带定位后续步骤的目标
+
+        retry_budget为任务的重试时间预算，执行后其retries为本次的重试次数；
+        step_hook在每个顶层步骤结束后以(节点, 耗时, 异常)调用，如ExecutionJournal.record。
+        """
+        # 执行前整体编译一次，计划无效时不会执行任何步骤
+        try:
+            nodes = self.plan_compiler.compile_plan(steps)
+        except AutomationError:
+            raise
+        except Exception as e:
+            raise AutomationError(f"Invalid execution plan: {str(e)}")
+
+        token = current_budget.set(retry_budget) if retry_budget is not None else None
+        try:
+            for index, node in enumerate(nodes):
+                await self._execute_step(device_id, node, nodes[index + 1:], step_hook)
+            return True
+        finally:
+            self.lookahead.pop(device_id, None)
+            if token is not None:
+                current_budget.reset(token)
 
+    async def execute_stream(
+        self,
+        device_id: str,
+        steps: AsyncIterator[Dict],
+        retry_budget: Optional[RetryBudget] = None,
+        plan: Optional[List[Dict]] = None,
+        step_hook: Optional[Callable[[ActionNode, float, Optional[Exception]], None]] = None
+    ) -> bool:
+        """边生成边执行：每收到一个完整的顶层动作就编译并按顺序执行
+
+        步骤的接收在后台进行，与前面步骤的执行重叠；收到的步骤依次追加到plan中。
+        生成出错（如后续步骤校验失败）时，当前步骤执行完后中止，不再执行任何后续步骤。
+        """
+        plan = plan if plan is not None else []
+        pending = deque()
+        arrived = asyncio.Event()
+
+        async def receive():
+            try:
+                async for step in steps:
+                    pending.append(self.plan_compiler.compile_action(step, str(len(plan))))
+                    plan.append(step)
+                    arrived.set()
+            finally:
+                arrived.set()
+
+        receiver = asyncio.ensure_future(receive())
+        token = current_budget.set(retry_budget) if retry_budget is not None else None
+        try:
+            while True:
+                if receiver.done() and receiver.exception() is not None:
+                    raise receiver.exception()
+                if not pending:
+                    if receiver.done():
+                        return True
+                    arrived.clear()
+                    await arrived.wait()
+                    continue
+                node = pending.popleft()
+                await self._execute_step(device_id, node, list(pending), step_hook)
+        finally:
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+            self.lookahead.pop(device_id, None)
+            if token is not None:
+                current_budget.reset(token)
+
+    async def _execute_step(
+        self,
+        device_id: str,
+        node: ActionNode,
+        upcoming: Sequence[ActionNode],
+        step_hook: Optional[Callable] = None
+    ):
+        """执行计划中的一个顶层步骤，视觉定位时顺带定位后续步骤的目标"""
+        self.lookahead[device_id] = plan_lookahead(upcoming, Config.VISION_BATCH_MAX_TARGETS - 1)
+        error = None
+        started = time.perf_counter()
+        try:
+            success = await self.execute_node(device_id, node)
+            if not success:
+                raise AutomationError(f"Failed to execute step {node.path}: {node.value}")
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if step_hook is not None:
+                try:
+                    step_hook(node, time.perf_counter() - started, error)
+                except Exception as e:
+                    # 记录结果失败不能掩盖步骤本身的错误，也不应中断执行
+                    logger.error(f"Step hook failed for step {node.path}: {str(e)}",
+                                 extra={'device_id': device_id})
+
+    @ACTION_REGISTRY.handler(ActionType.SEQUENCE)
     async def _execute_sequence(self, device_id: str, params: Dict) -> bool:
         """按顺序执行多个动作"""
         actions = params['actions']
-        continue_on_error = params.get('continue_on_error', False)
+        continue_on_error = params['continue_on_error']
         
         for action in actions:
             try:
-                await self.execute_action(device_id, action)
+                await self.execute_node(device_id, action)
             except Exception as e:
                 if not continue_on_error:
                     raise
                 logger.warning(f"Action failed but continuing: {str(e)}")
         return True
 
+    @ACTION_REGISTRY.handler(ActionType.PARALLEL)
     async def _execute_parallel(self, device_id: str, params: Dict) -> bool:
         """并行执行多个动作"""
+        # 触控/输入类动作会在设备上交错，按原顺序串成一条链执行；
+        # 断言、等待等只读动作各自并发，与手势链重叠
         actions = params['actions']
-        timeout = params.get('timeout', 30)
-        
-        tasks = [
-            self.execute_action(device_id, action)
-            for action in actions
-        ]
-        
-        try:
-            await asyncio.gather(*tasks, timeout=timeout)
+        timeout = params['timeout']
+        gestures = [action for action in actions if ACTION_REGISTRY.is_exclusive(action)]
+        readers = [action for action in actions if not ACTION_REGISTRY.is_exclusive(action)]
+
+        async def run_gestures():
+            for action in gestures:
+                await self.execute_node(device_id, action)
+
+        branches = [run_gestures()] if gestures else []
+        branches.extend(self.execute_node(device_id, action) for action in readers)
+        tasks = [asyncio.ensure_future(branch) for branch in branches]
+        if not tasks:
             return True
-        except asyncio.TimeoutError:
+
+        try:
+            done, pending = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_EXCEPTION
+            )
+        finally:
+            # 超时、出错或自身被取消时取消其余分支，并等待它们退出
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task in tasks:
+            if task in done and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        if pending:
             raise AutomationError(f"Parallel execution timed out after {timeout}s")
+        return True
 
+    @ACTION_REGISTRY.handler(ActionType.CONDITIONAL)
     async def _execute_conditional(self, device_id: str, params: Dict) -> bool:
         """条件执行"""
         try:
             # 执行条件检查
-            condition_result = await self.execute_action(
+            condition_result = await self.execute_node(
                 device_id, 
                 params['condition']
             )
             
             # 根据条件结果选择执行路径
             if condition_result:
-                return await self.execute_action(device_id, params['if_true'])
-            elif 'if_false' in params:
-                return await self.execute_action(device_id, params['if_false'])
+                return await self.execute_node(device_id, params['if_true'])
+            elif params['if_false'] is not None:
+                return await self.execute_node(device_id, params['if_false'])
             return True
             
         except Exception as e:
             raise AutomationError(f"Conditional execution failed: {str(e)}")
 
+    @ACTION_REGISTRY.handler(ActionType.LOOP)
     async def _execute_loop(self, device_id: str, params: Dict) -> bool:
         """循环执行"""
         action = params['action']
-        times = params.get('times')
-        until = params.get('until')
-        max_iterations = params.get('max_iterations', 100)
+        times = params['times']
+        until = params['until']
+        max_iterations = params['max_iterations']
         
+        device = self.devices.get(device_id)
+        watcher = self._watcher(device) if device is not None and until is not None else None
+        idle_iterations = 0
+
         iteration = 0
         while True:
             # 检查最大循环次数
@@ -457,71 +786,87 @@ class AutomationService:
                 raise AutomationError(f"Loop exceeded maximum iterations ({max_iterations})")
                 
             # 执行动作
-            await self.execute_action(device_id, action)
+            version = await watcher.poll() if watcher is not None else None
+            await self.execute_node(device_id, action)
             iteration += 1
             
             # 检查终止条件
             if times and iteration >= times:
                 break
-            if until:
-                try:
-                    condition_met = await self.execute_action(device_id, until)
-                    if condition_met:
-                        break
-                except Exception as e:
-                    logger.warning(f"Loop condition check failed: {str(e)}")
+            if until is not None:
+                if await self._check_condition(device_id, until):
+                    break
+                if watcher is None:
+                    continue
+                # 条件不成立时等界面稳定，期间屏幕有变化则再检查一次
+                checked_version = watcher.version
+                await watcher.wait_settled(Config.SCREEN_SETTLE_TIMEOUT)
+                if watcher.version != checked_version and await self._check_condition(device_id, until):
+                    break
+                # 屏幕不再变化时继续循环不会改变结果（如列表已滑到底）
+                idle_iterations = idle_iterations + 1 if watcher.version == version else 0
+                if idle_iterations >= Config.LOOP_MAX_IDLE_ITERATIONS:
+                    raise AutomationError(
+                        f"Loop stopped making progress after {iteration} iterations: screen unchanged"
+                    )
                     
         return True
 
-    @retry_on_error(max_retries=3, delay=1)
-    async def _execute_basic_action(self, device, action_type: ActionType, params: Dict) -> bool:
-        """执行基础动作（带重试）"""
-        # 执行相应的基础动作
-        if action_type == ActionType.CLICK:
-            await self._execute_click(device, params)
-        elif action_type == ActionType.INPUT:
-            await self._execute_input(device, params)
-        elif action_type == ActionType.SWIPE:
-            await self._execute_swipe(device, params)
-        elif action_type == ActionType.LAUNCH_APP:
-            await self._execute_launch_app(device, params)
-        elif action_type == ActionType.WAIT:
-            await self._execute_wait(device, params)
-        elif action_type == ActionType.ASSERT:
-            await self._execute_assert(device, params)
-        else:
-            raise AutomationError(f"Unsupported action type: {action_type}")
-        return True
+    async def _check_condition(self, device_id: str, condition: ActionNode) -> bool:
+        """执行条件动作，失败视为条件不成立"""
+        try:
+            return bool(await self.execute_node(device_id, condition))
+        except Exception as e:
+            logger.warning(f"Loop condition check failed: {str(e)}")
+            return False
+
+    @ACTION_REGISTRY.handler(ActionType.CLICK)
+    async def _execute_click_action(self, device, params):
+        """执行点击操作（分层定位目标）"""
+        return await self._execute_dynamic_click(device, params['target'])
 
-    async def _execute_click(self, device, params):
-        """执行点击操作"""
+    @ACTION_REGISTRY.handler(ActionType.LONG_CLICK)
+    async def _execute_long_click(self, device, params):
+        """执行长按操作"""
+        return await self._execute_dynamic_click(device, params['target'], duration=params['duration'])
+
+    @ACTION_REGISTRY.handler(ActionType.PINCH)
+    async def _execute_pinch(self, device, params):
+        """执行双指缩放"""
         target = params['target']
-        timeout = params.get('timeout', 10)
-        
-        # 等待元素出现
-        element = await device(text=target).wait(timeout=timeout)
-        if not element:
-            raise AutomationError(f"Element not found: {target}")
-            
-        # 执行点击
-        element.click()
+        # 未指定元素时作用于应用内容区域
+        element = device(text=target) if target else device(resourceId='android:id/content')
+        gesture = element.pinch_in if params['direction'] == 'in' else element.pinch_out
+        await self._device_call(device, 'pinch', gesture, percent=params['percent'])
 
+    @ACTION_REGISTRY.handler(ActionType.BACK)
+    async def _execute_back(self, device, params):
+        """按返回键"""
+        await self._device_call(device, 'press', device.press, 'back')
+
+    @ACTION_REGISTRY.handler(ActionType.HOME)
+    async def _execute_home(self, device, params):
+        """回到桌面"""
+        await self._device_call(device, 'press', device.press, 'home')
+
+    @ACTION_REGISTRY.handler(ActionType.INPUT)
     async def _execute_input(self, device, params):
         """执行输入操作"""
         text = params['text']
         clear = params.get('clear', True)
         
         if clear:
-            device.clear_text()
-        device.send_keys(text)
+            await self._device_call(device, 'clear_text', device.clear_text)
+        await self._device_call(device, 'send_keys', device.send_keys, text)
 
+    @ACTION_REGISTRY.handler(ActionType.SWIPE)
     async def _execute_swipe(self, device, params):
         """执行滑动操作"""
         direction = params['direction']
         duration = params.get('duration', 0.5)
         
         # 获取屏幕尺寸
-        screen_size = device.window_size()
+        screen_size = await self._device_call(device, 'window_size', device.window_size)
         width, height = screen_size[0], screen_size[1]
         
         # 计算滑动坐标
@@ -540,29 +885,40 @@ class AutomationService:
         else:
             raise AutomationError(f"Invalid swipe direction: {direction}")
             
-        device.swipe(start, end, duration=duration)
+        await self._device_call(device, 'swipe', device.swipe, *start, *end, duration=duration)
 
+    @ACTION_REGISTRY.handler(ActionType.LAUNCH_APP)
     async def _execute_launch_app(self, device, params):
         """执行启动应用操作"""
         package = params['package']
         wait_activity = params.get('wait_activity')
         
-        device.app_start(package)
+        await self._device_call(device, 'app_start', device.app_start, package)
         if wait_activity:
-            device.wait_activity(wait_activity, timeout=10)
+            await self._device_call(device, 'wait_activity', device.wait_activity, wait_activity, timeout=10)
 
+    @ACTION_REGISTRY.handler(ActionType.WAIT)
     async def _execute_wait(self, device, params):
         """执行等待操作"""
         target = params.get('target')
         timeout = params.get('timeout', 10)
         
         if target:
-            element = await device(text=target).wait(timeout=timeout)
-            if not element:
+            watcher = self._watcher(device)
+            # 先查当前屏幕，之后只在屏幕变化时重新查找控件索引
+            async def appeared():
+                return await self._find_in_hierarchy(device, target, fuzzy=False) is not None
+
+            if await watcher.wait_until(appeared, timeout):
+                return
+            element = device(text=target)
+            if not await self._device_call(device, 'exists', lambda: bool(element.exists)):
                 raise AutomationError(f"Element not found after waiting: {target}")
         else:
+            # 计划明确要求等待的时长（如等待启动动画、加载），界面稳定也不提前结束
             await asyncio.sleep(timeout)
 
+    @ACTION_REGISTRY.handler(ActionType.ASSERT)
     async def _execute_assert(self, device, params):
         """执行断言操作"""
         target = params['target']
@@ -570,15 +926,24 @@ class AutomationService:
         value = params.get('value')
         
         element = device(text=target)
+        # 控件索引只用于快速确认断言成立，不成立时再向设备确认，避免索引过期导致误判
+        match = await self._find_in_hierarchy(device, target, fuzzy=False)
         
         if condition == 'exists':
-            if not element.exists:
+            if match:
+                return
+            if not await self._device_call(device, 'exists', lambda: bool(element.exists)):
                 raise AutomationError(f"Assert failed: element '{target}' does not exist")
         elif condition == 'not_exists':
-            if element.exists:
+            if not match:
+                return
+            if await self._device_call(device, 'exists', lambda: bool(element.exists)):
                 raise AutomationError(f"Assert failed: element '{target}' exists")
         elif condition == 'contains_text':
-            if not value or value not in element.text:
+            if value and match and value in match.text:
+                return
+            text = await self._device_call(device, 'get_text', element.get_text) if value else None
+            if not value or not text or value not in text:
                 raise AutomationError(f"Assert failed: element '{target}' does not contain text '{value}'")
         else:
             raise AutomationError(f"Invalid assert condition: {condition}")
@@ -588,8 +953,13 @@ class AutomationService:
         try:
             if device_id in self.devices:
                 device = self.devices[device_id]
-                device.disconnect()
+                await self.device_io.call(device_id, 'disconnect', device.disconnect)
                 del self.devices[device_id]
+                self.device_ids.pop(id(device), None)
+                self.device_io.remove_lane(device_id)
+                self.hierarchy_cache.invalidate(device_id)
+                self.screen_cache.invalidate(device_id)
+                self.watchers.pop(device_id, None)
             return True
         except Exception as e:
             logger.error(f"Failed to disconnect device {device_id}: {str(e)}")
@@ -600,14 +970,14 @@ class AutomationService:
         try:
             device = self.devices.get(device_id)
             if device:
-                info = device.info
+                info = self.device_io.call_sync(device_id, 'info', lambda: device.info)
                 return {
                     'connected': True,
                     'resolution': [info['displayWidth'], info['displayHeight']],
                     'orientation': info['displayRotation'],
                     'sdk_version': info['sdkInt'],
                     'serial': device_id,
-                    'current_app': device.app_current()
+                    'current_app': self.device_io.call_sync(device_id, 'app_current', device.app_current)
                 }
             return {'connected': False}
         except Exception as e:
@@ -629,61 +999,102 @@ class AutomationService:
             # 开启监控
             device.watcher.start()
 
-    async def _capture_screen(self, device) -> str:
-        """捕获屏幕并转换为base64"""
+    async def _grab_screenshot(self, device) -> CapturedScreen:
+        """截取屏幕并编码为视觉模型所需的负载"""
         try:
-            # 截图并转换为PIL Image
-            screenshot = device.screenshot()
-            img = Image.open(BytesIO(screenshot))
-            
-            # 转换为base64
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            return base64.b64encode(buffered.getvalue()).decode()
-            
+            # 截图和编码都在设备通道的线程上完成
+            return await self._device_call(device, 'screenshot', self.screenshot_pipeline.capture, device)
         except Exception as e:
             logger.error(f"Failed to capture screen: {str(e)}", exc_info=True)
             raise AutomationError(f"Screenshot failed: {str(e)}")
 
+    async def _capture_screen(self, device) -> str:
+        """捕获屏幕并转换为base64"""
+        return (await self._grab_screenshot(device)).payload
+
+    async def _analyze_single_target(self, screen_base64: str, target: str, element_type: str) -> Dict:
+        """对单个目标发起视觉定位请求"""
+        query = f"""
+        在这个Android应用界面截图中，请帮我找到"{target}"{element_type}。
+        返回格式：
+        {{
+            "found": true/false,
+            "confidence": 0.0-1.0,
+            "box": [x1, y1, x2, y2],  // 左上角和右下角坐标
+            "description": "元素位置描述"
+        }}
+        """
+        return await self.llm_service.analyze_image(
+            image_base64=screen_base64,
+            query=query
+        )
+
     async def _find_element_with_vision(
         self, 
         device, 
         target: str,
         element_type: str = "button",
         max_retries: int = 3,
-        confidence_threshold: float = 0.7
+        confidence_threshold: float = 0.7,
+        screen: Optional[CapturedScreen] = None,
+        companions: List[str] = ()
     ) -> Optional[Dict]:
-        """使用视觉模型查找元素"""
+        """使用视觉模型查找元素
+
+        screen为已截取的当前屏幕（可选）；companions为计划中随后要定位的目标，
+        与当前目标合并为一次视觉请求，结果按屏幕缓存供后续步骤使用。
+        """
+        device_key = self._device_key(device)
         for attempt in range(max_retries):
             try:
-                # 捕获屏幕
-                screen_base64 = await self._capture_screen(device)
-                
-                # 构建视觉查询
-                query = f"""
-                在这个Android应用界面截图中，请帮我找到"{target}"{element_type}。
-                返回格式：
-                {{
-                    "found": true/false,
-                    "confidence": 0.0-1.0,
-                    "box": [x1, y1, x2, y2],  // 左上角和右下角坐标
-                    "description": "元素位置描述"
-                }}
-                """
-                
-                # 调用视觉模型
-                result = await self.llm_service.analyze_image(
-                    image_base64=screen_base64,
-                    query=query
-                )
+                # 捕获屏幕，并用感知哈希查询该屏幕上已定位过的元素
+                if screen is None or attempt > 0:
+                    screen = await self._grab_screenshot(device)
+                screen_hash = dhash(screen.hash_image(), Config.SCREEN_CACHE_HASH_SIZE)
+                cache_target = f"{element_type}:{target}"
+                cached = self.screen_cache.lookup(device_key, screen_hash, cache_target)
+                if cached is not None:
+                    return cached
+
+                screen_base64 = screen.payload
+
+                # 只为当前屏幕上尚未定位过的后续目标发起批量请求
+                pending = [
+                    companion for companion in companions
+                    if companion != target and self.screen_cache.lookup(
+                        device_key, screen_hash, f"{element_type}:{companion}"
+                    ) is None
+                ]
+                if pending:
+                    results = await self.llm_service.analyze_image_batch(
+                        image_base64=screen_base64,
+                        targets=[target] + pending,
+                        element_type=element_type
+                    )
+                    vision_batch_targets.observe(len(pending) + 1)
+                    for companion, found in zip(pending, results[1:]):
+                        if found.get('found') and found.get('confidence', 0) >= confidence_threshold:
+                            self.screen_cache.store(
+                                device_key,
+                                screen_hash,
+                                f"{element_type}:{companion}",
+                                dict(found, box=screen.to_device_box(found['box']))
+                            )
+                    result = results[0]
+                else:
+                    result = await self._analyze_single_target(screen_base64, target, element_type)
+                    vision_batch_targets.observe(1)
                 
                 if result.get('found') and result.get('confidence', 0) >= confidence_threshold:
+                    # 模型返回的是缩放后图像上的坐标，映射回设备坐标
+                    result = dict(result, box=screen.to_device_box(result['box']))
+                    self.screen_cache.store(device_key, screen_hash, cache_target, result)
                     return result
                     
                 if attempt < max_retries - 1:
                     # 在重试前滑动屏幕
-                    device.swipe(0.5, 0.8, 0.5, 0.2)  # 向上滑动
-                    await asyncio.sleep(1)  # 等待UI更新
+                    await self._device_call(device, 'swipe', device.swipe, 0.5, 0.8, 0.5, 0.2)  # 向上滑动
+                    await self._watcher(device).wait_settled(Config.SCREEN_SETTLE_TIMEOUT)  # 等待滚动停止
                     
             except Exception as e:
                 logger.warning(f"Vision analysis attempt {attempt + 1} failed: {str(e)}")
@@ -696,27 +1107,31 @@ class AutomationService:
         self, 
         device, 
         target: str,
-        fallback_to_text: bool = True
+        fallback_to_text: bool = True,
+        duration: Optional[float] = None
     ) -> bool:
-        """执行动态点击"""
+        """执行动态点击，指定duration时为长按"""
         try:
-            # 首先尝试使用视觉模型
-            element = await self._find_element_with_vision(device, target)
+            # 按开销从低到高依次尝试定位器缓存、控件索引、OCR和视觉模型
+            element = await self.locator.locate(device, target)
             
-            if element and element.get('found'):
-                # 使用边界框中心点进行点击
-                box = element['box']
-                center_x = (box[0] + box[2]) / 2
-                center_y = (box[1] + box[3]) / 2
-                device.click(center_x, center_y)
+            if element is not None:
+                center_x, center_y = element.center
+                if duration is None:
+                    await self._device_call(device, 'click', device.click, center_x, center_y)
+                else:
+                    await self._device_call(device, 'long_click', device.long_click, center_x, center_y, duration)
                 return True
                 
             # 如果视觉识别失败，尝试传统文本匹配
             if fallback_to_text:
-                logger.info(f"Vision-based click failed, falling back to text-based search for '{target}'")
+                logger.info(f"Element locator failed, falling back to text-based search for '{target}'")
                 element = device(text=target)
-                if element.exists:
-                    element.click()
+                if await self._device_call(device, 'exists', lambda: bool(element.exists)):
+                    if duration is None:
+                        await self._device_call(device, 'click', element.click)
+                    else:
+                        await self._device_call(device, 'long_click', element.long_click, duration=duration)
                     return True
                     
             raise AutomationError(f"Failed to find and click element: {target}")
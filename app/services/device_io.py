@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.utils.logger import logger
+from app.utils.monitoring import (
+    device_call_latency,
+    device_call_queue_wait,
+    device_lane_queue_depth
+)
+
+class DeviceLane:
+    """单台设备的串行执行通道"""
+
+    def __init__(self, device_key: str):
+        self.device_key = device_key
+        self.queue = deque()
+        self.running = False
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+class DeviceIO:
+    """设备I/O层：在有界线程池上执行阻塞的uiautomator2调用"""
+    # 每台设备一个通道，同一设备的调用按提交顺序逐个执行；
+    # 通道每执行完一个调用就把自己重新排到线程池队尾，保证设备之间公平
+
+    def __init__(self, max_workers: int = 32):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='device-io')
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _get_lane(self, device_key: str) -> DeviceLane:
+        with self._lock:
+            lane = self._lanes.get(device_key)
+            if lane is None:
+                lane = DeviceLane(device_key)
+                self._lanes[device_key] = lane
+            return lane
+
+    def submit(self, device_key: str, operation: str, fn: Callable, *args, **kwargs) -> Future:
+        """提交阻塞调用到设备通道，返回concurrent.futures.Future"""
+        if self._closed:
+            raise RuntimeError("DeviceIO has been shut down")
+        lane = self._get_lane(device_key)
+        future = Future()
+        with lane.lock:
+            lane.queue.append((future, operation, fn, args, kwargs, time.perf_counter()))
+            depth = len(lane.queue)
+            schedule = not lane.running
+            lane.running = True
+        device_lane_queue_depth.labels(device=device_key).set(depth)
+
+        if schedule:
+            self._executor.submit(self._run_next, lane)
+        return future
+
+    def _run_next(self, lane: DeviceLane):
+        """执行通道中的下一个调用"""
+        while True:
+            with lane.lock:
+                item = lane.queue.popleft() if lane.queue else None
+                depth = len(lane.queue)
+            device_lane_queue_depth.labels(device=lane.device_key).set(depth)
+
+            if item is not None:
+                self._execute(lane, *item)
+
+            with lane.lock:
+                if not lane.queue:
+                    lane.running = False
+                    return
+            if not self._closed:
+                try:
+                    self._executor.submit(self._run_next, lane)
+                    return
+                except RuntimeError:
+                    pass
+            # 线程池已关闭：在当前线程执行完通道中剩余的调用，不留下永远不完成的Future
+
+    def _execute(self, lane: DeviceLane, future: Future, operation: str, fn: Callable, args, kwargs, enqueued_at: float):
+        if not future.set_running_or_notify_cancel():
+            return
+        started_at = time.perf_counter()
+        device_call_queue_wait.observe(started_at - enqueued_at)
+        try:
+            future.set_result(fn(*args, **kwargs))
+            lane.completed += 1
+        except BaseException as e:
+            future.set_exception(e)
+            lane.failed += 1
+        finally:
+            latency = time.perf_counter() - started_at
+            device_call_latency.labels(operation=operation).observe(latency)
+            if latency > 5.0:
+                logger.warning(
+                    f"Slow device call detected: {operation} took {latency:.2f}s",
+                    extra={'device_id': lane.device_key}
+                )
+
+    async def call(self, device_key: str, operation: str, fn: Callable, *args, **kwargs) -> Any:
+        """在设备通道上执行阻塞调用并等待结果"""
+        return await asyncio.wrap_future(self.submit(device_key, operation, fn, *args, **kwargs))
+
+    def call_sync(self, device_key: str, operation: str, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """同步版本，供非异步代码保持与通道内其他调用的顺序"""
+        return self.submit(device_key, operation, fn, *args, **kwargs).result(timeout=timeout)
+
+    def remove_lane(self, device_key: str):
+        """移除设备通道（设备断开后调用）"""
+        with self._lock:
+            self._lanes.pop(device_key, None)
+        device_lane_queue_depth.labels(device=device_key).set(0)
+
+    def get_stats(self) -> Dict:
+        """获取各设备通道的队列深度和调用统计"""
+        with self._lock:
+            lanes = list(self._lanes.values())
+        return {
+            'max_workers': self.max_workers,
+            'lanes': {
+                lane.device_key: {
+                    'queue_depth': len(lane.queue),
+                    'running': lane.running,
+                    'completed': lane.completed,
+                    'failed': lane.failed
+                }
+                for lane in lanes
+            }
+        }
+
+    def shutdown(self, wait: bool = True):
+        """停止接受新调用；已提交的调用仍会执行完，wait为True时等待它们完成"""
+        self._closed = True
+        self._executor.shutdown(wait=wait)
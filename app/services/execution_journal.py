@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func, insert
+from app import db
+from app.models.task import TaskStepResult
+from app.utils.logger import logger
+from app.utils.monitoring import execution_journal_flushes
+
+# 本进程的启动标识：容器中worker总是PID 1，重启后仅凭PID无法区分上一次运行留下的日志
+BOOT_ID = uuid.uuid4().hex[:12]
+# 本进程中尚未关闭的日志文件
+_open_journals = set()
+_open_lock = threading.Lock()
+
+class ExecutionJournal:
+    """任务步骤结果的写后日志"""
+    # 每条结果先追加到本地日志文件（不等待数据库），同时缓冲在内存中，
+    # 达到条数或时间阈值时批量插入步骤结果表，任务结束时随完成状态一起提交；
+    # 进程崩溃后由replay_journals把日志文件中尚未入库的记录补写到数据库
+
+    def __init__(
+        self,
+        task_id: int,
+        directory: Optional[str] = None,
+        batch_size: int = 20,
+        flush_interval: float = 2.0
+    ):
+        self.task_id = task_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer: List[Dict] = []
+        self.last_flush = time.monotonic()
+        self.path = None
+        self._file = None
+        if directory:
+            # 先补写该任务上一次执行留下的记录，新的序号才不会与之重复
+            replay_journals(directory, task_id=task_id)
+        # 重新执行（设备转移、worker失联后重新领取）时序号接着已入库的记录
+        self.seq = db.session.query(func.max(TaskStepResult.seq)).filter_by(task_id=task_id).scalar() or 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # 每次执行使用单独的文件：任务ID-进程ID-启动标识-随机后缀
+            name = f"{task_id}-{os.getpid()}-{BOOT_ID}-{uuid.uuid4().hex[:8]}.jsonl"
+            self.path = os.path.join(directory, name)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            with _open_lock:
+                _open_journals.add(self.path)
+
+    def record(self, node, elapsed: float, error: Optional[Exception] = None):
+        """记录一个顶层步骤的结果，可作为execute_plan的步骤回调"""
+        self.seq += 1
+        row = {
+            'task_id': self.task_id,
+            'seq': self.seq,
+            'step_index': int(node.path),
+            'action': node.value,
+            'success': error is None,
+            'error': str(error) if error is not None else None,
+            'duration': round(elapsed, 4),
+            'created_at': datetime.utcnow()
+        }
+        if self._file is not None:
+            self._file.write(json.dumps(dict(row, created_at=row['created_at'].isoformat()), ensure_ascii=False) + '\n')
+            # 只交给操作系统，进程崩溃不丢失；不逐条fsync
+            self._file.flush()
+        self.buffer.append(row)
+
+        if len(self.buffer) >= self.batch_size:
+            self.flush(trigger='size')
+        elif time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush(trigger='time')
+
+    def flush(self, commit: bool = True, trigger: str = 'end'):
+        """把缓冲的结果批量插入数据库；commit为False时留给调用方在同一事务中提交"""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        rows, self.buffer = self.buffer, []
+        db.session.execute(insert(TaskStepResult), rows)
+        if commit:
+            db.session.commit()
+        execution_journal_flushes.labels(trigger=trigger).inc()
+
+    def close(self):
+        """写入剩余结果；确认全部入库后删除日志文件，否则保留给replay_journals补写"""
+        persisted = 0
+        try:
+            self.flush()
+            persisted = db.session.query(func.max(TaskStepResult.seq)).filter_by(
+                task_id=self.task_id
+            ).scalar() or 0
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to persist step results for task {self.task_id}: {str(e)}",
+                         extra={'task_id': self.task_id})
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with _open_lock:
+                _open_journals.discard(self.path)
+        if self.path and persisted >= self.seq:
+            os.remove(self.path)
+
+def _journal_in_use(path: str, pid: int, boot_id: str) -> bool:
+    """日志文件是否仍属于运行中的执行（此时不能补写）"""
+    if boot_id == BOOT_ID:
+        # 本进程写的日志：已关闭的说明入库失败，需要补写
+        with _open_lock:
+            return path in _open_journals
+    if pid == os.getpid():
+        # 同一PID的上一次运行（如容器重启）
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 进程存在但无权限，或平台不支持
+        return True
+    return True
+
+def replay_journals(directory: str, task_id: Optional[int] = None) -> int:
+    """把已结束的执行留下的日志中尚未入库的步骤结果补写到数据库，返回补写的条数
+
+    task_id指定时只处理该任务的日志。
+    """
+    if not directory or not os.path.isdir(directory):
+        return 0
+    replayed = 0
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        parts = stem.split('-')
+        if ext != '.jsonl' or len(parts) != 4 or not parts[0].isdigit() or not parts[1].isdigit():
+            continue
+        journal_task = int(parts[0])
+        if task_id is not None and journal_task != task_id:
+            continue
+        path = os.path.join(directory, name)
+        if _journal_in_use(path, int(parts[1]), parts[2]):
+            continue
+
+        rows = []
+        with open(path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+                row['created_at'] = datetime.fromisoformat(row['created_at'])
+                rows.append(row)
+
+        existing = {
+            seq for (seq,) in db.session.query(TaskStepResult.seq).filter_by(task_id=journal_task)
+        }
+        missing = [row for row in rows if row['seq'] not in existing]
+        if missing:
+            db.session.execute(insert(TaskStepResult), missing)
+        db.session.commit()
+        os.remove(path)
+        replayed += len(missing)
+        if missing:
+            logger.warning(f"Replayed {len(missing)} step results for task {journal_task} from {name}",
+                           extra={'task_id': journal_task})
+    return replayed
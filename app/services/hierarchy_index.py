@@ -0,0 +1,296 @@
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Union
+from xml.etree.ElementTree import iterparse
+from app.utils.cache_keys import normalize_text
+
+BOUNDS_PATTERN = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+SHORT_TARGET_LENGTH = 2  # 不超过该长度的目标几乎只能靠包含关系得分
+SHORT_TARGET_MIN_SCORE = 0.8  # 短目标模糊匹配的最低相似度（"设置"与"蓝牙设置"为0.75）
+
+def normalize(text: str) -> str:
+    """查询归一化：全半角、空白和大小写"""
+    return normalize_text(text).casefold() if text else ''
+
+def trigrams(text: str) -> set:
+    """计算带首尾填充的三元组，短文本也能参与模糊匹配"""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(key: str, candidate: str, shared: int, key_grams: int, candidate_grams: int) -> float:
+    """Dice系数；目标与文本互相包含时（如"蓝牙设置"与"蓝牙"）按长度比例提高得分"""
+    score = 2 * shared / (key_grams + candidate_grams)
+    if key in candidate:
+        score = max(score, 0.5 + 0.5 * len(key) / len(candidate))
+    elif candidate in key:
+        score = max(score, 0.5 + 0.5 * len(candidate) / len(key))
+    return score
+
+def required_score(key: str, min_score: float) -> float:
+    """模糊匹配的最低相似度，短目标提高门槛"""
+    if len(normalize(key)) <= SHORT_TARGET_LENGTH:
+        return max(min_score, SHORT_TARGET_MIN_SCORE)
+    return min_score
+
+def text_similarity(target: str, text: str) -> float:
+    """两段文本的相似度，用于OCR结果等少量候选"""
+    key, candidate = normalize(target), normalize(text)
+    if not key or not candidate:
+        return 0.0
+    if key == candidate:
+        return 1.0
+    key_grams, candidate_grams = trigrams(key), trigrams(candidate)
+    return similarity(key, candidate, len(key_grams & candidate_grams), len(key_grams), len(candidate_grams))
+
+@dataclass
+class ElementMatch:
+    """索引查询结果"""
+    index: int
+    text: str
+    resource_id: str
+    content_desc: str
+    class_name: str
+    bounds: Tuple[int, int, int, int]
+    clickable: bool
+    score: float = 1.0
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        left, top, right, bottom = self.bounds
+        return (left + right) / 2, (top + bottom) / 2
+
+    def to_locator(self) -> Dict:
+        """可在后续屏幕上重新查找该控件的定位器"""
+        return {
+            'resource_id': self.resource_id,
+            'text': self.text,
+            'content_desc': self.content_desc
+        }
+
+class HierarchyIndex:
+    """由一次dump_hierarchy构建的控件索引"""
+    # 控件属性按列存放在紧凑数组中，查询只经过哈希表和三元组倒排表
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.resource_ids: List[str] = []
+        self.content_descs: List[str] = []
+        self.class_names: List[str] = []
+        self.bounds = array('i')  # 每个控件4个值：左、上、右、下
+        self.clickable = bytearray()
+        self._by_text = defaultdict(list)
+        self._by_desc = defaultdict(list)
+        self._by_resource_id = defaultdict(list)
+        # 三元组倒排表中的条目为 位置*2+字段(0文本/1描述)
+        self._trigrams = defaultdict(list)
+        self._entry_keys = {}  # 条目 -> (归一化文本, 三元组数)
+        self.package = ''  # 当前屏幕所属应用
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_xml(cls, xml: Union[str, bytes]) -> 'HierarchyIndex':
+        """流式解析uiautomator的控件树XML"""
+        index = cls()
+        data = xml.encode('utf-8') if isinstance(xml, str) else xml
+        for event, elem in iterparse(BytesIO(data), events=('start', 'end')):
+            if event == 'end':
+                # 属性已在start事件读取，及时释放子树
+                elem.clear()
+                continue
+            if elem.tag == 'node':
+                index._add(elem.attrib)
+        return index
+
+    def _add(self, attrib: Dict):
+        match = BOUNDS_PATTERN.match(attrib.get('bounds', ''))
+        if match is None:
+            return
+        left, top, right, bottom = (int(value) for value in match.groups())
+        if right <= left or bottom <= top:
+            # 不可见的控件无法点击
+            return
+
+        if not self.package:
+            self.package = attrib.get('package', '')
+        position = len(self.texts)
+        text = attrib.get('text', '')
+        resource_id = attrib.get('resource-id', '')
+        content_desc = attrib.get('content-desc', '')
+        self.texts.append(text)
+        self.resource_ids.append(resource_id)
+        self.content_descs.append(content_desc)
+        self.class_names.append(attrib.get('class', ''))
+        self.bounds.extend((left, top, right, bottom))
+        self.clickable.append(attrib.get('clickable') == 'true')
+
+        for field, value, table in ((0, text, self._by_text), (1, content_desc, self._by_desc)):
+            if not value:
+                continue
+            key = normalize(value)
+            table[key].append(position)
+            entry = position * 2 + field
+            grams = trigrams(key)
+            self._entry_keys[entry] = (key, len(grams))
+            for gram in grams:
+                self._trigrams[gram].append(entry)
+        if resource_id:
+            self._by_resource_id[resource_id].append(position)
+            # 同时支持不带包名前缀的ID
+            if ':id/' in resource_id:
+                self._by_resource_id[resource_id.split(':id/', 1)[1]].append(position)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _match(self, position: int, score: float = 1.0) -> ElementMatch:
+        offset = position * 4
+        return ElementMatch(
+            index=position,
+            text=self.texts[position],
+            resource_id=self.resource_ids[position],
+            content_desc=self.content_descs[position],
+            class_name=self.class_names[position],
+            bounds=tuple(self.bounds[offset:offset + 4]),
+            clickable=bool(self.clickable[position]),
+            score=score
+        )
+
+    def _best(self, positions: List[int]) -> Optional[int]:
+        """多个候选时优先可点击的控件"""
+        if not positions:
+            return None
+        return next((p for p in positions if self.clickable[p]), positions[0])
+
+    def find_exact(self, target: str) -> Optional[ElementMatch]:
+        """按文本、描述或resource-id精确查找"""
+        key = normalize(target)
+        for table in (self._by_text, self._by_desc):
+            position = self._best(table.get(key, []))
+            if position is not None:
+                return self._match(position)
+        position = self._best(self._by_resource_id.get(target, []))
+        return self._match(position) if position is not None else None
+
+    def find_fuzzy(self, target: str, min_score: float = 0.5, margin: float = 0.1) -> Optional[ElementMatch]:
+        """按三元组相似度模糊查找（Dice系数），得分须领先其他文本的候选至少margin"""
+        key = normalize(target)
+        grams = trigrams(key)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for entry in self._trigrams.get(gram, ()):
+                overlap[entry] += 1
+
+        scores = {}  # 控件位置 -> 文本和描述中较高的得分
+        for entry, shared in overlap.items():
+            candidate, candidate_grams = self._entry_keys[entry]
+            score = similarity(key, candidate, shared, len(grams), candidate_grams)
+            score = min(score, 0.99)  # 模糊匹配不与精确匹配同分
+            position = entry // 2
+            scores[position] = max(scores.get(position, 0.0), score)
+
+        best, best_score = None, required_score(key, min_score)
+        for position, score in scores.items():
+            if score > best_score or (score == best_score and best is not None
+                                      and self.clickable[position] and not self.clickable[best]):
+                best, best_score = position, score
+        if best is None:
+            return None
+
+        # 共享同一子串的兄弟控件（如"蓝牙设置"与"WLAN设置"）得分接近时无法判断目标，不猜测；
+        # 同文本的控件和不可点击的标题不参与比较
+        label = self._label(best)
+        runner_up = max((
+            score for position, score in scores.items()
+            if self._label(position) != label and (self.clickable[position] or not self.clickable[best])
+        ), default=0.0)
+        if best_score - runner_up < margin:
+            return None
+        return self._match(best, round(best_score, 3))
+
+    def _label(self, position: int) -> str:
+        return normalize(self.texts[position] or self.content_descs[position])
+
+    def element_at(self, box: List[float]) -> Optional[ElementMatch]:
+        """查找包含给定区域中心点的最小控件"""
+        x, y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        best, best_area = None, None
+        for position in range(len(self.texts)):
+            left, top, right, bottom = self.bounds[position * 4:position * 4 + 4]
+            if left <= x <= right and top <= y <= bottom:
+                area = (right - left) * (bottom - top)
+                if best_area is None or area < best_area:
+                    best, best_area = position, area
+        return self._match(best) if best is not None else None
+
+    def find_locator(self, locator: Dict) -> Optional[ElementMatch]:
+        """按记录的定位器（resource-id、文本、描述和边界）查找控件"""
+        candidates = None
+        if locator.get('resource_id'):
+            candidates = self._by_resource_id.get(locator['resource_id'], [])
+        elif locator.get('text'):
+            candidates = self._by_text.get(normalize(locator['text']), [])
+        elif locator.get('content_desc'):
+            candidates = self._by_desc.get(normalize(locator['content_desc']), [])
+        if not candidates:
+            return None
+        for position in candidates:
+            # 同一resource-id可能对应多个控件（如列表项），需要文本/描述也一致
+            if locator.get('text') and self.texts[position] != locator['text']:
+                continue
+            if locator.get('content_desc') and self.content_descs[position] != locator['content_desc']:
+                continue
+            return self._match(position)
+        return None
+
+    def find(
+        self,
+        target: str,
+        fuzzy: bool = True,
+        min_score: float = 0.5,
+        margin: float = 0.1
+    ) -> Optional[ElementMatch]:
+        """先精确匹配，未命中时模糊匹配"""
+        match = self.find_exact(target)
+        if match is None and fuzzy:
+            match = self.find_fuzzy(target, min_score, margin)
+        return match
+
+class HierarchyCache:
+    """每台设备当前屏幕的控件索引，屏幕变化或过期后失效"""
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        self._indexes: Dict[str, HierarchyIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, device_key: str) -> Optional[HierarchyIndex]:
+        with self._lock:
+            index = self._indexes.get(device_key)
+            if index is None or time.monotonic() - index.built_at > self.ttl:
+                self._indexes.pop(device_key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return index
+
+    def set(self, device_key: str, index: HierarchyIndex):
+        with self._lock:
+            self._indexes[device_key] = index
+
+    def invalidate(self, device_key: Optional[str] = None):
+        """屏幕可能发生变化时清除索引"""
+        with self._lock:
+            if device_key is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(device_key, None)
+
+    def get_stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'devices': len(self._indexes)}
@@ -1,20 +1,30 @@
-import aiohttp
 import json
+import time
 from app.config import Config
 import base64
-from typing import List, Dict, Optional
-from app.utils.exceptions import LLMError
+from typing import AsyncIterator, List, Dict, Optional
+from urllib.parse import urlsplit
+from app.utils.exceptions import AutomationError, LLMError
 from app.utils.logger import logger
 from app.utils.cache import cache_llm_response
-from app.utils.monitoring import monitor_llm_call
-from app.services.automation_service import AVAILABLE_ACTIONS, ActionType
+from app.utils.db import read_session
+from app.utils.http_client import PooledHTTPClient, iter_sse
+from app.utils.json_stream import JSONArrayStream
+from app.utils.monitoring import (
+    llm_request_count,
+    llm_request_latency,
+    llm_stream_first_action_latency,
+    monitor_llm_call
+)
+from app.services.automation_service import AVAILABLE_ACTIONS, COMPOSITE_ACTIONS, ActionType
+from app.services.plan_compiler import PlanCompiler
+from app.services.prompt_template import PromptTemplate
 from app.utils.response import ResponseAnalyzer, log_validation_errors
 from app.models.device import Device
 from datetime import datetime, timedelta
 from collections import defaultdict
 import numpy as np
 from app.models.task import Task, TaskResult
-from app.utils.cache import cache
 
 class PromptOptimizer:
     """提示词优化器"""
@@ -63,7 +73,7 @@ class PromptOptimizer:
             'result': task.result.value,
             'error_type': task.error_message[:50] if task.error_message else None,
             'failed_step': next(
-                (i for i, r in enumerate(task.step_results or []) if not r['success']),
+                (i for i, r in enumerate(task.get_step_results()) if not r['success']),
                 None
             )
         }
@@ -149,230 +159,82 @@ class DialogueContext:
         return summary
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None):
         self.api_key = Config.DASHSCOPE_API_KEY
-        self.text_model = Config.MODELS['text']
-        self.vision_model = Config.MODELS['vision']
+        self.models = self._resolve_models(base_url)
+        self.text_model = self.models['text']
+        self.vision_model = self.models['vision']
         self.response_analyzer = ResponseAnalyzer()
         self.max_retries = 3
         self.prompt_optimizer = PromptOptimizer()
         self.contexts = {}  # 对话上下文缓存
+        self.prompt_template = PromptTemplate(AVAILABLE_ACTIONS)
+        self.plan_compiler = PlanCompiler(AVAILABLE_ACTIONS, COMPOSITE_ACTIONS)
+        # 所有DashScope调用共享的长连接池
+        self.http_client = PooledHTTPClient(
+            limit=Config.LLM_HTTP_POOL_LIMIT,
+            limit_per_host=Config.LLM_HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=Config.LLM_HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=Config.LLM_HTTP_DNS_CACHE_TTL,
+            connect_timeout=Config.LLM_HTTP_CONNECT_TIMEOUT,
+            read_timeout=Config.LLM_HTTP_READ_TIMEOUT
+        )
+
+    @staticmethod
+    def _resolve_models(base_url: Optional[str]) -> Dict:
+        """按指定的服务地址（如本地模拟服务）替换各模型的接口地址"""
+        if not base_url:
+            return Config.MODELS
+        return {
+            key: dict(model, api_url=base_url.rstrip('/') + urlsplit(model['api_url']).path)
+            for key, model in Config.MODELS.items()
+        }
+
+    async def close(self):
+        """关闭共享的HTTP连接池"""
+        await self.http_client.close()
+
+    def get_pool_stats(self) -> Dict:
+        """获取HTTP连接池统计"""
+        return self.http_client.get_stats()
+
+    async def _make_request(self, model_key: str, payload: Dict) -> Dict:
+        """通过共享连接池调用指定模型的DashScope接口"""
+        async with self.http_client.post(
+            self.models[model_key]['api_url'],
+            headers={'Authorization': f'Bearer {self.api_key}'},
+            json=payload
+        ) as response:
+            result = await response.json()
+            if response.status != 200:
+                raise LLMError(f"{model_key} API error: {result.get('message')}")
+            return result
+
+    def cache_version(self, func_name: str) -> str:
+        """缓存键版本：提示词模板版本与所用模型"""
+        if func_name in ('analyze_image', 'analyze_image_batch'):
+            model = self.vision_model
+        elif func_name == 'recognize_text':
+            model = self.models['ocr']
+        else:
+            model = self.text_model
+        return f"{self.prompt_template.version}:{model['name']}"
 
     def _generate_action_description(self) -> str:
         """生成动作描述文本"""
-        descriptions = []
-        for action_type, spec in AVAILABLE_ACTIONS.items():
-            params_desc = []
-            for param_name, param in spec['params'].items():
-                required = "必需" if param.required else "可选"
-                default = f"，默认值：{param.default}" if param.default is not None else ""
-                params_desc.append(
-                    f"- {param_name}: {param.description} ({required}{default})"
-                )
-            
-            descriptions.append(
-                f"\n{action_type.value}：{spec['description']}\n"
-                f"参数：\n" + "\n".join(params_desc)
-            )
-        
-        return "\n".join(descriptions)
+        return self.prompt_template.catalogue
 
     def _generate_examples(self) -> str:
         """生成示例输入输出对"""
-        return """
-示例1：
-用户说：打开微信，找到张三发送"在吗？"
-输出：[
-    {
-        "type": "launch_app",
-        "params": {
-            "package": "com.tencent.mm"
-        }
-    },
-    {
-        "type": "click",
-        "params": {
-            "target": "通讯录"
-        }
-    },
-    {
-        "type": "input",
-        "params": {
-            "text": "张三"
-        }
-    },
-    {
-        "type": "click",
-        "params": {
-            "target": "张三"
-        }
-    },
-    {
-        "type": "input",
-        "params": {
-            "text": "在吗？"
-        }
-    },
-    {
-        "type": "click",
-        "params": {
-            "target": "发送"
-        }
-    }
-]
-
-示例2：
-用户说：滑动查找"订单记录"按钮然后点击
-输出：[
-    {
-        "type": "loop",
-        "params": {
-            "action": {
-                "type": "swipe",
-                "params": {
-                    "direction": "up",
-                    "duration": 0.5
-                }
-            },
-            "until": {
-                "type": "assert",
-                "params": {
-                    "target": "订单记录",
-                    "condition": "exists"
-                }
-            },
-            "max_iterations": 5
-        }
-    },
-    {
-        "type": "click",
-        "params": {
-            "target": "订单记录"
-        }
-    }
-]
-
-示例3：
-用户说：如果看到"同意"按钮就点击，否则点击"跳过"
-输出：[
-    {
-        "type": "conditional",
-        "params": {
-            "condition": {
-                "type": "assert",
-                "params": {
-                    "target": "同意",
-                    "condition": "exists"
-                }
-            },
-            "if_true": {
-                "type": "click",
-                "params": {
-                    "target": "同意"
-                }
-            },
-            "if_false": {
-                "type": "click",
-                "params": {
-                    "target": "跳过"
-                }
-            }
-        }
-    }
-]
-
-示例4：
-用户说：等待支付结果，成功后截图保存
-输出：[
-    {
-        "type": "sequence",
-        "params": {
-            "actions": [
-                {
-                    "type": "wait",
-                    "params": {
-                        "target": "支付成功",
-                        "timeout": 30
-                    }
-                },
-                {
-                    "type": "screenshot",
-                    "params": {
-                        "filename": "payment_success"
-                    }
-                }
-            ]
-        }
-    }
-]
-"""
+        return self.prompt_template.examples
 
     def _generate_device_context(self, device: Device) -> str:
         """生成设备上下文描述"""
-        constraints = device.get_automation_constraints()
-        
-        if not constraints['supported']:
-            return f"注意：当前设备({device.name})不支持自动化操作。原因：{constraints['reason']}"
-            
-        capabilities = device.capabilities
-        context = f"""
-设备信息：
-- 平台：Android {device.platform_version}
-- 设备名称：{device.name}
-- 自动化框架：uiautomator2
-
-设备支持的功能：
-- 触摸操作：{'支持' if capabilities['supports_touch'] else '不支持'}
-- 文本输入：{'支持' if capabilities['supports_input'] else '不支持'}
-- 手势操作：{'支持' if capabilities['supports_gestures'] else '不支持'}
-- 屏幕截图：{'支持' if capabilities['supports_screenshot'] else '不支持'}
-
-注意事项：
-1. 所有操作都基于Android原生UI自动化
-2. 需要确保目标元素在屏幕上可见
-3. 某些操作可能需要特定系统权限
-"""
-        return context
+        return self.prompt_template.get_device_context(device)
 
     def _generate_prompt(self, text: str, device: Device, context_summary: Optional[str] = None) -> str:
         """生成完整的提示词"""
-        device_context = self._generate_device_context(device)
-        
-        if not device.is_automation_supported():
-            return f"""
-{device_context}
-
-由于设备限制，无法执行自动化操作。请检查设备类型和状态，或选择支持的设备。
-"""
-        
-        return f"""你是一个Android设备自动化助手，负责将用户的自然语言指令转换为结构化的自动化操作序列。
-
-{device_context}
-
-可用的自动化动作如下：
-{self._generate_action_description()}
-
-请注意：
-1. 所有操作都是基于Android设备的uiautomator2框架
-2. 输出必须是合法的JSON格式
-3. 每个动作必须包含type和params两个字段
-4. 参数必须符合动作的定义要求
-5. 可以使用sequence、parallel、conditional、loop等组合动作
-6. 优先使用组合动作来处理复杂场景
-7. 确保每个必需参数都已提供
-8. 参数值类型必须正确（如数字、字符串、布尔值等）
-
-以下是一些示例：
-{self._generate_examples()}
-
-现在，请将以下用户指令转换为自动化操作序列：
-{text}
-
-请仅输出JSON格式的操作序列，不需要其他解释。
-
-上下文：
-{context_summary}
-"""
+        return self.prompt_template.render(text, device, context_summary)
 
     def _get_or_create_context(self, context_id: str) -> DialogueContext:
         """获取或创建对话上下文"""
@@ -411,42 +273,41 @@ class LLMService:
             )
             
             # 调用LLM API并处理响应
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation',
-                    headers={'Authorization': f'Bearer {self.api_key}'},
-                    json={
-                        'model': self.text_model,
-                        'input': {
-                            'prompt': prompt
-                        },
-                        'parameters': {
-                            'temperature': 0.2,
-                            'top_p': 0.9,
-                            'result_format': 'json'
-                        }
+            async with self.http_client.post(
+                self.text_model['api_url'],
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                json={
+                    'model': self.text_model['name'],
+                    'input': {
+                        'prompt': prompt
+                    },
+                    'parameters': {
+                        'temperature': 0.2,
+                        'top_p': 0.9,
+                        'result_format': 'json'
                     }
-                ) as response:
-                    result = await response.json()
+                }
+            ) as response:
+                result = await response.json()
                     
-                    if response.status != 200:
-                        raise LLMError(f"LLM API error: {result.get('message')}")
+                if response.status != 200:
+                    raise LLMError(f"LLM API error: {result.get('message')}")
                     
-                    # 验证响应
-                    content = result['output']['choices'][0]['message']['content']
-                    validation_report = self.response_analyzer.analyze_response(
-                        content,
-                        AVAILABLE_ACTIONS
-                    )
+                # 验证响应
+                content = result['output']['choices'][0]['message']['content']
+                validation_report = self.response_analyzer.analyze_response(
+                    content,
+                    AVAILABLE_ACTIONS
+                )
                     
-                    if not validation_report['is_valid']:
-                        log_validation_errors(validation_report['errors'])
-                        raise LLMError(
-                            "Invalid automation sequence",
-                            validation_report
-                        )
+                if not validation_report['is_valid']:
+                    log_validation_errors(validation_report['errors'])
+                    raise LLMError(
+                        "Invalid automation sequence",
+                        validation_report
+                    )
                     
-                    actions = json.loads(content)
+                actions = json.loads(content)
                     
             # 更新上下文
             if context:
@@ -458,6 +319,78 @@ class LLMService:
             logger.error(f"LLM analysis failed: {str(e)}", exc_info=True)
             raise LLMError(f"Failed to analyze input: {str(e)}")
 
+    async def stream_text_input(
+        self,
+        text: str,
+        device: Device,
+        context_id: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """流式生成执行步骤：每个顶层动作生成完毕并校验通过后立即产出
+
+        使用DashScope的SSE增量输出；后续步骤无效或输出不是完整的JSON数组时抛出LLMError，
+        已产出的步骤由调用方决定如何中止。流式结果不进入LLM响应缓存。
+        """
+        llm_request_count.inc()
+        started = time.time()
+        context = self._get_or_create_context(context_id) if context_id else None
+        prompt = self._generate_prompt(
+            text,
+            device,
+            context.get_context_summary() if context else None
+        )
+        parser = JSONArrayStream()
+        index = 0
+        try:
+            async with self.http_client.post(
+                self.text_model['api_url'],
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'X-DashScope-SSE': 'enable'
+                },
+                json={
+                    'model': self.text_model['name'],
+                    'input': {
+                        'prompt': prompt
+                    },
+                    'parameters': {
+                        'temperature': 0.2,
+                        'top_p': 0.9,
+                        'result_format': 'json',
+                        'incremental_output': True
+                    }
+                }
+            ) as response:
+                if response.status != 200:
+                    result = await response.json()
+                    raise LLMError(f"LLM API error: {result.get('message')}")
+
+                async for data in iter_sse(response):
+                    event = json.loads(data)
+                    if 'output' not in event:
+                        raise LLMError(f"LLM API error: {event.get('message')}")
+                    delta = event['output']['choices'][0]['message']['content']
+                    for action in parser.feed(delta):
+                        try:
+                            self.plan_compiler.compile_action(action, str(index))
+                        except AutomationError as e:
+                            raise LLMError(f"Invalid automation sequence: {str(e)}")
+                        if index == 0:
+                            llm_stream_first_action_latency.observe(time.time() - started)
+                        index += 1
+                        yield action
+            parser.close()
+
+            if context:
+                context.variables.update(self._extract_variables(text))
+
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error(f"LLM streaming analysis failed: {str(e)}", exc_info=True)
+            raise LLMError(f"Failed to analyze input: {str(e)}")
+        finally:
+            llm_request_latency.observe(time.time() - started)
+
     def _extract_variables(self, text: str) -> Dict:
         """从用户输入中提取上下文变量"""
         # 简单的变量提取示例
@@ -495,25 +428,24 @@ class LLMService:
 
     async def _call_llm_api(self, text: str) -> Dict:
         """调用LLM API"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation',
-                headers={'Authorization': f'Bearer {self.api_key}'},
-                json={
-                    'model': self.text_model,
-                    'input': {
-                        'prompt': self._generate_prompt(text)
-                    },
-                    'parameters': {
-                        'temperature': 0.2,
-                        'top_p': 0.9,
-                        'result_format': 'json'
-                    }
+        async with self.http_client.post(
+            self.text_model['api_url'],
+            headers={'Authorization': f'Bearer {self.api_key}'},
+            json={
+                'model': self.text_model['name'],
+                'input': {
+                    'prompt': self._generate_prompt(text)
+                },
+                'parameters': {
+                    'temperature': 0.2,
+                    'top_p': 0.9,
+                    'result_format': 'json'
                 }
-            ) as response:
-                if response.status != 200:
-                    raise LLMError(f"API request failed: {response.status}")
-                return await response.json()
+            }
+        ) as response:
+            if response.status != 200:
+                raise LLMError(f"API request failed: {response.status}")
+            return await response.json()
 
     def _parse_llm_response(self, result: Dict) -> List[Dict]:
         """解析LLM响应"""
@@ -527,49 +459,16 @@ class LLMService:
             raise LLMError("Invalid response format")
 
     def _validate_actions(self, actions: List[Dict]) -> None:
-        """验证动作列表的合法性"""
-        from app.services.automation_service import AutomationService
-        automation_service = AutomationService()
-        
-        def validate_action(action):
-            if not isinstance(action, dict):
-                raise LLMError("Action must be a dictionary")
-            if 'type' not in action:
-                raise LLMError("Action must have 'type' field")
-            if 'params' not in action:
-                raise LLMError("Action must have 'params' field")
-            
-            # 验证动作格式
-            automation_service.validate_action(action)
-            
-            # 递归验证组合动作
-            params = action['params']
-            if action['type'] == 'sequence':
-                for sub_action in params.get('actions', []):
-                    validate_action(sub_action)
-            elif action['type'] == 'parallel':
-                for sub_action in params.get('actions', []):
-                    validate_action(sub_action)
-            elif action['type'] == 'conditional':
-                if 'condition' in params:
-                    validate_action(params['condition'])
-                if 'if_true' in params:
-                    validate_action(params['if_true'])
-                if 'if_false' in params:
-                    validate_action(params['if_false'])
-            elif action['type'] == 'loop':
-                if 'action' in params:
-                    validate_action(params['action'])
-                if 'until' in params:
-                    validate_action(params['until'])
-        
-        for action in actions:
-            validate_action(action)
+        """验证动作列表的合法性（含组合动作的子动作）"""
+        try:
+            self.plan_compiler.compile_plan(actions)
+        except AutomationError as e:
+            raise LLMError(str(e))
 
     async def analyze_audio_input(self, audio_file_path: str) -> list:
         """使用qwen-audio-turbo分析语音输入"""
         payload = {
-            "model": self.text_model,
+            "model": Config.MODELS['audio']['name'],
             "input": {
                 "messages": [
                     {
@@ -589,7 +488,7 @@ class LLMService:
     async def perform_ocr(self, image_path: str) -> dict:
         """使用qwen-vl-ocr进行OCR识别"""
         payload = {
-            "model": self.text_model,
+            "model": Config.MODELS['ocr']['name'],
             "input": {
                 "messages": [
                     {
@@ -606,10 +505,51 @@ class LLMService:
         result = await self._make_request('ocr', payload)
         return self._parse_ocr_response(result)
 
+    @monitor_llm_call
+    @cache_llm_response(timeout=60)
+    async def recognize_text(self, image_base64: str) -> List[Dict]:
+        """使用qwen-vl-ocr识别图像中的文字及其位置"""
+        payload = {
+            "model": self.models['ocr']['name'],
+            "input": {
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": [
+                            {"image": image_base64},
+                            {"text": (
+                                "识别图片中的所有文字行，以JSON数组返回，不要输出其他内容："
+                                '[{"text": "文字", "box": [x1, y1, x2, y2]}]'
+                            )}
+                        ]
+                    }
+                ]
+            }
+        }
+
+        try:
+            result = await self._make_request('ocr', payload)
+            content = result['output']['choices'][0]['message']['content']
+            if isinstance(content, list):
+                content = ''.join(part.get('text', '') for part in content)
+            # 去掉模型可能附带的代码块标记
+            content = content.strip().strip('`')
+            if content.startswith('json'):
+                content = content[4:]
+            lines = json.loads(content)
+            return [
+                {'text': line['text'], 'box': [float(value) for value in line['box']]}
+                for line in lines
+                if line.get('text') and len(line.get('box', [])) == 4
+            ]
+        except Exception as e:
+            logger.error(f"OCR failed: {str(e)}", exc_info=True)
+            raise LLMError(f"Failed to recognize text: {str(e)}")
+
     async def analyze_screen(self, screenshot_path: str) -> dict:
         """使用qwen-vl-max分析屏幕截图"""
         payload = {
-            "model": self.text_model,
+            "model": Config.MODELS['vision']['name'],
             "input": {
                 "messages": [
                     {
@@ -694,57 +634,123 @@ class LLMService:
     ) -> Dict:
         """分析图像并定位UI元素"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation',
-                    headers={'Authorization': f'Bearer {self.api_key}'},
-                    json={
-                        'model': self.vision_model,
-                        'input': {
-                            'prompt': query,
-                            'image': image_base64
-                        },
-                        'parameters': {
-                            'temperature': temperature,
-                            'result_format': 'json'
-                        }
+            async with self.http_client.post(
+                self.vision_model['api_url'],
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                json={
+                    'model': self.vision_model['name'],
+                    'input': {
+                        'prompt': query,
+                        'image': image_base64
+                    },
+                    'parameters': {
+                        'temperature': temperature,
+                        'result_format': 'json'
                     }
-                ) as response:
-                    result = await response.json()
+                }
+            ) as response:
+                result = await response.json()
                     
-                    if response.status != 200:
-                        raise LLMError(f"Vision API error: {result.get('message')}")
+                if response.status != 200:
+                    raise LLMError(f"Vision API error: {result.get('message')}")
                     
-                    try:
-                        # 解析并验证响应
-                        content = result['output']['choices'][0]['message']['content']
-                        response_data = json.loads(content)
+                try:
+                    # 解析并验证响应
+                    content = result['output']['choices'][0]['message']['content']
+                    response_data = json.loads(content)
                         
-                        # 验证响应格式
-                        required_fields = ['found', 'confidence', 'box']
-                        if not all(field in response_data for field in required_fields):
-                            raise LLMError("Invalid vision analysis response format")
-                            
-                        # 验证坐标值
-                        box = response_data['box']
-                        if len(box) != 4 or not all(isinstance(x, (int, float)) for x in box):
-                            raise LLMError("Invalid bounding box coordinates")
-                            
-                        return response_data
+                    # 验证响应格式和坐标值
+                    return self._validate_vision_result(response_data)
                         
-                    except json.JSONDecodeError:
-                        raise LLMError("Invalid JSON response from vision model")
-                    except Exception as e:
-                        raise LLMError(f"Failed to parse vision analysis response: {str(e)}")
+                except json.JSONDecodeError:
+                    raise LLMError("Invalid JSON response from vision model")
+                except Exception as e:
+                    raise LLMError(f"Failed to parse vision analysis response: {str(e)}")
                     
         except Exception as e:
             logger.error(f"Vision analysis failed: {str(e)}", exc_info=True)
             raise LLMError(f"Failed to analyze image: {str(e)}")
 
+    @staticmethod
+    def _validate_vision_result(data) -> Dict:
+        """校验单个定位结果的字段和坐标"""
+        if not isinstance(data, dict):
+            raise LLMError("Vision result must be an object")
+        required_fields = ['found', 'confidence', 'box']
+        if not all(field in data for field in required_fields):
+            raise LLMError("Invalid vision analysis response format")
+        box = data['box']
+        if len(box) != 4 or not all(isinstance(x, (int, float)) for x in box):
+            raise LLMError("Invalid bounding box coordinates")
+        return data
+
+    @monitor_llm_call
+    @cache_llm_response(timeout=60)
+    async def analyze_image_batch(
+        self,
+        image_base64: str,
+        targets: List[str],
+        element_type: str = "button",
+        temperature: float = 0.2
+    ) -> List[Dict]:
+        """在同一张截图上一次定位多个元素，结果与targets一一对应"""
+        listing = "\n".join(f'[{index}] "{target}"' for index, target in enumerate(targets))
+        query = (
+            f"在这个Android应用界面截图中，请分别找到以下{element_type}：\n{listing}\n"
+            "按编号顺序返回JSON数组，每个元素格式：\n"
+            '{"index": 编号, "found": true/false, "confidence": 0.0-1.0, '
+            '"box": [x1, y1, x2, y2], "description": "元素位置描述"}'
+        )
+        try:
+            async with self.http_client.post(
+                self.vision_model['api_url'],
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                json={
+                    'model': self.vision_model['name'],
+                    'input': {
+                        'prompt': query,
+                        'image': image_base64
+                    },
+                    'parameters': {
+                        'temperature': temperature,
+                        'result_format': 'json'
+                    }
+                }
+            ) as response:
+                result = await response.json()
+
+                if response.status != 200:
+                    raise LLMError(f"Vision API error: {result.get('message')}")
+
+                content = result['output']['choices'][0]['message']['content']
+                items = json.loads(content)
+                if not isinstance(items, list):
+                    raise LLMError("Batch vision response must be a JSON array")
+
+        except Exception as e:
+            logger.error(f"Batch vision analysis failed: {str(e)}", exc_info=True)
+            raise LLMError(f"Failed to analyze image: {str(e)}")
+
+        # 按编号对应目标，缺少编号时按顺序对应
+        by_index = {}
+        for position, item in enumerate(items):
+            index = item.get('index', position) if isinstance(item, dict) else position
+            by_index.setdefault(index, item)
+
+        # 每个结果单独校验，个别目标格式错误不影响其他目标
+        results = []
+        for index, target in enumerate(targets):
+            try:
+                results.append(self._validate_vision_result(by_index.get(index)))
+            except LLMError as e:
+                logger.warning(f"Discarding vision result for '{target}': {str(e)}")
+                results.append({'found': False, 'confidence': 0.0, 'box': [0, 0, 0, 0], 'description': ''})
+        return results
+
     async def optimize_prompts(self):
         """定期优化提示词"""
         # 获取最近的任务
-        recent_tasks = Task.query.filter(
+        recent_tasks = read_session().query(Task).filter(
             Task.end_time > datetime.utcnow() - timedelta(days=7)
         ).all()
         
@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.services.hierarchy_index import ElementMatch, HierarchyIndex, normalize, required_score, text_similarity
+from app.services.screen_cache import dhash
+from app.utils.logger import logger
+from app.utils.monitoring import locator_resolutions, locator_tier_latency
+
+# 定位层级，按开销从低到高依次尝试
+TIERS = ('cache', 'hierarchy', 'ocr', 'vision')
+
+@dataclass
+class LocatorResult:
+    """元素定位结果（设备坐标）"""
+    tier: str
+    box: List[float]
+    confidence: float
+    description: str = ''
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return (self.box[0] + self.box[2]) / 2, (self.box[1] + self.box[3]) / 2
+
+class LocatorCache:
+    """记住每个应用中目标元素对应的控件定位器，下次直接在控件索引中查找"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # (应用包名, 目标) -> 定位器
+        self._lock = threading.Lock()
+
+    def get(self, package: str, target: str) -> Optional[Dict]:
+        with self._lock:
+            locator = self._data.get((package, target))
+            if locator is not None:
+                self._data.move_to_end((package, target))
+            return locator
+
+    def set(self, package: str, target: str, locator: Dict):
+        with self._lock:
+            self._data[(package, target)] = locator
+            self._data.move_to_end((package, target))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, package: str, target: str):
+        with self._lock:
+            self._data.pop((package, target), None)
+
+class ElementLocator:
+    """分层元素定位：定位器缓存 → 控件索引 → 局部OCR → 视觉模型"""
+
+    def __init__(
+        self,
+        service,
+        budgets: Optional[Dict[str, Optional[float]]] = None,
+        min_score: float = 0.6,
+        margin: float = 0.1,
+        hash_size: int = 16,
+        ocr_max_edge: int = 960,
+        ocr_crop: Tuple[float, float] = (0.04, 0.94)
+    ):
+        self.service = service  # AutomationService，提供设备调用、截图和模型访问
+        self.budgets = budgets or {}  # 层级 -> 时间预算(秒)，None表示不限
+        self.min_score = min_score
+        self.margin = margin  # 模糊匹配须领先其他候选的相似度差值
+        self.hash_size = hash_size  # 屏幕感知哈希边长，与视觉定位的屏幕缓存一致
+        self.ocr_max_edge = ocr_max_edge
+        self.ocr_crop = ocr_crop  # OCR裁剪的纵向范围，去掉状态栏和导航栏
+        self.locators = LocatorCache()
+        self.stats = Counter()
+
+    async def locate(self, device, target: str, element_type: str = 'button') -> Optional[LocatorResult]:
+        """按层级依次定位目标元素，返回第一个成功的结果"""
+        state = {}  # 各层之间共享的控件索引和截图
+        for tier in TIERS:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    getattr(self, f'_locate_{tier}')(device, target, element_type, state),
+                    self.budgets.get(tier)
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Locator tier '{tier}' exceeded its budget for '{target}'")
+                result = None
+            except Exception as e:
+                logger.warning(f"Locator tier '{tier}' failed for '{target}': {str(e)}")
+                result = None
+            finally:
+                locator_tier_latency.labels(tier=tier).observe(time.perf_counter() - started)
+
+            if result is not None:
+                self.stats[tier] += 1
+                locator_resolutions.labels(tier=tier).inc()
+                if tier in ('ocr', 'vision'):
+                    await self._learn(device, target, result, state)
+                return result
+
+        self.stats['none'] += 1
+        locator_resolutions.labels(tier='none').inc()
+        return None
+
+    async def _index(self, device, state: Dict) -> Optional[HierarchyIndex]:
+        if 'index' not in state:
+            state['index'] = await self.service._get_hierarchy(device)
+        return state['index']
+
+    @staticmethod
+    def _from_match(tier: str, match: ElementMatch) -> LocatorResult:
+        return LocatorResult(
+            tier=tier,
+            box=list(match.bounds),
+            confidence=match.score,
+            description=match.text or match.content_desc or match.resource_id
+        )
+
+    async def _locate_cache(self, device, target, element_type, state) -> Optional[LocatorResult]:
+        """用之前解析出的定位器在当前控件索引中查找"""
+        index = await self._index(device, state)
+        if index is None:
+            return None
+        locator = self.locators.get(index.package, target)
+        if locator is None:
+            return None
+        match = index.find_locator(locator)
+        return self._from_match('cache', match) if match else None
+
+    async def _locate_hierarchy(self, device, target, element_type, state) -> Optional[LocatorResult]:
+        """在控件索引中按文本精确或模糊匹配"""
+        index = await self._index(device, state)
+        if index is None:
+            return None
+        match = index.find(target, min_score=self.min_score, margin=self.margin)
+        return self._from_match('hierarchy', match) if match else None
+
+    async def _screen(self, device, state: Dict):
+        if 'screen' not in state:
+            state['screen'] = await self.service._grab_screenshot(device)
+        return state['screen']
+
+    async def _locate_ocr(self, device, target, element_type, state) -> Optional[LocatorResult]:
+        """对去掉状态栏和导航栏的缩小截图做OCR，按文字相似度匹配"""
+        screen = await self._screen(device, state)
+        width, height = screen.device_size
+        region = (0, int(height * self.ocr_crop[0]), width, int(height * self.ocr_crop[1]))
+
+        # 同一屏幕的OCR结果按感知哈希缓存，屏幕上其他目标可直接复用
+        device_key = self.service._device_key(device)
+        screen_hash = dhash(screen.hash_image(), self.hash_size)
+        lines = self.service.screen_cache.lookup(device_key, screen_hash, 'ocr:*')
+        if lines is None:
+            crop = self.service.screenshot_pipeline.crop(screen, region, self.ocr_max_edge)
+            lines = [
+                dict(line, box=crop.to_device_box(line['box']))
+                for line in await self.service.llm_service.recognize_text(crop.payload)
+            ]
+            self.service.screen_cache.store(device_key, screen_hash, 'ocr:*', lines)
+
+        scored = [(text_similarity(target, line['text']), line) for line in lines]
+        best, best_score = None, required_score(target, self.min_score)
+        for score, line in scored:
+            if score >= best_score:
+                best, best_score = line, score
+        if best is None:
+            return None
+        # 与其他文字得分接近时（共享同一子串的相邻文字）不猜测
+        runner_up = max((
+            score for score, line in scored if normalize(line['text']) != normalize(best['text'])
+        ), default=0.0)
+        if best_score < 1 and best_score - runner_up < self.margin:
+            return None
+        return LocatorResult('ocr', best['box'], round(best_score, 3), best['text'])
+
+    async def _locate_vision(self, device, target, element_type, state) -> Optional[LocatorResult]:
+        """调用视觉模型定位"""
+        # 复用OCR层已截取的屏幕作为第一次尝试，并顺带定位计划中随后的目标
+        element = await self.service._find_element_with_vision(
+            device,
+            target,
+            element_type,
+            screen=state.get('screen'),
+            companions=self._companions(device, target, state)
+        )
+        if not element or not element.get('found'):
+            return None
+        return LocatorResult(
+            'vision',
+            element['box'],
+            element.get('confidence', 0.0),
+            element.get('description', '')
+        )
+
+    def _companions(self, device, target: str, state: Dict) -> List[str]:
+        """计划中随后的点击目标，排除控件索引或定位器缓存已能解析的"""
+        index = state.get('index')
+        companions = []
+        for companion in self.service.lookahead.get(self.service._device_key(device), ()):
+            if companion == target:
+                continue
+            if index is not None and (
+                self.locators.get(index.package, companion) is not None
+                or index.find(companion, min_score=self.min_score, margin=self.margin) is not None
+            ):
+                continue
+            companions.append(companion)
+        return companions
+
+    async def _learn(self, device, target: str, result: LocatorResult, state: Dict):
+        """把OCR/视觉定位结果对应到控件上，下次由定位器缓存直接解析"""
+        if result.tier == 'vision':
+            # 视觉定位可能滑动过屏幕，需要重新获取控件索引
+            state.pop('index', None)
+        index = await self._index(device, state)
+        if index is None:
+            return
+        match = index.element_at(result.box)
+        if match is not None and (match.resource_id or match.text or match.content_desc):
+            self.locators.set(index.package, target, match.to_locator())
+
+    def get_stats(self) -> Dict:
+        """各层级解析的目标数"""
+        total = sum(self.stats.values())
+        return {
+            'total': total,
+            'by_tier': dict(self.stats),
+            'expensive_ratio': (
+                (self.stats['ocr'] + self.stats['vision']) / total if total else 0.0
+            )
+        }
@@ -0,0 +1,90 @@
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple
+from app.utils.exceptions import AutomationError
+
+class ActionNode(NamedTuple):
+    """编译后的动作节点（不可变）
+
+    params中已填入默认值，组合动作的子动作已编译为ActionNode（列表参数为元组）。
+    """
+    type: Any  # ActionType
+    params: Mapping[str, Any]
+    path: str  # 在计划中的位置，如 "2.actions.0"
+
+    @property
+    def value(self) -> str:
+        return self.type.value
+
+class PlanCompiler:
+    """把LLM生成的JSON计划按动作定义校验一次，编译为动作节点树"""
+
+    def __init__(self, available_actions: Dict, composite_actions: Tuple = ()):
+        self.available_actions = available_actions
+        self.action_types = {action_type.value: action_type for action_type in available_actions}
+        # 组合动作中dict类型的参数是单个子动作，list类型的参数是子动作列表
+        self.composite_actions = set(composite_actions)
+
+    def compile_plan(self, steps: List[Dict]) -> Tuple[ActionNode, ...]:
+        """编译整个执行计划"""
+        if not isinstance(steps, (list, tuple)):
+            raise AutomationError("Execution plan must be a list of actions")
+        return tuple(self.compile_action(step, str(index)) for index, step in enumerate(steps))
+
+    def compile_action(self, action: Dict, path: str = '0') -> ActionNode:
+        """校验单个动作（含子动作）并填入参数默认值"""
+        if isinstance(action, ActionNode):
+            return action
+        if not isinstance(action, dict):
+            raise AutomationError(f"Invalid action at {path}: action must be an object")
+
+        action_type = self.action_types.get(action.get('type'))
+        if action_type is None:
+            raise AutomationError(f"Invalid action at {path}: unknown action type '{action.get('type')}'")
+
+        spec = self.available_actions[action_type]['params']
+        params = action.get('params', {})
+        if not isinstance(params, dict):
+            raise AutomationError(f"Invalid action at {path}: params must be an object")
+
+        # 检查必需参数
+        for param_name, param_spec in spec.items():
+            if param_spec.required and param_name not in params:
+                raise AutomationError(
+                    f"Missing required parameter '{param_name}' for action '{action_type.value}' at {path}"
+                )
+
+        compiled = {}
+        for param_name, param_value in params.items():
+            param_spec = spec.get(param_name)
+            if param_spec is None:
+                raise AutomationError(
+                    f"Unknown parameter '{param_name}' for action '{action_type.value}' at {path}"
+                )
+            if not isinstance(param_value, param_spec.type):
+                raise AutomationError(
+                    f"Invalid type for parameter '{param_name}' at {path}, "
+                    f"expected {param_spec.type.__name__}"
+                )
+            if param_spec.validator is not None and not param_spec.validator(param_value):
+                raise AutomationError(f"Invalid value for parameter '{param_name}' at {path}")
+            compiled[param_name] = self._compile_param(action_type, param_name, param_value, path)
+
+        # 未提供的可选参数使用默认值，执行时无需再判断
+        for param_name, param_spec in spec.items():
+            if param_name not in compiled:
+                compiled[param_name] = param_spec.default
+
+        return ActionNode(action_type, MappingProxyType(compiled), path)
+
+    def _compile_param(self, action_type, param_name: str, value: Any, path: str) -> Any:
+        if action_type not in self.composite_actions:
+            return value
+        child_path = f"{path}.{param_name}"
+        if isinstance(value, dict):
+            return self.compile_action(value, child_path)
+        if isinstance(value, list):
+            return tuple(
+                self.compile_action(child, f"{child_path}.{index}")
+                for index, child in enumerate(value)
+            )
+        return value
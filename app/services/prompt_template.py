@@ -0,0 +1,301 @@
+import hashlib
+import threading
+from typing import Dict, Optional
+from app.models.device import Device
+
+# 提示词开头的角色说明
+PROMPT_PREAMBLE = "你是一个Android设备自动化助手，负责将用户的自然语言指令转换为结构化的自动化操作序列。"
+
+# 输出规则
+PROMPT_RULES = """请注意：
+1. 所有操作都是基于Android设备的uiautomator2框架
+2. 输出必须是合法的JSON格式
+3. 每个动作必须包含type和params两个字段
+4. 参数必须符合动作的定义要求
+5. 可以使用sequence、parallel、conditional、loop等组合动作
+6. 优先使用组合动作来处理复杂场景
+7. 确保每个必需参数都已提供
+8. 参数值类型必须正确（如数字、字符串、布尔值等）"""
+
+# 示例输入输出对
+PROMPT_EXAMPLES = """
+示例1：
+用户说：打开微信，找到张三发送"在吗？"
+输出：[
+    {
+        "type": "launch_app",
+        "params": {
+            "package": "com.tencent.mm"
+        }
+    },
+    {
+        "type": "click",
+        "params": {
+            "target": "通讯录"
+        }
+    },
+    {
+        "type": "input",
+        "params": {
+            "text": "张三"
+        }
+    },
+    {
+        "type": "click",
+        "params": {
+            "target": "张三"
+        }
+    },
+    {
+        "type": "input",
+        "params": {
+            "text": "在吗？"
+        }
+    },
+    {
+        "type": "click",
+        "params": {
+            "target": "发送"
+        }
+    }
+]
+
+示例2：
+用户说：滑动查找"订单记录"按钮然后点击
+输出：[
+    {
+        "type": "loop",
+        "params": {
+            "action": {
+                "type": "swipe",
+                "params": {
+                    "direction": "up",
+                    "duration": 0.5
+                }
+            },
+            "until": {
+                "type": "assert",
+                "params": {
+                    "target": "订单记录",
+                    "condition": "exists"
+                }
+            },
+            "max_iterations": 5
+        }
+    },
+    {
+        "type": "click",
+        "params": {
+            "target": "订单记录"
+        }
+    }
+]
+
+示例3：
+用户说：如果看到"同意"按钮就点击，否则点击"跳过"
+输出：[
+    {
+        "type": "conditional",
+        "params": {
+            "condition": {
+                "type": "assert",
+                "params": {
+                    "target": "同意",
+                    "condition": "exists"
+                }
+            },
+            "if_true": {
+                "type": "click",
+                "params": {
+                    "target": "同意"
+                }
+            },
+            "if_false": {
+                "type": "click",
+                "params": {
+                    "target": "跳过"
+                }
+            }
+        }
+    }
+]
+
+示例4：
+用户说：等待支付结果，成功后截图保存
+输出：[
+    {
+        "type": "sequence",
+        "params": {
+            "actions": [
+                {
+                    "type": "wait",
+                    "params": {
+                        "target": "支付成功",
+                        "timeout": 30
+                    }
+                },
+                {
+                    "type": "screenshot",
+                    "params": {
+                        "filename": "payment_success"
+                    }
+                }
+            ]
+        }
+    }
+]
+"""
+
+def render_action_catalogue(actions: Dict) -> str:
+    """生成动作描述文本"""
+    descriptions = []
+    for action_type, spec in actions.items():
+        params_desc = []
+        for param_name, param in spec['params'].items():
+            required = "必需" if param.required else "可选"
+            default = f"，默认值：{param.default}" if param.default is not None else ""
+            params_desc.append(
+                f"- {param_name}: {param.description} ({required}{default})"
+            )
+
+        descriptions.append(
+            f"\n{action_type.value}：{spec['description']}\n"
+            f"参数：\n" + "\n".join(params_desc)
+        )
+
+    return "\n".join(descriptions)
+
+def render_device_context(device: Device) -> str:
+    """生成设备上下文描述（只依赖设备能力指纹涵盖的字段）"""
+    constraints = device.get_automation_constraints()
+
+    if not constraints['supported']:
+        return f"注意：当前设备({device.name})不支持自动化操作。原因：{constraints['reason']}"
+
+    capabilities = device.capabilities
+    return f"""
+设备信息：
+- 平台：Android {device.platform_version}
+- 自动化框架：uiautomator2
+
+设备支持的功能：
+- 触摸操作：{'支持' if capabilities['supports_touch'] else '不支持'}
+- 文本输入：{'支持' if capabilities['supports_input'] else '不支持'}
+- 手势操作：{'支持' if capabilities['supports_gestures'] else '不支持'}
+- 屏幕截图：{'支持' if capabilities['supports_screenshot'] else '不支持'}
+
+注意事项：
+1. 所有操作都基于Android原生UI自动化
+2. 需要确保目标元素在屏幕上可见
+3. 某些操作可能需要特定系统权限
+"""
+
+class PromptTemplate:
+    """预编译的提示词模板"""
+    # 静态前缀（角色、动作目录、规则、示例）只渲染一次并保持字节稳定，
+    # 以便服务端的前缀缓存命中；设备上下文按能力指纹缓存，
+    # 每次请求只格式化用户指令和上下文摘要
+
+    def __init__(self, actions: Dict, examples: str = PROMPT_EXAMPLES, max_device_contexts: int = 256):
+        self.actions = actions
+        self.examples = examples
+        self.max_device_contexts = max_device_contexts
+        self._version = None  # 静态前缀的内容摘要
+        self._prefix = None
+        self._catalogue = None
+        self._signature = None
+        self._device_contexts = {}  # 能力指纹 -> 设备上下文
+        self._lock = threading.Lock()
+
+    def _actions_signature(self) -> tuple:
+        """计算动作目录的轻量签名，用于判断AVAILABLE_ACTIONS是否变化"""
+        return tuple(
+            (
+                action_type,
+                id(spec),
+                spec['description'],
+                tuple((name, id(param)) for name, param in spec['params'].items())
+            )
+            for action_type, spec in self.actions.items()
+        )
+
+    def invalidate(self):
+        """使静态前缀失效（原地修改动作参数定义后需要显式调用）"""
+        with self._lock:
+            self._prefix = None
+            self._catalogue = None
+            self._signature = None
+            self._version = None
+
+    def _ensure_compiled(self):
+        """按需渲染静态前缀"""
+        signature = self._actions_signature()
+        if self._prefix is not None and signature == self._signature:
+            return
+        with self._lock:
+            if self._prefix is not None and signature == self._signature:
+                return
+            catalogue = render_action_catalogue(self.actions)
+            prefix = (
+                f"{PROMPT_PREAMBLE}\n\n"
+                f"可用的自动化动作如下：\n{catalogue}\n\n"
+                f"{PROMPT_RULES}\n\n"
+                f"以下是一些示例：\n{self.examples}\n"
+            )
+            self._catalogue = catalogue
+            self._prefix = prefix
+            self._signature = signature
+            self._version = hashlib.sha1(prefix.encode('utf-8')).hexdigest()[:12]
+            # 前缀变化后旧的设备上下文仍然有效，无需清理
+
+    @property
+    def prefix(self) -> str:
+        """获取静态前缀"""
+        self._ensure_compiled()
+        return self._prefix
+
+    @property
+    def version(self) -> str:
+        """获取静态前缀版本，用于缓存键和任务记录"""
+        self._ensure_compiled()
+        return self._version
+
+    @property
+    def catalogue(self) -> str:
+        """获取动作目录描述"""
+        self._ensure_compiled()
+        return self._catalogue
+
+    def get_device_context(self, device: Device) -> str:
+        """获取设备上下文，按能力指纹缓存"""
+        if not device.is_automation_supported():
+            # 不支持自动化时的提示包含设备名称，不做缓存
+            return render_device_context(device)
+
+        fingerprint = device.capability_fingerprint()
+        context = self._device_contexts.get(fingerprint)
+        if context is None:
+            context = render_device_context(device)
+            if len(self._device_contexts) >= self.max_device_contexts:
+                self._device_contexts.pop(next(iter(self._device_contexts)))
+            self._device_contexts[fingerprint] = context
+        return context
+
+    def render(self, text: str, device: Device, context_summary: Optional[str] = None) -> str:
+        """渲染完整提示词，静态前缀在前、变化部分在后"""
+        device_context = self.get_device_context(device)
+
+        if not device.is_automation_supported():
+            return f"""
+{device_context}
+
+由于设备限制，无法执行自动化操作。请检查设备类型和状态，或选择支持的设备。
+"""
+
+        return (
+            f"{self.prefix}\n"
+            f"{device_context}\n"
+            f"现在，请将以下用户指令转换为自动化操作序列：\n{text}\n\n"
+            f"请仅输出JSON格式的操作序列，不需要其他解释。\n\n"
+            f"上下文：\n{context_summary}\n"
+        )
@@ -0,0 +1,116 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+from app.utils.logger import logger
+from app.utils.monitoring import action_retries
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """重试策略：最多尝试次数和带抖动的指数退避"""
+    max_attempts: int = 3
+    base_delay: float = 0.5  # 第一次重试前的等待(秒)
+    max_delay: float = 8.0
+    multiplier: float = 2.0
+    jitter: float = 0.5  # 等待时间在[1-jitter, 1]倍之间随机
+
+    def delay(self, retry: int, rng: random.Random = random) -> float:
+        """第retry次重试(从1开始)前的等待时间"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (retry - 1))
+        return delay * rng.uniform(1 - self.jitter, 1)
+
+class RetryBudget:
+    """单个任务的重试时间预算和重试计数"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.retries = 0
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def allows(self, delay: float) -> bool:
+        """等待delay秒后是否仍在预算内"""
+        remaining = self.remaining()
+        return remaining is None or remaining > delay
+
+# 当前任务的重试预算，由execute_plan设置，并行的子动作共享同一预算
+current_budget: ContextVar[Optional[RetryBudget]] = ContextVar('retry_budget', default=None)
+
+def error_chain(error: BaseException) -> Iterator[BaseException]:
+    """遍历异常及其原因链（处理函数常把底层异常包装为AutomationError）"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+class RetryEngine:
+    """只在叶子动作上重试，按错误类型、动作类型选择策略"""
+
+    def __init__(
+        self,
+        default: RetryPolicy = RetryPolicy(),
+        action_policies: Optional[Dict[str, RetryPolicy]] = None,
+        error_policies: Optional[Dict[str, RetryPolicy]] = None,
+        rng: Optional[random.Random] = None
+    ):
+        self.default = default
+        self.action_policies = action_policies or {}  # 动作类型 -> 策略
+        self.error_policies = error_policies or {}  # 异常类名 -> 策略，优先于动作类型
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_config(cls, config) -> 'RetryEngine':
+        """由Config中的RETRY_*配置构建"""
+        default = RetryPolicy(**config.RETRY_DEFAULT_POLICY)
+        return cls(
+            default=default,
+            action_policies={
+                action: replace(default, **options)
+                for action, options in config.RETRY_ACTION_POLICIES.items()
+            },
+            error_policies={
+                name: replace(default, **options)
+                for name, options in config.RETRY_ERROR_POLICIES.items()
+            }
+        )
+
+    def policy_for(self, action: str, error: Optional[BaseException] = None) -> RetryPolicy:
+        """错误策略优先，其次动作类型策略，最后默认策略"""
+        if error is not None and self.error_policies:
+            for cause in error_chain(error):
+                for cls in type(cause).__mro__:
+                    policy = self.error_policies.get(cls.__name__)
+                    if policy is not None:
+                        return policy
+        return self.action_policies.get(action, self.default)
+
+    async def run(self, action: str, attempt: Callable[[], Awaitable], budget: Optional[RetryBudget] = None):
+        """执行attempt，失败时按策略重试"""
+        budget = budget if budget is not None else current_budget.get()
+        retry = 0
+        while True:
+            try:
+                return await attempt()
+            except Exception as e:
+                retry += 1
+                policy = self.policy_for(action, e)
+                if retry >= policy.max_attempts:
+                    raise
+                delay = policy.delay(retry, self.rng)
+                if budget is not None and not budget.allows(delay):
+                    logger.warning(f"Retry budget exhausted, giving up on '{action}': {str(e)}")
+                    raise
+                if budget is not None:
+                    budget.retries += 1
+                action_retries.labels(action=action).inc()
+                logger.warning(
+                    f"Action '{action}' failed (attempt {retry}/{policy.max_attempts}), "
+                    f"retrying in {delay:.2f}s: {str(e)}"
+                )
+                await asyncio.sleep(delay)
@@ -0,0 +1,386 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from app.utils.exceptions import DeviceError
+from app.utils.logger import logger
+from app.utils.monitoring import (
+    scheduler_queue_length,
+    scheduler_running_tasks,
+    device_pool_utilisation
+)
+
+@dataclass
+class DeviceLease:
+    """任务对设备的独占租约"""
+    device_id: str
+    task_id: int
+    user_id: Optional[int] = None
+    acquired_at: float = field(default_factory=time.monotonic)
+
+@dataclass
+class PooledDevice:
+    """设备池中的设备"""
+    device_id: str
+    capabilities: Optional[Dict] = None
+    healthy: bool = True
+    lease: Optional[DeviceLease] = None
+    busy_seconds: float = 0.0
+    completed_leases: int = 0
+
+@dataclass
+class _Waiter:
+    """等待设备的任务"""
+    future: asyncio.Future
+    task_id: int
+    user_id: Optional[int]
+    device_id: Optional[str]
+    requirements: Dict
+    exclude: Set[str]
+
+class DevicePool:
+    """设备池：按任务独占租用设备，并执行全局与单用户并发限制"""
+
+    def __init__(
+        self,
+        max_concurrent_tasks: int = 50,
+        max_tasks_per_user: int = 5,
+        unhealthy_cooldown: float = 60
+    ):
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.max_tasks_per_user = max_tasks_per_user
+        self.unhealthy_cooldown = unhealthy_cooldown  # 故障设备重新参与分配前的冷却时间(秒)
+        self._devices: Dict[str, PooledDevice] = {}
+        self._waiters = deque()
+        self._user_active = defaultdict(int)
+        self._active = 0
+
+    def register(self, device_id: str, capabilities: Optional[Dict] = None):
+        """注册或更新设备"""
+        device = self._devices.get(device_id)
+        if device is None:
+            self._devices[device_id] = PooledDevice(device_id, capabilities)
+        elif capabilities is not None:
+            device.capabilities = capabilities
+        self._dispatch()
+
+    def unregister(self, device_id: str):
+        """移除设备，正在进行的租约在释放后失效"""
+        self._devices.pop(device_id, None)
+
+    def mark_unhealthy(self, device_id: str):
+        """标记设备故障，冷却期内不再分配给新任务"""
+        device = self._devices.get(device_id)
+        if device:
+            device.healthy = False
+            logger.warning(f"Device {device_id} marked unhealthy", extra={'device_id': device_id})
+            if self.unhealthy_cooldown:
+                asyncio.get_running_loop().call_later(
+                    self.unhealthy_cooldown, self.mark_healthy, device_id
+                )
+
+    def mark_healthy(self, device_id: str):
+        """恢复设备可用"""
+        device = self._devices.get(device_id)
+        if device:
+            device.healthy = True
+            self._dispatch()
+
+    def is_idle(self, device_id: str) -> bool:
+        """设备是否空闲可用"""
+        device = self._devices.get(device_id)
+        return bool(device and device.healthy and device.lease is None)
+
+    @staticmethod
+    def matches(capabilities: Optional[Dict], requirements: Optional[Dict]) -> bool:
+        """检查设备能力是否满足要求"""
+        if not requirements:
+            return True
+        capabilities = capabilities or {}
+        return all(capabilities.get(key) == value for key, value in requirements.items())
+
+    def _find_device(self, waiter: _Waiter) -> Optional[PooledDevice]:
+        """为等待的任务查找空闲设备"""
+        if waiter.device_id:
+            device = self._devices.get(waiter.device_id)
+            if device and device.healthy and device.lease is None:
+                return device
+            return None
+
+        for device in self._devices.values():
+            if (device.lease is None and device.healthy
+                    and device.device_id not in waiter.exclude
+                    and self.matches(device.capabilities, waiter.requirements)):
+                return device
+        return None
+
+    def _dispatch(self):
+        """按先来先服务的顺序把空闲设备分配给等待的任务"""
+        for waiter in list(self._waiters):
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+                continue
+            if self._active >= self.max_concurrent_tasks:
+                break
+            if (waiter.user_id is not None
+                    and self._user_active[waiter.user_id] >= self.max_tasks_per_user):
+                continue
+
+            device = self._find_device(waiter)
+            if device is None:
+                continue
+
+            lease = DeviceLease(device.device_id, waiter.task_id, waiter.user_id)
+            device.lease = lease
+            self._active += 1
+            if waiter.user_id is not None:
+                self._user_active[waiter.user_id] += 1
+            self._waiters.remove(waiter)
+            waiter.future.set_result(lease)
+
+        self._update_metrics()
+
+    async def acquire(
+        self,
+        task_id: int,
+        user_id: Optional[int] = None,
+        device_id: Optional[str] = None,
+        requirements: Optional[Dict] = None,
+        exclude: Iterable[str] = (),
+        timeout: Optional[float] = None
+    ) -> DeviceLease:
+        """租用设备：指定device_id时等待该设备，否则选择任意满足能力要求的空闲设备"""
+        if device_id and device_id not in self._devices:
+            self.register(device_id)
+
+        waiter = _Waiter(
+            asyncio.get_running_loop().create_future(),
+            task_id,
+            user_id,
+            device_id,
+            requirements or {},
+            set(exclude)
+        )
+        self._waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已经分配到设备但调用方放弃等待，立即归还
+                self.release(waiter.future.result())
+            else:
+                waiter.future.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._update_metrics()
+            raise
+
+    def release(self, lease: DeviceLease):
+        """归还设备租约"""
+        device = self._devices.get(lease.device_id)
+        if device is not None and device.lease is lease:
+            device.lease = None
+            device.busy_seconds += time.monotonic() - lease.acquired_at
+            device.completed_leases += 1
+        self._active = max(0, self._active - 1)
+        if lease.user_id is not None:
+            self._user_active[lease.user_id] = max(0, self._user_active[lease.user_id] - 1)
+        self._dispatch()
+
+    def _update_metrics(self):
+        stats = self.get_stats()
+        scheduler_queue_length.set(stats['queue_length'])
+        device_pool_utilisation.set(stats['utilisation'])
+
+    def get_stats(self) -> Dict:
+        """获取队列长度与设备利用率"""
+        leased = sum(1 for device in self._devices.values() if device.lease)
+        healthy = sum(1 for device in self._devices.values() if device.healthy)
+        per_device_queue = defaultdict(int)
+        for waiter in self._waiters:
+            per_device_queue[waiter.device_id or '*'] += 1
+        return {
+            'devices': len(self._devices),
+            'healthy': healthy,
+            'leased': leased,
+            'active_tasks': self._active,
+            'queue_length': len(self._waiters),
+            'queue_by_device': dict(per_device_queue),
+            'utilisation': leased / healthy if healthy else 0.0
+        }
+
+# 任务执行函数：(任务ID, 设备ID, 失败时是否还能转移到其他设备)
+TaskRunner = Callable[[int, str, bool], Awaitable[None]]
+
+class TaskScheduler:
+    """任务调度器：为任务租用设备、排队执行，并在设备故障时转移"""
+    # 调度器在独立线程的事件循环上运行，设备池的状态只在该循环中修改；
+    # 请求处理代码通过submit/sync_devices线程安全地提交，通过call/is_idle/get_stats在该循环上读取；
+    # 请求的事件循环随请求结束，需要在请求之后继续运行的协程通过spawn/prepare交给该循环
+
+    def __init__(self, pool: DevicePool, runner: TaskRunner, max_failovers: int = 2):
+        self.pool = pool
+        self.runner = runner
+        self.max_failovers = max_failovers
+        self.app = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._tasks: Dict[int, Future] = {}
+        self._preparing: Dict[int, Future] = {}  # 任务ID -> 执行前需等待完成的准备工作
+
+    def init_app(self, app):
+        """绑定Flask应用，任务在其应用上下文中执行"""
+        self.app = app
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='task-scheduler',
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def sync_devices(self, devices: Iterable):
+        """把数据库中的设备记录同步到设备池"""
+        snapshot = [(device.device_id, device.capabilities) for device in devices]
+        loop = self._ensure_loop()
+        for device_id, capabilities in snapshot:
+            loop.call_soon_threadsafe(self.pool.register, device_id, capabilities)
+
+    def call(self, func: Callable, *args, timeout: float = 5):
+        """在调度循环上调用func并返回结果（在此之前通过sync_devices提交的登记已生效）"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            return func(*args)
+
+        async def invoke():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(invoke(), loop).result(timeout)
+
+    def is_idle(self, device_id: str) -> bool:
+        """设备池中的设备是否空闲可用"""
+        return self.call(self.pool.is_idle, device_id)
+
+    def spawn(self, coro: Awaitable) -> Future:
+        """在调度循环上后台运行协程，立即返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def prepare(self, task_id: int, coro: Awaitable) -> Future:
+        """在调度循环上后台运行任务的准备工作，该任务开始执行前等待其完成"""
+        future = self.spawn(coro)
+        with self._lock:
+            self._preparing[task_id] = future
+        future.add_done_callback(lambda f: self._prepared(task_id, f))
+        return future
+
+    def _prepared(self, task_id: int, future: Future):
+        with self._lock:
+            if self._preparing.get(task_id) is future:
+                del self._preparing[task_id]
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(
+                f"Preparation for task {task_id} failed: {str(future.exception())}",
+                extra={'task_id': task_id}
+            )
+
+    def submit(
+        self,
+        task_id: int,
+        user_id: Optional[int] = None,
+        device_id: Optional[str] = None,
+        requirements: Optional[Dict] = None
+    ) -> Future:
+        """提交任务，立即返回concurrent.futures.Future"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(task_id, user_id, device_id, requirements), loop
+        )
+        with self._lock:
+            self._tasks[task_id] = future
+            scheduler_running_tasks.set(len(self._tasks))
+        future.add_done_callback(lambda f: self._forget(task_id, f))
+        return future
+
+    def _forget(self, task_id: int, future: Future):
+        with self._lock:
+            if self._tasks.get(task_id) is future:
+                del self._tasks[task_id]
+            scheduler_running_tasks.set(len(self._tasks))
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(
+                f"Scheduled task {task_id} failed: {str(future.exception())}",
+                extra={'task_id': task_id}
+            )
+
+    async def _execute(self, task_id: int, device_id: str, can_failover: bool):
+        if self.app is None:
+            return await self.runner(task_id, device_id, can_failover)
+        with self.app.app_context():
+            return await self.runner(task_id, device_id, can_failover)
+
+    async def _run(
+        self,
+        task_id: int,
+        user_id: Optional[int],
+        device_id: Optional[str],
+        requirements: Optional[Dict]
+    ):
+        """租用设备并执行任务，设备故障时转移到其他匹配的设备"""
+        with self._lock:
+            preparing = self._preparing.get(task_id)
+        if preparing is not None:
+            # 准备工作（如回滚预测错误而提前启动的应用）与执行操作同一台设备，先等其结束；失败不影响执行
+            await asyncio.gather(asyncio.wrap_future(preparing), return_exceptions=True)
+
+        excluded = set()
+        failovers = 0
+        while True:
+            lease = await self.pool.acquire(task_id, user_id, device_id, requirements, excluded)
+            # 指定了设备的任务不做转移
+            can_failover = device_id is None and failovers < self.max_failovers
+            try:
+                await self._execute(task_id, lease.device_id, can_failover)
+                return
+            except DeviceError as e:
+                self.pool.mark_unhealthy(lease.device_id)
+                if not can_failover:
+                    raise
+                excluded.add(lease.device_id)
+                failovers += 1
+                logger.warning(
+                    f"Task {task_id} failing over from device {lease.device_id}: {str(e)}",
+                    extra={'task_id': task_id, 'device_id': lease.device_id}
+                )
+            finally:
+                self.pool.release(lease)
+
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        stats = self.call(self.pool.get_stats)
+        stats['scheduled_tasks'] = len(self._tasks)
+        return stats
+
+    def shutdown(self, cancel: bool = True):
+        """停止调度循环，默认取消尚未完成的任务"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            pending = list(self._tasks.values()) + list(self._preparing.values())
+        if loop is None:
+            return
+        if cancel:
+            for future in pending:
+                future.cancel()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import numpy as np
+from PIL import Image
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """计算差异哈希：缩小为灰度图后比较相邻像素"""
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def ahash(image: Image.Image, hash_size: int = 16) -> int:
+    """计算均值哈希：缩小为灰度图后与平均亮度比较"""
+    gray = image.convert('L').resize((hash_size, hash_size), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+    bits = (pixels > pixels.mean()).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(a: int, b: int) -> int:
+    """计算两个哈希的汉明距离"""
+    return bin(a ^ b).count('1')
+
+@dataclass
+class ScreenEntry:
+    """一个屏幕状态及其上已定位的元素"""
+    screen_hash: int
+    elements: Dict[str, Dict] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.monotonic)
+
+class ScreenStateCache:
+    """按感知哈希缓存每台设备上已定位过的元素"""
+
+    def __init__(self, max_distance: int = 8, max_screens: int = 32, ttl: float = 300):
+        self.max_distance = max_distance  # 视为同一屏幕的最大汉明距离
+        self.max_screens = max_screens  # 每台设备保留的屏幕状态数
+        self.ttl = ttl
+        self._screens = {}  # 设备 -> OrderedDict[屏幕哈希 -> ScreenEntry]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _find_entry(self, screens: OrderedDict, screen_hash: int, target: str) -> Optional[ScreenEntry]:
+        """查找包含目标元素、距离最近的未过期屏幕"""
+        now = time.monotonic()
+        best, best_distance = None, self.max_distance + 1
+        for entry in list(screens.values()):
+            if now - entry.updated_at > self.ttl:
+                del screens[entry.screen_hash]
+                continue
+            if target not in entry.elements:
+                continue
+            distance = hamming_distance(entry.screen_hash, screen_hash)
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def lookup(self, device_key: str, screen_hash: int, target: str) -> Optional[Dict]:
+        """查询当前屏幕上目标元素的已知位置"""
+        with self._lock:
+            screens = self._screens.get(device_key)
+            entry = self._find_entry(screens, screen_hash, target) if screens else None
+            if entry is None:
+                self.misses += 1
+                return None
+            screens.move_to_end(entry.screen_hash)
+            self.hits += 1
+            return entry.elements[target]
+
+    def store(self, device_key: str, screen_hash: int, target: str, result: Dict):
+        """记录屏幕上目标元素的定位结果"""
+        with self._lock:
+            screens = self._screens.setdefault(device_key, OrderedDict())
+            entry = screens.get(screen_hash)
+            if entry is None:
+                entry = ScreenEntry(screen_hash)
+                screens[screen_hash] = entry
+            entry.elements[target] = result
+            entry.updated_at = time.monotonic()
+            screens.move_to_end(screen_hash)
+            while len(screens) > self.max_screens:
+                screens.popitem(last=False)
+
+    def invalidate(self, device_key: Optional[str] = None):
+        """清除指定设备（或全部设备）的屏幕缓存"""
+        with self._lock:
+            if device_key is None:
+                self._screens.clear()
+            else:
+                self._screens.pop(device_key, None)
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'devices': len(self._screens),
+            'screens': sum(len(screens) for screens in self._screens.values())
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+from app.utils.cache_keys import digest
+from app.utils.monitoring import screen_wait_latency
+
+class ScreenWatcher:
+    """单台设备的屏幕变化通知器"""
+    # 以较短间隔轮询窗口摘要（压缩控件树的哈希），多个等待方共享同一次采样；
+    # 摘要变化即视为屏幕变化，摘要在settle秒内保持不变视为界面稳定
+
+    def __init__(
+        self,
+        dump: Callable[[], Awaitable[str]],
+        on_change: Optional[Callable[[], None]] = None,
+        interval: float = 0.2,
+        settle: float = 0.4
+    ):
+        self.dump = dump  # 在设备通道上导出压缩控件树
+        self.on_change = on_change  # 屏幕变化时调用（如使控件索引失效）
+        self.interval = interval
+        self.settle = settle
+        self.signature = None
+        self.version = 0  # 每观察到一次变化加1
+        self.changed_at = time.monotonic()
+        self.sampled_at = None
+
+    def mark_stale(self):
+        """设备上执行了可能改变屏幕的操作，下一次轮询必须重新采样"""
+        self.sampled_at = None
+
+    async def poll(self) -> int:
+        """采样窗口摘要（间隔内复用上次结果），返回当前版本"""
+        now = time.monotonic()
+        if self.sampled_at is not None and now - self.sampled_at < self.interval:
+            return self.version
+        signature = digest((await self.dump()).encode('utf-8'))
+        self.sampled_at = time.monotonic()
+        if signature != self.signature:
+            if self.signature is not None:
+                self.version += 1
+                self.changed_at = self.sampled_at
+                if self.on_change is not None:
+                    self.on_change()
+            self.signature = signature
+        return self.version
+
+    async def _sleep_until_next_sample(self, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(min(self.interval, remaining))
+
+    async def wait_for_change(self, since: Optional[int] = None, timeout: float = 10) -> bool:
+        """等待屏幕相对版本since发生变化，超时返回False"""
+        started = time.monotonic()
+        deadline = started + timeout
+        if since is None:
+            since = await self.poll()
+        try:
+            while True:
+                if await self.poll() != since:
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+                await self._sleep_until_next_sample(deadline)
+        finally:
+            screen_wait_latency.labels(kind='change').observe(time.monotonic() - started)
+
+    async def wait_settled(self, timeout: float = 3) -> bool:
+        """等待界面稳定：从调用时起摘要连续settle秒不变，超时返回False"""
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            while True:
+                await self.poll()
+                now = time.monotonic()
+                if now - max(self.changed_at, started) >= self.settle:
+                    return True
+                if now >= deadline:
+                    return False
+                await self._sleep_until_next_sample(deadline)
+        finally:
+            screen_wait_latency.labels(kind='settle').observe(time.monotonic() - started)
+
+    async def wait_until(self, predicate: Callable[[], Awaitable[bool]], timeout: float = 10) -> bool:
+        """等待条件成立：先检查一次，之后只在屏幕变化时重新检查"""
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            version = await self.poll()
+            while True:
+                if await predicate():
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not await self.wait_for_change(version, remaining):
+                    return False
+                version = self.version
+        finally:
+            screen_wait_latency.labels(kind='until').observe(time.monotonic() - started)
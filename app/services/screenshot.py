@@ -0,0 +1,175 @@
+import base64
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Optional, Tuple
+from PIL import Image
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png'
+}
+
+@dataclass
+class CapturedScreen:
+    """一次截图的编码结果"""
+    payload: str  # data URI形式的base64图像，直接用于视觉模型请求
+    mime: str
+    size: Tuple[int, int]  # 编码后的图像尺寸
+    device_size: Tuple[int, int]  # 设备截图原始尺寸
+    raw: Optional[bytes] = None  # 设备返回的原始图像数据
+    image: Optional[Image.Image] = None  # 已解码的图像（如有）
+    origin: Tuple[int, int] = (0, 0)  # 裁剪区域在设备屏幕上的左上角
+
+    @property
+    def scale(self) -> float:
+        """编码图像相对设备坐标的缩放比例"""
+        return self.size[0] / self.device_size[0]
+
+    def to_device_box(self, box: List[float]) -> List[float]:
+        """将编码图像上的边界框映射回设备坐标，超出截图区域的部分截断到区域边缘"""
+        scale = self.scale
+        left, top = self.origin
+        width, height = self.device_size
+        # 模型给出的框可能越过图像边界
+        lower = (left, top)
+        upper = (left + width, top + height)
+        return [
+            round(min(max(value / scale + lower[i % 2], lower[i % 2]), upper[i % 2]), 1)
+            for i, value in enumerate(box)
+        ]
+
+    def hash_image(self, max_edge: int = 64) -> Image.Image:
+        """获取用于感知哈希的小图，JPEG原图只做降采样解码"""
+        if self.image is not None:
+            return self.image
+        img = Image.open(BytesIO(self.raw))
+        img.draft('L', (max_edge, max_edge))
+        return img
+
+class ScreenshotPipeline:
+    """截图处理流水线：复用设备原始图像、按需缩放并编码为JPEG/WebP"""
+
+    def __init__(self, max_edge: int = 1280, image_format: str = 'JPEG', quality: int = 80):
+        self.max_edge = max_edge  # 长边上限，0表示不缩放
+        self.image_format = image_format.upper()
+        self.quality = quality
+        if self.image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported screenshot format: {image_format}")
+
+    def capture(self, device) -> CapturedScreen:
+        """从设备截图并编码（阻塞调用）"""
+        try:
+            screenshot = device.screenshot(format='raw')
+        except TypeError:
+            # 不支持raw格式的设备实现只能返回PIL Image
+            screenshot = device.screenshot()
+        if isinstance(screenshot, Image.Image):
+            return self.process_image(screenshot)
+        return self.process(screenshot)
+
+    def _target_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        width, height = size
+        longest = max(width, height)
+        if not self.max_edge or longest <= self.max_edge:
+            return size
+        ratio = self.max_edge / longest
+        return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+    def process(self, raw: bytes) -> CapturedScreen:
+        """处理设备返回的原始图像数据"""
+        img = Image.open(BytesIO(raw))  # 只读取文件头，尚未解码
+        device_size = img.size
+        target_size = self._target_size(device_size)
+
+        if target_size == device_size and img.format == self.image_format:
+            # 格式和尺寸都满足要求，直接复用原始数据，不做解码和重新编码
+            return CapturedScreen(
+                payload=self._to_data_uri(raw),
+                mime=MIME_TYPES[self.image_format],
+                size=device_size,
+                device_size=device_size,
+                raw=raw
+            )
+
+        if img.format == 'JPEG':
+            # JPEG在解码阶段按2的幂降采样，远快于完整解码后再缩放
+            img.draft('RGB', target_size)
+        return self.process_image(img, device_size=device_size, raw=raw)
+
+    def process_image(
+        self,
+        img: Image.Image,
+        device_size: Optional[Tuple[int, int]] = None,
+        raw: Optional[bytes] = None
+    ) -> CapturedScreen:
+        """缩放并编码已打开的图像"""
+        device_size = device_size or img.size
+        target_size = self._target_size(device_size)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        if img.size != target_size:
+            img = img.resize(target_size, Image.BILINEAR)
+
+        buffered = BytesIO()
+        if self.image_format == 'PNG':
+            img.save(buffered, format='PNG')
+        else:
+            img.save(buffered, format=self.image_format, quality=self.quality)
+
+        return CapturedScreen(
+            payload=self._to_data_uri(buffered.getvalue()),
+            mime=MIME_TYPES[self.image_format],
+            size=img.size,
+            device_size=device_size,
+            raw=raw,
+            image=img
+        )
+
+    def crop(
+        self,
+        screen: CapturedScreen,
+        region: Tuple[int, int, int, int],
+        max_edge: Optional[int] = None
+    ) -> CapturedScreen:
+        """裁剪截图的一块区域（设备坐标）并按max_edge缩放编码"""
+        if screen.image is not None:
+            source = screen.image
+        else:
+            source = Image.open(BytesIO(screen.raw))
+        ratio = source.size[0] / screen.device_size[0]
+        # 区域超出屏幕时截断，避免裁剪出填充的黑边
+        width, height = screen.device_size
+        left, top, right, bottom = region
+        left, top = min(max(0, left), width - 1), min(max(0, top), height - 1)
+        right, bottom = max(left + 1, min(width, right)), max(top + 1, min(height, bottom))
+        region = (left, top, right, bottom)
+        img = source.crop(tuple(round(value * ratio) for value in region))
+
+        region_size = (right - left, bottom - top)
+        longest = max(img.size)
+        max_edge = max_edge or self.max_edge
+        if max_edge and longest > max_edge:
+            img = img.resize(
+                (max(1, round(img.size[0] * max_edge / longest)), max(1, round(img.size[1] * max_edge / longest))),
+                Image.BILINEAR
+            )
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        buffered = BytesIO()
+        if self.image_format == 'PNG':
+            img.save(buffered, format='PNG')
+        else:
+            img.save(buffered, format=self.image_format, quality=self.quality)
+        return CapturedScreen(
+            payload=self._to_data_uri(buffered.getvalue()),
+            mime=MIME_TYPES[self.image_format],
+            size=img.size,
+            device_size=region_size,
+            image=img,
+            origin=(left, top)
+        )
+
+    def _to_data_uri(self, data: bytes) -> str:
+        return f"data:{MIME_TYPES[self.image_format]};base64,{base64.b64encode(data).decode()}"
@@ -0,0 +1,105 @@
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional
+from app.utils.logger import logger
+from app.utils.monitoring import task_prestart_latency, task_prestart_predictions
+
+# 指令开头的“打开/启动X”
+LAUNCH_PATTERN = re.compile(r'^\s*(?:请|帮我)?\s*(?:打开|启动|进入)\s*(\S+)')
+
+def predict_launch(instruction: str, app_packages: Dict[str, str]) -> Optional[str]:
+    """根据指令开头的应用名预测计划第一步要启动的应用，返回包名"""
+    match = LAUNCH_PATTERN.match(instruction or '')
+    if not match:
+        return None
+    # 应用名后面通常紧跟其他操作，如“打开微信，找到张三”
+    head = match.group(1)
+    for name, package in app_packages.items():
+        if head.startswith(name):
+            return package
+    return None
+
+def first_launch(plan: List[Dict]) -> Optional[str]:
+    """计划第一步为launch_app时返回其包名"""
+    if not plan or not isinstance(plan[0], dict) or plan[0].get('type') != 'launch_app':
+        return None
+    return (plan[0].get('params') or {}).get('package')
+
+class TaskPrestart:
+    """任务启动流水线：LLM规划期间并行连接、预热设备，并按预测提前启动应用"""
+    # 预热失败不影响任务，执行时会重新连接；预测的应用与计划不一致时回滚
+
+    def __init__(self, automation_service, device_id: str, package: Optional[str] = None, timeout: float = 15):
+        self.automation = automation_service
+        self.device_id = device_id
+        self.package = package  # 预测要提前启动的应用
+        self.timeout = timeout
+        self.previous = None  # 提前启动前的前台应用
+        self.launched = None  # 实际提前启动的应用
+        self._future = None
+
+    def start(self) -> 'TaskPrestart':
+        """在后台开始预热，立即返回"""
+        self._future = asyncio.ensure_future(self._prepare())
+        return self
+
+    async def _prepare(self):
+        started = time.monotonic()
+        try:
+            await self.automation.connect_device(self.device_id)
+            if self.package:
+                self.previous = await self.automation.current_app(self.device_id)
+                if self.previous != self.package:
+                    # 先记录，启动过程中被取消也会回滚
+                    self.launched = self.package
+                    await self.automation.execute_action(self.device_id, {
+                        'type': 'launch_app', 'params': {'package': self.package}
+                    })
+            # 在提前启动之后预热，首屏控件索引即为计划第一步之后的屏幕
+            await self.automation.warmup(self.device_id)
+        finally:
+            task_prestart_latency.observe(time.monotonic() - started)
+
+    async def _settle(self):
+        """等待预热结束，超时则取消；预热中的异常只记录日志"""
+        if self._future is None:
+            return
+        try:
+            await asyncio.wait_for(self._future, self.timeout)
+        except Exception as e:
+            logger.warning(
+                f"Task prestart failed on device {self.device_id}: {str(e)}",
+                extra={'device_id': self.device_id}
+            )
+
+    async def reconcile(self, plan: List[Dict]) -> bool:
+        """规划完成后调用：计划第一步与提前启动的应用不一致时回滚，返回预测是否命中"""
+        await self._settle()
+        if self.launched is None:
+            return False
+        if first_launch(plan) == self.launched:
+            task_prestart_predictions.labels(result='hit').inc()
+            return True
+        task_prestart_predictions.labels(result='miss').inc()
+        await self.rollback()
+        return False
+
+    async def abort(self):
+        """规划失败时调用：取消预热并回滚提前启动的应用"""
+        if self._future is not None:
+            self._future.cancel()
+            await asyncio.gather(self._future, return_exceptions=True)
+        if self.launched is not None:
+            await self.rollback()
+
+    async def rollback(self):
+        """停止提前启动的应用并切回之前的前台应用"""
+        launched, self.launched = self.launched, None
+        try:
+            await self.automation.stop_app(self.device_id, launched, restore=self.previous)
+        except Exception as e:
+            logger.warning(
+                f"Failed to roll back prestarted app {launched}: {str(e)}",
+                extra={'device_id': self.device_id}
+            )
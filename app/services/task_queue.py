@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import and_, func, or_
+from app import db
+from app.models.task import Task, TaskResult, TaskStatus
+from app.models.task_job import JobStatus, TaskJob
+from app.utils.logger import logger
+from app.utils.monitoring import task_queue_claims, task_queue_jobs
+
+# 支持SELECT ... FOR UPDATE SKIP LOCKED的数据库
+SKIP_LOCKED_DIALECTS = {'postgresql', 'mysql', 'mariadb', 'oracle'}
+
+class TaskQueue:
+    """基于数据库的持久化任务队列，多个worker进程可同时领取"""
+    # 领取时先选出候选行（支持时加FOR UPDATE SKIP LOCKED），再用带条件的UPDATE抢占，
+    # 影响行数为0说明已被其他worker领取；SQLite没有行锁，只依赖后者。
+    # 运行中的任务超过可见性超时未续期即视为worker已崩溃，会被其他worker重新领取。
+
+    def __init__(
+        self,
+        visibility_timeout: float = 120,
+        max_attempts: int = 3,
+        priorities: Optional[Dict[str, int]] = None
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.priorities = priorities or {'normal': 0}  # 优先级通道名 -> 优先级
+
+    def priority_of(self, lane: Optional[str]) -> int:
+        """把优先级通道名转换为优先级，未知通道抛出ValueError"""
+        if lane is None:
+            return self.priorities.get('normal', 0)
+        if lane not in self.priorities:
+            raise ValueError(f"Unknown priority lane: {lane}")
+        return self.priorities[lane]
+
+    def enqueue(
+        self,
+        task_id: int,
+        priority: int = 0,
+        user_id: Optional[int] = None,
+        device_id: Optional[str] = None,
+        requirements: Optional[Dict] = None
+    ) -> TaskJob:
+        """把任务加入队列"""
+        job = TaskJob(
+            task_id=task_id,
+            priority=priority,
+            user_id=user_id,
+            device_id=device_id,
+            requirements=requirements or {},
+            max_attempts=self.max_attempts
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(TaskJob.status == JobStatus.QUEUED, TaskJob.available_at <= now),
+            # worker失联：运行中但可见性超时已过
+            and_(TaskJob.status == JobStatus.RUNNING, TaskJob.locked_until < now)
+        )
+
+    def claim(
+        self,
+        worker_id: str,
+        limit: int = 1,
+        priorities: Optional[Sequence[int]] = None
+    ) -> List[TaskJob]:
+        """领取最多limit个任务（优先级高的先领取），priorities限定只领取这些优先级通道"""
+        now = datetime.utcnow()
+        claimable = self._claimable(now)
+        query = db.session.query(TaskJob.id, TaskJob.status).filter(claimable)
+        if priorities:
+            query = query.filter(TaskJob.priority.in_(list(priorities)))
+        query = query.order_by(TaskJob.priority.desc(), TaskJob.id).limit(limit)
+        if db.engine.dialect.name in SKIP_LOCKED_DIALECTS:
+            query = query.with_for_update(skip_locked=True)
+        candidates = query.all()
+
+        claimed_ids = []
+        for job_id, status in candidates:
+            updated = TaskJob.query.filter(TaskJob.id == job_id, claimable).update({
+                TaskJob.status: JobStatus.RUNNING,
+                TaskJob.locked_by: worker_id,
+                TaskJob.locked_until: now + timedelta(seconds=self.visibility_timeout),
+                TaskJob.attempts: TaskJob.attempts + 1
+            }, synchronize_session=False)
+            if updated:
+                claimed_ids.append(job_id)
+                task_queue_claims.labels(kind='orphaned' if status == JobStatus.RUNNING else 'queued').inc()
+                if status == JobStatus.RUNNING:
+                    logger.warning(f"Re-queued job {job_id} orphaned by a lost worker",
+                                   extra={'worker_id': worker_id})
+        db.session.commit()
+        if not claimed_ids:
+            return []
+
+        jobs = TaskJob.query.filter(TaskJob.id.in_(claimed_ids)).order_by(
+            TaskJob.priority.desc(), TaskJob.id
+        ).all()
+        runnable = []
+        for job in jobs:
+            if job.attempts > job.max_attempts:
+                # 反复导致worker失联的任务不再重试
+                self._finish(job, JobStatus.FAILED, f"Gave up after {job.max_attempts} attempts")
+                self._fail_task(job.task_id, job.last_error)
+            else:
+                runnable.append(job)
+        return runnable
+
+    def heartbeat(self, worker_id: str, job_ids: Iterable[int]) -> List[int]:
+        """为仍在执行的任务续期，返回已不再属于该worker的任务ID"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        locked_until = datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+        TaskJob.query.filter(
+            TaskJob.id.in_(job_ids),
+            TaskJob.locked_by == worker_id,
+            TaskJob.status == JobStatus.RUNNING
+        ).update({TaskJob.locked_until: locked_until}, synchronize_session=False)
+        db.session.commit()
+        owned = {
+            job_id for (job_id,) in db.session.query(TaskJob.id).filter(
+                TaskJob.id.in_(job_ids),
+                TaskJob.locked_by == worker_id,
+                TaskJob.status == JobStatus.RUNNING
+            )
+        }
+        return [job_id for job_id in job_ids if job_id not in owned]
+
+    def _owned(self, job_id: int, worker_id: str) -> Optional[TaskJob]:
+        job = TaskJob.query.get(job_id)
+        if job is None or job.locked_by != worker_id or job.status != JobStatus.RUNNING:
+            logger.warning(f"Job {job_id} is no longer owned by worker {worker_id}")
+            return None
+        return job
+
+    def _finish(self, job: TaskJob, status: JobStatus, error: Optional[str] = None):
+        job.status = status
+        job.last_error = error
+        job.locked_until = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def _fail_task(self, task_id: int, error: Optional[str]):
+        """任务还未结束时标记为失败"""
+        task = Task.query.get(task_id)
+        if task is None or task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            return
+        if task.start_time is None:
+            task.start_time = datetime.utcnow()
+        task.complete_execution(TaskResult.FAILURE, error or "Task could not be executed")
+
+    def complete(self, job_id: int, worker_id: str):
+        """任务执行结束（成败由Task自身记录）"""
+        job = self._owned(job_id, worker_id)
+        if job is not None:
+            self._finish(job, JobStatus.DONE)
+
+    def fail(self, job_id: int, worker_id: str, error: str):
+        """任务执行异常结束，不再重试"""
+        job = self._owned(job_id, worker_id)
+        if job is not None:
+            self._finish(job, JobStatus.FAILED, error)
+            self._fail_task(job.task_id, error)
+
+    def release(self, job_id: int, worker_id: str):
+        """worker停止前归还尚未执行完的任务，立即可被其他worker领取，不计入尝试次数"""
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return
+        job.status = JobStatus.QUEUED
+        job.attempts = max(0, job.attempts - 1)
+        job.locked_by = None
+        job.locked_until = None
+        job.available_at = datetime.utcnow()
+        db.session.commit()
+
+    def device_busy(self, device_id: str) -> bool:
+        """是否有worker（任意进程）领取了在该设备上执行的任务"""
+        # 指定设备的任务在领取后即占用该设备；未指定设备的任务开始执行时才在Task上记录设备
+        query = db.session.query(TaskJob.id).join(Task, Task.id == TaskJob.task_id).filter(
+            TaskJob.status == JobStatus.RUNNING,
+            or_(TaskJob.device_id == device_id, Task.device_id == device_id)
+        )
+        return db.session.query(query.exists()).scalar()
+
+    def get_stats(self) -> Dict:
+        """按状态和优先级统计队列"""
+        rows = db.session.query(TaskJob.status, TaskJob.priority, func.count(TaskJob.id)).group_by(
+            TaskJob.status, TaskJob.priority
+        ).all()
+        by_status = {status.value: 0 for status in JobStatus}
+        lanes = {priority: name for name, priority in self.priorities.items()}
+        by_lane = {}
+        for status, priority, count in rows:
+            by_status[status.value] += count
+            if status == JobStatus.QUEUED:
+                lane = lanes.get(priority, str(priority))
+                by_lane[lane] = by_lane.get(lane, 0) + count
+        for status, count in by_status.items():
+            task_queue_jobs.labels(status=status).set(count)
+        return {'jobs': by_status, 'queued_by_lane': by_lane}
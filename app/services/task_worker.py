@@ -0,0 +1,164 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Sequence
+from app.config import Config
+from app.models.device import Device
+from app.services.execution_journal import replay_journals
+from app.services.task_queue import TaskQueue
+from app.utils.logger import logger
+
+class TaskWorker:
+    """从持久化队列领取任务，交给调度器租用设备并执行"""
+    # 可运行在Web进程内，也可以通过worker.py独立运行并横向扩展为多个进程；
+    # 数据库操作在worker自己的事件循环上同步执行，任务本身在调度器线程上执行
+
+    def __init__(
+        self,
+        app,
+        queue: TaskQueue,
+        scheduler,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+        priorities: Optional[Sequence[int]] = None,
+        worker_id: Optional[str] = None
+    ):
+        self.app = app
+        self.queue = queue
+        self.scheduler = scheduler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.priorities = priorities  # 只领取这些优先级通道，None表示全部
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.running: Dict[int, asyncio.Future] = {}  # 队列任务ID -> 执行中的任务
+        self._wakeup = None
+        self._thread = None
+        self._thread_loop = None
+        self._thread_stop = None
+
+    @property
+    def heartbeat_interval(self) -> float:
+        # 在可见性超时内至少续期三次
+        return self.queue.visibility_timeout / 3
+
+    def _claim(self):
+        """按空闲槽位领取任务并提交给调度器"""
+        free = self.concurrency - len(self.running)
+        if free <= 0:
+            return
+        jobs = self.queue.claim(self.worker_id, free, self.priorities)
+        if jobs:
+            # 未指定设备的任务由调度器从设备池中选择，先同步数据库中的设备
+            self.scheduler.sync_devices(Device.query.all())
+        for job in jobs:
+            future = asyncio.wrap_future(self.scheduler.submit(
+                job.task_id,
+                user_id=job.user_id,
+                device_id=job.device_id,
+                requirements=job.requirements
+            ))
+            self.running[job.id] = future
+            future.add_done_callback(lambda f, job_id=job.id: self._finished(job_id, f))
+            logger.info(f"Worker {self.worker_id} claimed job {job.id} (task {job.task_id})",
+                        extra={'task_id': job.task_id})
+
+    def _finished(self, job_id: int, future: asyncio.Future):
+        if self.running.pop(job_id, None) is None:
+            return
+        with self.app.app_context():
+            if future.cancelled():
+                # 停止时被取消，交还队列
+                self.queue.release(job_id, self.worker_id)
+            elif future.exception() is not None:
+                self.queue.fail(job_id, self.worker_id, str(future.exception()))
+            else:
+                self.queue.complete(job_id, self.worker_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _heartbeat(self):
+        """为执行中的任务续期；已被其他worker接管的任务停止执行"""
+        for job_id in self.queue.heartbeat(self.worker_id, list(self.running)):
+            future = self.running.pop(job_id, None)
+            if future is not None:
+                logger.warning(f"Worker {self.worker_id} lost job {job_id}, cancelling it")
+                future.cancel()
+
+    async def run(self, stop: asyncio.Event, grace: float = 30):
+        """领取并执行任务直到stop被设置，停止后等待执行中的任务至多grace秒"""
+        self._wakeup = asyncio.Event()
+        logger.info(f"Task worker {self.worker_id} started (concurrency={self.concurrency})")
+        # 补写崩溃的进程留在本地日志中的步骤结果，再领取（可能是同一批）失联的任务
+        with self.app.app_context():
+            try:
+                replay_journals(Config.EXECUTION_JOURNAL_DIR)
+            except Exception as e:
+                logger.error(f"Failed to replay execution journals: {str(e)}", exc_info=True)
+        last_heartbeat = time.monotonic()
+        while not stop.is_set():
+            with self.app.app_context():
+                try:
+                    if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                        self._heartbeat()
+                        last_heartbeat = time.monotonic()
+                    self._claim()
+                except Exception as e:
+                    logger.error(f"Task worker {self.worker_id} poll failed: {str(e)}", exc_info=True)
+
+            # 有任务结束、到达轮询间隔或收到停止信号时继续
+            self._wakeup.clear()
+            waiters = [asyncio.ensure_future(self._wakeup.wait()), asyncio.ensure_future(stop.wait())]
+            timeout = min(self.poll_interval, self.heartbeat_interval)
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+
+        await self.drain(grace)
+        logger.info(f"Task worker {self.worker_id} stopped")
+
+    def start_thread(self, grace: float = 30) -> threading.Thread:
+        """在后台线程自己的事件循环上运行worker，用于在Web进程内运行：同步的数据库操作不会阻塞Web服务的事件循环"""
+        ready = threading.Event()
+
+        async def main():
+            self._thread_loop = asyncio.get_running_loop()
+            self._thread_stop = asyncio.Event()
+            ready.set()
+            await self.run(self._thread_stop, grace)
+
+        def target():
+            try:
+                asyncio.run(main())
+            except Exception as e:
+                logger.error(f"Task worker {self.worker_id} crashed: {str(e)}", exc_info=True)
+            finally:
+                ready.set()
+
+        self._thread = threading.Thread(target=target, name='task-worker', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self._thread
+
+    def stop_thread(self, timeout: Optional[float] = None):
+        """停止start_thread()启动的worker并等待线程退出（执行中的任务至多等待grace秒）"""
+        if self._thread is None:
+            return
+        try:
+            self._thread_loop.call_soon_threadsafe(self._thread_stop.set)
+        except RuntimeError:
+            # 线程的事件循环已经结束
+            pass
+        self._thread.join(timeout)
+
+    async def drain(self, grace: float):
+        """等待执行中的任务结束，超时未结束的取消并交还队列"""
+        pending = list(self.running.values())
+        if not pending:
+            return
+        _, unfinished = await asyncio.wait(pending, timeout=grace)
+        for future in unfinished:
+            future.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
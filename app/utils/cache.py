@@ -1,31 +1,255 @@
+import asyncio
+import copy
+import inspect
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from functools import wraps
+from typing import Any, Awaitable, Callable, Optional
 from flask_caching import Cache
-from app import app
+from app.config import Config
+from app.utils.cache_keys import make_cache_key
+from app.utils.logger import logger
+from app.utils.monitoring import llm_cache_hits, llm_cache_misses, llm_cache_coalesced
 
-cache = Cache(app, config={
-    'CACHE_TYPE': 'redis',
-    'CACHE_REDIS_URL': app.config['REDIS_URL'],
-    'CACHE_DEFAULT_TIMEOUT': 300
-})
+# 在create_app中通过init_app绑定应用配置；
+# CACHE_TYPE可设为SimpleCache/FileSystemCache以在没有Redis时运行
+cache = Cache()
+
+class LRUCache:
+    """进程内LRU缓存，按容量和TTL淘汰"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """获取缓存值，过期或不存在时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: Optional[float] = None):
+        """写入缓存值，超过容量时淘汰最久未使用的条目"""
+        ttl = self.ttl if not timeout else min(timeout, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TwoTierCache:
+    """两级缓存：进程内LRU(L1) + 共享缓存(L2)"""
+
+    def __init__(
+        self,
+        l2: Any,
+        l1_maxsize: int = 1024,
+        l1_ttl: float = 300,
+        compress_level: int = 6
+    ):
+        self.l1 = LRUCache(maxsize=l1_maxsize, ttl=l1_ttl)
+        self.l2 = l2
+        self.compress_level = compress_level
+        # L2写入在后台线程完成，不占用请求路径
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-cache-writer')
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def _get_backend(self) -> Any:
+        """获取L2后端；Flask-Caching实例需要在应用上下文中解析"""
+        if isinstance(self.l2, Cache):
+            try:
+                return self.l2.cache
+            except Exception:
+                # 不在应用上下文中，只使用L1
+                return None
+        return self.l2
+
+    def _encode(self, value: Any) -> bytes:
+        """序列化并压缩缓存的值"""
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return zlib.compress(data, self.compress_level)
+
+    @staticmethod
+    def _decode(data: bytes) -> Any:
+        return json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def get(self, key: str) -> Any:
+        """先查L1，未命中再查L2并回填L1；每次返回新解码的副本"""
+        data = self.l1.get(key)
+        if data is None:
+            backend = self._get_backend()
+            if backend is None:
+                return None
+            try:
+                data = backend.get(key)
+            except Exception as e:
+                logger.warning(f"L2 cache read failed: {str(e)}")
+                return None
+            if data is None:
+                return None
+            self.l1.set(key, data)
+
+        try:
+            return self._decode(data)
+        except Exception as e:
+            logger.warning(f"Cache decode failed: {str(e)}")
+            self.l1.delete(key)
+            return None
+
+    def _write_l2(self, backend: Any, key: str, data: bytes, timeout: Optional[int]):
+        try:
+            backend.set(key, data, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"L2 cache write failed: {str(e)}")
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None):
+        """同步写入L1，异步写入L2"""
+        # L1也保存编码后的数据：调用方修改返回的计划（如执行时追加步骤）不会影响缓存
+        try:
+            data = self._encode(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Cache value not serializable: {str(e)}")
+            return
+        self.l1.set(key, data, timeout)
+
+        backend = self._get_backend()
+        if backend is None:
+            return
+        future = self._writer.submit(self._write_l2, backend, key, data, timeout)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+
+    def _discard_pending(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def flush(self, timeout: Optional[float] = None):
+        """等待所有挂起的L2写入完成"""
+        with self._pending_lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def clear(self):
+        """清空两级缓存"""
+        self.flush()
+        self.l1.clear()
+        backend = self._get_backend()
+        if backend is not None:
+            backend.clear()
+
+class SingleFlight:
+    """合并相同键的并发调用，同一时刻只向上游发起一次请求"""
+    # 按进程合并：异步视图的每个请求运行在各自的事件循环上，进行中的调用用
+    # concurrent.futures.Future表示，其他线程、其他事件循环上的调用方也能等待
+
+    def __init__(self):
+        self._calls = {}  # 键 -> 进行中调用的Future
+        self._lock = threading.Lock()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> tuple:
+        """执行或加入进行中的调用，返回(结果, 是否复用了其他调用)"""
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if not shared:
+                future = Future()
+                self._calls[key] = future
+
+        if not shared:
+            # 请求在发起方的事件循环上执行
+            task = asyncio.get_running_loop().create_task(func())
+            task.add_done_callback(lambda t: self._resolve(key, future, t))
+
+        # shield保证单个调用方被取消时不会取消其他调用方共享的请求
+        return await asyncio.shield(asyncio.wrap_future(future)), shared
+
+    def _resolve(self, key: str, future: Future, task: asyncio.Task):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def in_flight(self) -> int:
+        """当前进行中的调用数"""
+        with self._lock:
+            return len(self._calls)
+
+llm_cache = TwoTierCache(
+    cache,
+    l1_maxsize=Config.LLM_CACHE_L1_MAXSIZE,
+    l1_ttl=Config.LLM_CACHE_L1_TTL,
+    compress_level=Config.LLM_CACHE_COMPRESS_LEVEL
+)
+
+llm_single_flight = SingleFlight()
 
 def cache_llm_response(timeout=300):
-    """LLM响应缓存装饰器"""
+    """LLM响应缓存装饰器，未命中时合并相同的并发请求"""
     def decorator(f):
+        signature = inspect.signature(f)
+        stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
         @wraps(f)
         async def decorated_function(*args, **kwargs):
             # 生成缓存键
-            cache_key = f"llm:{f.__name__}:{str(args)}:{str(kwargs)}"
-            
+            cache_key = make_cache_key(f, signature, args, kwargs)
+
             # 尝试从缓存获取
-            response = cache.get(cache_key)
+            response = llm_cache.get(cache_key)
             if response is not None:
+                stats['hits'] += 1
+                llm_cache_hits.labels(function=f.__name__).inc()
                 return response
-                
-            # 执行原函数
-            response = await f(*args, **kwargs)
-            
-            # 存入缓存
-            cache.set(cache_key, response, timeout=timeout)
+
+            stats['misses'] += 1
+            llm_cache_misses.labels(function=f.__name__).inc()
+
+            async def fetch():
+                # 执行原函数，只有成功的结果才存入缓存
+                result = await f(*args, **kwargs)
+                llm_cache.set(cache_key, result, timeout=timeout)
+                return result
+
+            # 相同键的并发调用共享同一个上游请求，失败会传播给所有调用方
+            response, shared = await llm_single_flight.do(cache_key, fetch)
+            if shared:
+                stats['coalesced'] += 1
+                llm_cache_coalesced.labels(function=f.__name__).inc()
+                # 与发起方各持一份，互不影响
+                response = copy.deepcopy(response)
             return response
+
+        decorated_function.cache_stats = stats
         return decorated_function
-    return decorator 
\ No newline at end of file
+    return decorator
@@ -0,0 +1,75 @@
+import hashlib
+import inspect
+import json
+import unicodedata
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+# 超过该长度的字符串/字节串只保留摘要，避免截图等大负载进入缓存键
+LARGE_PAYLOAD_THRESHOLD = 1024
+
+def digest(data: bytes) -> str:
+    """计算快速内容摘要"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def normalize_text(text: str) -> str:
+    """文本归一化：统一全半角并折叠空白"""
+    return " ".join(unicodedata.normalize('NFKC', text).split())
+
+def canonicalize(value: Any) -> Any:
+    """将参数转换为跨进程稳定、可JSON序列化的形式"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) > LARGE_PAYLOAD_THRESHOLD:
+            return {'digest': digest(value.encode('utf-8'))}
+        return normalize_text(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'digest': digest(bytes(value))}
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, 'capability_fingerprint'):
+        # 设备只按能力指纹区分，同型号设备共享缓存
+        return {'device': value.capability_fingerprint()}
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(json.dumps(canonicalize(v), sort_keys=True) for v in value)
+    # 其他对象退化为类型名加字符串形式
+    return f"{type(value).__name__}:{value}"
+
+def make_cache_key(
+    func: Callable,
+    signature: inspect.Signature,
+    args: tuple,
+    kwargs: Dict,
+    prefix: str = "llm"
+) -> str:
+    """生成内容寻址的缓存键
+
+    键由函数名、版本（提示词模板和模型）和归一化参数的摘要组成，
+    其中self不参与计算。
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+
+    instance = arguments.pop('self', None)
+    version = get_cache_version(instance, func.__name__)
+
+    payload = json.dumps(
+        canonicalize(arguments),
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+    return f"{prefix}:{func.__name__}:{version}:{digest(payload.encode('utf-8'))}"
+
+def get_cache_version(instance: Any, func_name: str) -> Optional[str]:
+    """获取缓存版本，由被装饰方法所属对象的cache_version提供"""
+    cache_version = getattr(instance, 'cache_version', None)
+    if cache_version is None:
+        return None
+    return cache_version(func_name)
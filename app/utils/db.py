@@ -1,35 +1,135 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+import time
+from typing import Dict, List, Mapping
+from flask import g
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 from app import db
+from app.utils.logger import logger
+from app.utils.monitoring import db_pool_checked_out, db_pool_checkout_timeouts, db_pool_checkout_wait
 
-def optimize_db_connection():
-    """优化数据库连接池"""
-    engine = create_engine(
-        db.engine.url,
-        pool_size=20,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=1800
-    )
-    
-    db.session = scoped_session(
-        sessionmaker(
-            autocommit=False,
-            autoflush=False,
-            bind=engine
+PRIMARY_BIND = 'primary'
+REPLICA_BIND = 'replica'
+
+class MeteredQueuePool(QueuePool):
+    """记录取连接等待时间的连接池，指标按logging_name（主库/副本）区分"""
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_checkout_timeouts.labels(bind=self.logging_name).inc()
+            raise
+        finally:
+            db_pool_checkout_wait.labels(bind=self.logging_name).observe(time.monotonic() - started)
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(uri: str, config: Mapping, bind: str = PRIMARY_BIND) -> Dict:
+    """按数据库类型生成引擎参数"""
+    options = {
+        'pool_pre_ping': True,  # 取出连接时检测是否已断开
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_logging_name': bind
+    }
+    # 内存SQLite由Flask-SQLAlchemy固定使用StaticPool，不能设置池大小
+    if not _is_memory_sqlite(make_url(uri)):
+        options.update(
+            poolclass=MeteredQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT']
         )
-    )
-    
-    return engine
-
-def add_db_indexes():
-    """添加数据库索引"""
-    from app.models.task import Task
-    from app.models.device import Device
-    
-    # 为常用查询添加索引
-    db.Index('idx_task_status', Task.status)
-    db.Index('idx_task_device_id', Task.device_id)
-    db.Index('idx_device_status', Device.status)
-    
-    db.session.commit() 
\ No newline at end of file
+    return options
+
+def configure_database(app):
+    """由配置生成主库和只读副本的引擎参数，须在db.init_app之前调用"""
+    config = app.config
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(config['SQLALCHEMY_DATABASE_URI'], config),
+        **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    replica = config.get('DATABASE_REPLICA_URL')
+    if replica:
+        config['SQLALCHEMY_BINDS'] = {
+            **config.get('SQLALCHEMY_BINDS', {}),
+            REPLICA_BIND: {'url': replica, **engine_options(replica, config, REPLICA_BIND)}
+        }
+
+def _sqlite_pragmas(busy_timeout: int, memory: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not memory:
+                # WAL模式下读写互不阻塞，提交只需追加日志；synchronous=NORMAL在WAL下不会损坏数据库
+                cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        finally:
+            cursor.close()
+    return on_connect
+
+def instrument_engines(app):
+    """为应用的各个引擎设置SQLite参数并记录连接使用数，须在应用上下文中调用"""
+    for bind_key, engine in db.engines.items():
+        bind = bind_key or PRIMARY_BIND
+        if engine.dialect.name == 'sqlite':
+            memory = _is_memory_sqlite(engine.url)
+            event.listen(engine, 'connect', _sqlite_pragmas(app.config['DB_SQLITE_BUSY_TIMEOUT'], memory))
+        gauge = db_pool_checked_out.labels(bind=bind)
+        event.listen(engine, 'checkout', lambda *args, gauge=gauge: gauge.inc())
+        event.listen(engine, 'checkin', lambda *args, gauge=gauge: gauge.dec())
+
+def read_session() -> Session:
+    """任务列表、统计等只读查询使用的会话
+
+    配置了只读副本时连接副本（随应用上下文结束关闭），否则就是db.session。
+    副本可能有复制延迟，写入后需要立即读到的数据仍应查询主库。
+    """
+    engine = db.engines.get(REPLICA_BIND)
+    if engine is None:
+        return db.session
+    if '_read_session' not in g:
+        g._read_session = Session(engine)
+    return g._read_session
+
+def close_read_session(exception=None):
+    session = g.pop('_read_session', None)
+    if session is not None:
+        session.close()
+
+def add_db_indexes(engine=None) -> List[str]:
+    """为已存在的表补建模型上声明的索引（可重复执行），返回新建的索引名
+
+    db.create_all只创建缺少的表，不会给已有的表加索引；应用启动时和`flask create-indexes`调用。
+    旧库的表缺少索引所需的列时跳过该索引，单个索引创建失败只记录日志，不影响启动。
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            missing = [column.name for column in index.columns if column.name not in columns]
+            if missing:
+                logger.warning(
+                    f"Skipping index {index.name}: table {table.name} has no column {', '.join(missing)}"
+                )
+                continue
+            try:
+                index.create(engine)
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to create index {index.name} on {table.name}: {str(e)}")
+                continue
+            created.append(index.name)
+            logger.info(f"Created index {index.name} on {table.name}")
+    return created
@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+import aiohttp
+from app.utils.logger import logger
+from app.utils.monitoring import (
+    llm_http_pool_in_use,
+    llm_http_pool_wait_latency,
+    llm_http_connections_created,
+    llm_http_connections_reused
+)
+
+class PooledHTTPClient:
+    """按事件循环复用的aiohttp连接池客户端"""
+    # ClientSession与创建它的事件循环绑定，因此每个事件循环持有一个长连接会话，
+    # 循环被回收后对应会话也随弱引用一起释放
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: int = 300,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+        total_timeout: Optional[float] = None
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        self._sessions = weakref.WeakKeyDictionary()  # 事件循环 -> ClientSession
+        self._in_use = 0
+        self._stats = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'queued': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0
+        }
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        """创建连接池跟踪配置，用于统计连接等待时间和复用情况"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.queued_at = None
+            self._in_use += 1
+            self._stats['requests'] += 1
+            llm_http_pool_in_use.set(self._in_use)
+
+        async def on_request_end(session, ctx, params):
+            self._in_use -= 1
+            llm_http_pool_in_use.set(self._in_use)
+
+        async def on_connection_queued_start(session, ctx, params):
+            ctx.queued_at = time.perf_counter()
+            self._stats['queued'] += 1
+
+        async def on_connection_queued_end(session, ctx, params):
+            if ctx.queued_at is None:
+                return
+            waited = time.perf_counter() - ctx.queued_at
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            llm_http_pool_wait_latency.observe(waited)
+
+        async def on_connection_create_end(session, ctx, params):
+            self._stats['connections_created'] += 1
+            llm_http_connections_created.inc()
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self._stats['connections_reused'] += 1
+            llm_http_connections_reused.inc()
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_end)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """创建带连接池的会话"""
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=[self._create_trace_config()]
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的共享会话"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._create_session()
+            self._sessions[loop] = session
+            logger.info("Created pooled HTTP session", extra={
+                'limit': self.limit,
+                'limit_per_host': self.limit_per_host
+            })
+        return session
+
+    def post(self, url: str, **kwargs):
+        """发送POST请求，返回可用于async with的响应上下文"""
+        return self.get_session().post(url, **kwargs)
+
+    async def close(self):
+        """关闭当前事件循环上的会话，并丢弃其他已失效循环上的会话"""
+        loop = asyncio.get_running_loop()
+        for session_loop, session in list(self._sessions.items()):
+            if session.closed:
+                continue
+            if session_loop is loop:
+                await session.close()
+            elif session_loop.is_running():
+                # 其他线程上的事件循环（如任务调度器）需要在各自的循环中关闭会话
+                future = asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+                except Exception as e:
+                    logger.warning(f"Failed to close pooled HTTP session: {str(e)}")
+        self._sessions.clear()
+
+    def get_stats(self) -> Dict:
+        """获取连接池使用统计"""
+        stats = dict(self._stats)
+        stats['in_use'] = self._in_use
+        stats['sessions'] = len(self._sessions)
+        stats['limit'] = self.limit
+        stats['limit_per_host'] = self.limit_per_host
+        stats['wait_time_avg'] = (
+            stats['wait_time_total'] / stats['queued'] if stats['queued'] else 0.0
+        )
+        return stats
+
+class LoopThread:
+    """在后台线程上长期运行的事件循环"""
+    # 异步视图的每个请求都在新建的短生命周期事件循环上执行，按循环创建的连接池无法跨请求复用，
+    # 循环关闭时会话也不会被关闭；请求路径上的LLM调用提交到这里，共用同一个会话
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Awaitable) -> Future:
+        """在后台循环上执行协程（可从任意线程调用），立即返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def run(self, coro: Awaitable) -> Any:
+        """在后台循环上执行协程并等待结果，已在后台循环上时直接执行"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def stop(self, timeout: float = 5):
+        """停止后台循环"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+async def iter_sse(response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """逐个读取text/event-stream响应中事件的data字段"""
+    data = []
+    async for raw in response.content:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if not line:
+            # 空行表示一个事件结束
+            if data:
+                yield '\n'.join(data)
+                data = []
+            continue
+        if line.startswith(':'):
+            # 注释行，DashScope用它携带 :HTTP_STATUS/200
+            continue
+        field, _, value = line.partition(':')
+        if field == 'data':
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield '\n'.join(data)
@@ -0,0 +1,69 @@
+import json
+from typing import Any, List
+
+class JSONArrayStream:
+    """增量解析JSON数组：每个顶层元素一闭合就解析返回，无需等待整个数组"""
+    # 只跟踪字符串/转义状态和嵌套深度，元素文本闭合后交给json.loads解析；
+    # 数组开始前的内容（如markdown代码块标记）和数组结束后的内容被忽略
+
+    def __init__(self):
+        self.started = False
+        self.closed = False
+        self.count = 0  # 已解析的顶层元素数
+        self._element = []  # 当前顶层元素的文本
+        self._depth = 0  # 当前元素内部的嵌套深度
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """输入一段文本，返回其中闭合的顶层元素"""
+        elements = []
+        for char in chunk:
+            if self.closed:
+                break
+            if not self.started:
+                self.started = char == '['
+                continue
+
+            if self._in_string:
+                self._element.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0 and char in ',]':
+                # 数字、字符串等标量元素在分隔符处结束
+                self._flush(elements)
+                self.closed = char == ']'
+                continue
+
+            self._element.append(char)
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth < 0:
+                    raise ValueError(f"Unbalanced '{char}' in JSON array")
+                if self._depth == 0:
+                    self._flush(elements)
+        return elements
+
+    def _flush(self, elements: List[Any]):
+        text = ''.join(self._element).strip()
+        self._element = []
+        if text:
+            elements.append(json.loads(text))
+            self.count += 1
+
+    def close(self):
+        """输入结束，数组未完整闭合时抛出ValueError"""
+        if not self.started:
+            raise ValueError("No JSON array found")
+        if not self.closed:
+            raise ValueError(f"JSON array is not closed after {self.count} elements")
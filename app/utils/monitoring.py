@@ -1,13 +1,139 @@
 import time
 from functools import wraps
 from app.utils.logger import logger
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 # 定义指标
 request_count = Counter('http_requests_total', 'Total HTTP requests')
 request_latency = Histogram('http_request_latency_seconds', 'HTTP request latency')
 llm_request_count = Counter('llm_requests_total', 'Total LLM API calls')
 llm_request_latency = Histogram('llm_request_latency_seconds', 'LLM API latency')
+llm_stream_first_action_latency = Histogram(
+    'llm_stream_first_action_seconds',
+    'Time until the first complete action arrives on a streamed plan'
+)
+
+# LLM响应缓存指标
+llm_cache_hits = Counter('llm_cache_hits_total', 'LLM response cache hits', ['function'])
+llm_cache_misses = Counter('llm_cache_misses_total', 'LLM response cache misses', ['function'])
+llm_cache_coalesced = Counter(
+    'llm_cache_coalesced_total',
+    'LLM calls served by joining an identical in-flight request',
+    ['function']
+)
+
+# LLM HTTP连接池指标
+llm_http_pool_in_use = Gauge('llm_http_pool_in_use', 'In-flight requests on the LLM HTTP pool')
+llm_http_pool_wait_latency = Histogram(
+    'llm_http_pool_wait_seconds',
+    'Time spent waiting for a free LLM HTTP connection'
+)
+llm_http_connections_created = Counter(
+    'llm_http_connections_created_total',
+    'New TCP/TLS connections opened to the LLM API'
+)
+llm_http_connections_reused = Counter(
+    'llm_http_connections_reused_total',
+    'Keep-alive connections reused for LLM API calls'
+)
+
+# 设备I/O指标
+device_call_latency = Histogram(
+    'device_call_latency_seconds',
+    'Latency of blocking uiautomator2 calls',
+    ['operation']
+)
+device_call_queue_wait = Histogram(
+    'device_call_queue_wait_seconds',
+    'Time a device call waited in its device lane'
+)
+device_lane_queue_depth = Gauge(
+    'device_lane_queue_depth',
+    'Pending calls per device lane',
+    ['device']
+)
+
+# 动作执行指标
+action_latency = Histogram(
+    'action_latency_seconds',
+    'Time spent in each action handler',
+    ['action']
+)
+action_retries = Counter(
+    'action_retries_total',
+    'Leaf action retries by action type',
+    ['action']
+)
+
+# 控件索引指标
+hierarchy_lookups = Counter(
+    'hierarchy_lookups_total',
+    'Element lookups answered from the UI hierarchy index',
+    ['result']
+)
+
+# 分层元素定位指标
+locator_resolutions = Counter(
+    'locator_resolutions_total',
+    'Element targets resolved per locator tier (none = not found)',
+    ['tier']
+)
+locator_tier_latency = Histogram(
+    'locator_tier_latency_seconds',
+    'Time spent in each element locator tier',
+    ['tier']
+)
+vision_batch_targets = Histogram(
+    'vision_batch_targets',
+    'Targets located by a single vision request',
+    buckets=(1, 2, 3, 4, 6, 8)
+)
+
+# 屏幕变化等待指标
+screen_wait_latency = Histogram(
+    'screen_wait_latency_seconds',
+    'Time spent waiting on the screen watcher',
+    ['kind']
+)
+
+# 任务调度指标
+scheduler_queue_length = Gauge('scheduler_queue_length', 'Tasks waiting for a device lease')
+scheduler_running_tasks = Gauge('scheduler_running_tasks', 'Tasks submitted to the scheduler and not yet finished')
+device_pool_utilisation = Gauge(
+    'device_pool_utilisation',
+    'Fraction of healthy devices currently leased to a task'
+)
+execution_journal_flushes = Counter(
+    'execution_journal_flushes_total',
+    'Batched step-result inserts by trigger (size, time, end)',
+    ['trigger']
+)
+task_queue_jobs = Gauge('task_queue_jobs', 'Jobs in the durable task queue', ['status'])
+task_queue_claims = Counter(
+    'task_queue_claims_total',
+    'Jobs claimed by workers (orphaned = re-queued after a worker was lost)',
+    ['kind']
+)
+task_prestart_predictions = Counter(
+    'task_prestart_predictions_total',
+    'Speculative app launches during task planning (hit, miss = rolled back)',
+    ['result']
+)
+task_prestart_latency = Histogram(
+    'task_prestart_latency_seconds',
+    'Device connection and warmup time overlapped with task planning'
+)
+db_pool_checkout_wait = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled database connection',
+    ['bind']
+)
+db_pool_checkout_timeouts = Counter(
+    'db_pool_checkout_timeouts_total',
+    'Pool checkouts that gave up waiting for a free connection',
+    ['bind']
+)
+db_pool_checked_out = Gauge('db_pool_checked_out', 'Database connections currently in use', ['bind'])
 
 def monitor_performance(f):
     """性能监控装饰器"""
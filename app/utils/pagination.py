@@ -0,0 +1,57 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import and_, or_
+
+# 键集分页：按(时间为空优先, 时间 DESC, id DESC)排序，游标记录上一页最后一行的(时间, id)，
+# 下一页只取排在它之后的行，翻页开销与页码无关
+
+def encode_cursor(timestamp: Optional[datetime], row_id: int) -> str:
+    """把上一页最后一行编码为不透明的游标"""
+    value = [timestamp.isoformat() if timestamp else None, row_id]
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """解析游标，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return (datetime.fromisoformat(timestamp) if timestamp else None), row_id
+
+def keyset_segments(time_column, id_column, cursor: Optional[Tuple[Optional[datetime], int]] = None) -> List[Tuple]:
+    """游标之后的行按排序分成的查询段，返回[(过滤条件, 排序), ...]
+
+    时间为空的行（尚未开始）排在最前。两段分别查询、各自按(时间, id)索引顺序读取：
+    不用NULLS FIRST（MySQL不支持），也不按"时间是否为空"的表达式排序（无法使用索引）。
+    """
+    timestamp, row_id = cursor if cursor is not None else (None, None)
+    segments = []
+    if cursor is None or timestamp is None:
+        condition = time_column.is_(None)
+        if row_id is not None:
+            condition = and_(condition, id_column < row_id)
+        segments.append((condition, (id_column.desc(),)))
+        rest = time_column.isnot(None)
+    else:
+        rest = or_(
+            time_column < timestamp,
+            and_(time_column == timestamp, id_column < row_id)
+        )
+    segments.append((rest, (time_column.desc(), id_column.desc())))
+    return segments
+
+def keyset_rows(query, time_column, id_column, cursor=None, limit: int = 50) -> Iterator:
+    """按键集顺序逐段查询游标之后的行，最多返回limit行"""
+    remaining = limit
+    for condition, order in keyset_segments(time_column, id_column, cursor):
+        for row in query.filter(condition).order_by(*order).limit(remaining).yield_per(remaining):
+            yield row
+            remaining -= 1
+        if remaining <= 0:
+            return
@@ -146,8 +146,12 @@ class ResponseAnalyzer:
                 continue
                 
             # 验证动作参数
+            # available_actions以ActionType枚举为键，响应中是字符串值
             action_type = action['type']
-            action_spec = available_actions[action_type]
+            action_spec = next(
+                spec for key, spec in available_actions.items()
+                if getattr(key, 'value', key) == action_type
+            )
             error = ResponseValidator.validate_params(action, action_spec)
             if error:
                 error.location = f"action[{i}].params"
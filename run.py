@@ -47,6 +47,44 @@ async def start_flask_app():
         logger.error(f"Failed to start Flask application: {str(e)}")
         raise
 
+# 在Web进程内运行的任务队列worker
+task_worker = None
+
+async def start_task_worker():
+    """在Web进程内运行任务队列worker（通过worker.py单独部署时关闭）
+
+    worker轮询队列时同步访问数据库，在单独的线程和事件循环上运行，不阻塞Hypercorn的事件循环
+    """
+    global task_worker
+    from app.api.routes import task_queue, task_scheduler
+    from app.services.task_worker import TaskWorker
+    task_worker = TaskWorker(
+        app,
+        task_queue,
+        task_scheduler,
+        concurrency=Config.TASK_WORKER_CONCURRENCY,
+        poll_interval=Config.TASK_QUEUE_POLL_INTERVAL
+    )
+    thread = task_worker.start_thread()
+    await asyncio.to_thread(thread.join)
+
+async def shutdown():
+    """停止任务调度，释放LLM服务持有的HTTP连接池，并等待缓存写入完成"""
+    from app.api.routes import llm_service, llm_loop, automation_service, task_scheduler
+    from app.utils.cache import llm_cache
+    # 先停止领取新任务并等待执行中的任务
+    if task_worker is not None:
+        await asyncio.to_thread(task_worker.stop_thread)
+    # 再关闭连接池（包括调度器事件循环上的会话），然后停止调度器
+    for service in (llm_service, automation_service.llm_service):
+        try:
+            await service.close()
+        except Exception as e:
+            logger.error(f"Failed to close LLM HTTP pool: {str(e)}")
+    llm_loop.stop()
+    task_scheduler.shutdown()
+    llm_cache.flush(timeout=5)
+
 async def main():
     """主函数：同时启动Flask和WebSocket服务器"""
     try:
@@ -55,12 +93,16 @@ async def main():
             asyncio.create_task(start_flask_app()),
             asyncio.create_task(start_websocket_server())
         ]
+        if Config.TASK_QUEUE_INLINE_WORKER:
+            tasks.append(asyncio.create_task(start_task_worker()))
         
         # 等待所有任务完成
         await asyncio.gather(*tasks)
     except Exception as e:
         logger.error(f"Application startup failed: {str(e)}")
         raise
+    finally:
+        await shutdown()
 
 if __name__ == "__main__":
     try:
@@ -78,8 +120,9 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"Application crashed: {str(e)}")
     finally:
-        # 清理和关闭事件循环
+        # 清理连接池并关闭事件循环
         try:
+            loop.run_until_complete(shutdown())
             loop.close()
         except:
             pass
@@ -0,0 +1,221 @@
+"""基准测试：使用模拟设备和模拟DashScope服务，测量设备数量增长时的性能
+
+运行方式（在项目根目录）：
+    python -m tests.benchmarks.run_benchmarks --devices 1 10 50
+"""
+import argparse
+import asyncio
+import json
+import re
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Dict, List
+from app.models.device import Device, DeviceStatus, DeviceType
+from app.services.automation_service import AutomationService
+from app.services.llm_service import LLMService
+from app.services.scheduler import DevicePool, TaskScheduler
+from app.utils.cache import llm_cache
+from tests.fakes import FakeDashScope, connect_fake_device, default_screens, screen_locator
+
+DEVICE_WIDTH = 1080
+
+# 端到端任务：启动设置、进入WLAN、返回（点击通过视觉定位完成）
+END_TO_END_PLAN = [
+    {'type': 'launch_app', 'params': {'package': 'com.android.settings'}},
+    {'type': 'click', 'params': {'target': 'WLAN'}},
+    {'type': 'click', 'params': {'target': '返回'}}
+]
+
+def summarize(samples: List[float]) -> Dict:
+    """计算延迟分布(毫秒)"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))] * 1000
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 2),
+        'p50_ms': round(percentile(0.5), 2),
+        'p95_ms': round(percentile(0.95), 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+def make_device_model(serial: str) -> Device:
+    """构造用于生成提示词的设备记录（不写入数据库）"""
+    device = Device(serial, serial, DeviceType.ANDROID)
+    device.status = DeviceStatus.ONLINE
+    return device
+
+def plan_handler(instruction: str):
+    """按指令去掉编号后的内容返回执行计划，编号保证每个请求都不命中缓存"""
+    base = re.sub(r'\s*#\d+$', '', instruction)
+    if base == '打开设置进入WLAN':
+        return END_TO_END_PLAN
+    return [{'type': 'click', 'params': {'target': base}}]
+
+async def bench_planning(llm_service: LLMService, device_count: int, rounds: int) -> Dict:
+    """规划延迟：每台设备并发发起一次规划请求，共rounds轮"""
+    devices = [make_device_model(f'fake-{index:03d}') for index in range(device_count)]
+    latencies = []
+    counter = 0
+
+    async def plan(device):
+        nonlocal counter
+        counter += 1
+        started = time.perf_counter()
+        await llm_service.analyze_text_input(f'打开设置 #{counter}', device)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*[plan(device) for device in devices])
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result['plans_per_second'] = round(len(latencies) / elapsed, 2)
+    return result
+
+async def bench_actions(automation: AutomationService, device_ids: List[str], actions_per_device: int) -> Dict:
+    """动作吞吐：所有设备同时执行输入和滑动动作"""
+    actions = [
+        {'type': 'input', 'params': {'text': 'hello'}},
+        {'type': 'swipe', 'params': {'direction': 'up', 'duration': 0.1}}
+    ]
+    latencies = []
+
+    async def run(device_id):
+        for index in range(actions_per_device):
+            started = time.perf_counter()
+            await automation.execute_action(device_id, actions[index % len(actions)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run(device_id) for device_id in device_ids])
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result['actions_per_second'] = round(len(latencies) / elapsed, 2)
+    return result
+
+async def bench_end_to_end(
+    automation: AutomationService,
+    llm_service: LLMService,
+    device_ids: List[str],
+    tasks_per_device: int
+) -> Dict:
+    """端到端任务延迟：经调度器租用设备，规划后逐步执行"""
+    task_latencies = []
+    failures = []
+
+    async def runner(task_id, device_id, can_failover):
+        steps = await llm_service.analyze_text_input(
+            f'打开设置进入WLAN #{task_id}',
+            make_device_model(device_id)
+        )
+        await automation.execute_plan(device_id, steps)
+
+    pool = DevicePool(max_concurrent_tasks=len(device_ids), max_tasks_per_user=len(device_ids))
+    scheduler = TaskScheduler(pool, runner)
+
+    async def submit(task_id):
+        started = time.perf_counter()
+        try:
+            await asyncio.wrap_future(scheduler.submit(task_id))
+            task_latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            failures.append(str(e))
+
+    try:
+        scheduler.sync_devices([make_device_model(device_id) for device_id in device_ids])
+        started = time.perf_counter()
+        await asyncio.gather(*[submit(task_id) for task_id in range(len(device_ids) * tasks_per_device)])
+        elapsed = time.perf_counter() - started
+    finally:
+        # 调度器循环上的HTTP会话需要在循环停止前关闭
+        await llm_service.close()
+        scheduler.shutdown()
+
+    result = summarize(task_latencies)
+    result['tasks_per_second'] = round(len(task_latencies) / elapsed, 2) if elapsed else 0.0
+    result['failures'] = len(failures)
+    return result
+
+async def run_for_device_count(args, base_url: str, device_count: int) -> Dict:
+    """在指定设备数量下运行全部基准"""
+    llm_cache.l1.clear()
+    tracemalloc.start()
+    llm_service = LLMService(base_url=base_url)
+    automation = AutomationService(
+        llm_service=llm_service,
+        connector=partial(connect_fake_device, latency_scale=args.device_latency_scale)
+    )
+    device_ids = [f'fake-{index:03d}' for index in range(device_count)]
+
+    try:
+        connect_started = time.perf_counter()
+        await asyncio.gather(*[automation.connect_device(device_id) for device_id in device_ids])
+        connect_elapsed = time.perf_counter() - connect_started
+
+        results = {
+            'devices': device_count,
+            'connect_all_ms': round(connect_elapsed * 1000, 2),
+            'planning': await bench_planning(llm_service, device_count, args.rounds),
+            'actions': await bench_actions(automation, device_ids, args.actions),
+            'end_to_end': await bench_end_to_end(automation, llm_service, device_ids, args.tasks)
+        }
+        current, peak = tracemalloc.get_traced_memory()
+        results['memory'] = {
+            'traced_current_mb': round(current / 1024 / 1024, 2),
+            'traced_peak_mb': round(peak / 1024 / 1024, 2),
+            'peak_per_device_kb': round(peak / 1024 / device_count, 1),
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+        }
+        return results
+    finally:
+        tracemalloc.stop()
+        await asyncio.gather(*[automation.disconnect_device(device_id) for device_id in device_ids])
+        automation.device_io.shutdown(wait=False)
+        await llm_service.close()
+
+async def main(args) -> List[Dict]:
+    screens = default_screens()
+    fake = FakeDashScope(
+        text_handler=plan_handler,
+        vision_handler=screen_locator(screens, DEVICE_WIDTH),
+        latency={'text': args.llm_latency, 'multimodal': args.vision_latency},
+        jitter=args.llm_jitter
+    )
+    async with fake:
+        results = []
+        for device_count in args.devices:
+            result = await run_for_device_count(args, fake.base_url, device_count)
+            results.append(result)
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark planning and execution against fake devices')
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 10, 50], help='device counts to measure')
+    parser.add_argument('--rounds', type=int, default=3, help='planning rounds per device')
+    parser.add_argument('--actions', type=int, default=20, help='actions per device in the throughput run')
+    parser.add_argument('--tasks', type=int, default=2, help='end-to-end tasks per device')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='fake text-generation latency (s)')
+    parser.add_argument('--vision-latency', type=float, default=0.4, help='fake multimodal latency (s)')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='uniform extra latency (s)')
+    parser.add_argument('--device-latency-scale', type=float, default=1.0,
+                        help='multiplier for fake device call latencies, 0 disables them')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    sys.exit(0)
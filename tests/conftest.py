@@ -1,18 +1,20 @@
 import pytest
 from app import create_app, db
+from app.config import Config
 from app.models.user import User
-from app.models.device import Device
+from app.models.device import Device, DeviceType
 from app.models.task import Task
 
+class TestConfig(Config):
+    """测试配置：数据库URI须在create_app（db.init_app创建引擎）之前确定"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_TYPE = 'SimpleCache'
+
 @pytest.fixture
 def app():
-    """创建测试应用实例"""
-    app = create_app()
-    app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'
-    })
-    return app
+    """创建测试应用实例（内存数据库）"""
+    return create_app(TestConfig)
 
 @pytest.fixture
 def client(app):
@@ -67,7 +69,7 @@ def test_device(db_session):
     device = Device(
         device_id='test_device_001',
         name='Test Device',
-        platform='Android'
+        device_type=DeviceType.ANDROID
     )
     db_session.session.add(device)
     db_session.session.commit()
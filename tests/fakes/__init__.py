@@ -0,0 +1,20 @@
+from tests.fakes.u2_device import (
+    DEFAULT_LATENCY,
+    FakeElementSpec,
+    FakeScreen,
+    FakeU2Device,
+    connect_fake_device,
+    default_screens
+)
+from tests.fakes.dashscope_server import FakeDashScope, screen_locator
+
+__all__ = [
+    'DEFAULT_LATENCY',
+    'FakeElementSpec',
+    'FakeScreen',
+    'FakeU2Device',
+    'connect_fake_device',
+    'default_screens',
+    'FakeDashScope',
+    'screen_locator'
+]
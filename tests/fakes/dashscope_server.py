@@ -0,0 +1,228 @@
+import asyncio
+import base64
+import json
+import random
+import re
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from aiohttp import web
+from PIL import Image
+from app.config import Config
+
+TEXT_GENERATION_PATH = Config.TEXT_GENERATION_PATH
+MULTIMODAL_GENERATION_PATH = Config.MULTIMODAL_GENERATION_PATH
+
+# 提示词中用户指令所在的位置，见PromptTemplate.render
+INSTRUCTION_PATTERN = re.compile(r'现在，请将以下用户指令转换为自动化操作序列：\n(.*?)(?:\n\n|$)', re.S)
+TARGET_PATTERN = re.compile(r'找到"(.*?)"')
+BATCH_TARGET_PATTERN = re.compile(r'^\[(\d+)\] "(.*?)"$', re.M)
+
+def extract_instruction(prompt: str) -> str:
+    """从文本生成请求的提示词中取出用户指令"""
+    match = INSTRUCTION_PATTERN.search(prompt)
+    return match.group(1).strip() if match else prompt.strip()
+
+def extract_target(query: str) -> Optional[str]:
+    """从视觉定位请求中取出目标元素"""
+    match = TARGET_PATTERN.search(query)
+    return match.group(1) if match else None
+
+def extract_batch_targets(query: str) -> List[str]:
+    """从批量视觉定位请求中按编号取出全部目标"""
+    return [target for _, target in sorted(
+        ((int(index), target) for index, target in BATCH_TARGET_PATTERN.findall(query))
+    )]
+
+def image_size(data_uri: str) -> Optional[Tuple[int, int]]:
+    """读取data URI中图像的尺寸（只解析文件头）"""
+    if not data_uri:
+        return None
+    encoded = data_uri.split(',', 1)[-1]
+    try:
+        return Image.open(BytesIO(base64.b64decode(encoded))).size
+    except Exception:
+        return None
+
+def screen_locator(screens: Dict, device_width: int) -> Callable:
+    """根据模拟设备的屏幕定义返回元素位置的视觉处理函数，坐标按请求图像缩放"""
+    def locate(target: Optional[str], query: str, size: Optional[Tuple[int, int]]) -> Dict:
+        scale = size[0] / device_width if size else 1.0
+        for screen in screens.values():
+            element = screen.find(text=target)
+            if element is not None:
+                return {
+                    'found': True,
+                    'confidence': 0.95,
+                    'box': [round(value * scale, 1) for value in element.bounds],
+                    'description': f'{screen.name}: {target}'
+                }
+        return {'found': False, 'confidence': 0.0, 'box': [0, 0, 0, 0], 'description': ''}
+    return locate
+
+class FakeDashScope:
+    """模拟DashScope文本生成与多模态生成接口的本地HTTP服务"""
+
+    def __init__(
+        self,
+        plans: Optional[Dict[str, List[Dict]]] = None,
+        text_handler: Optional[Callable[[str], Union[str, List[Dict]]]] = None,
+        vision_handler: Optional[Callable[[Optional[str], str, Optional[Tuple[int, int]]], Dict]] = None,
+        latency: Union[float, Dict[str, float]] = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        stream_chunk_size: int = 16,
+        stream_delay: float = 0.0
+    ):
+        self.plans = plans or {}  # 用户指令 -> 固定返回的执行计划
+        self.text_handler = text_handler
+        self.vision_handler = vision_handler
+        self.latency = latency  # 固定延迟，或按 'text'/'multimodal' 分别设置
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stream_chunk_size = stream_chunk_size  # SSE增量输出每个事件的字符数
+        self.stream_delay = stream_delay  # SSE事件之间的间隔(秒)，模拟逐token生成
+        self.requests = []  # (路径, 请求体)
+        self.status_counts = {}
+        self.base_url = None
+        self._forced_errors = []
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """启动服务，返回可用作DASHSCOPE_BASE_URL的地址"""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post(TEXT_GENERATION_PATH, self._handle_text)
+        app.router.add_post(MULTIMODAL_GENERATION_PATH, self._handle_multimodal)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.base_url = f'http://{bound_host}:{bound_port}'
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> 'FakeDashScope':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 500, message: str = 'Injected failure'):
+        """让接下来的count个请求返回错误"""
+        self._forced_errors.extend([(status, message)] * count)
+
+    def _latency_for(self, kind: str) -> float:
+        base = self.latency.get(kind, 0.0) if isinstance(self.latency, dict) else self.latency
+        if self.jitter:
+            base += self.random.uniform(0, self.jitter)
+        return base
+
+    async def _prepare(self, request: web.Request, kind: str):
+        """记录请求、模拟延迟并按需注入错误，返回(请求体, 错误响应)"""
+        payload = await request.json()
+        self.requests.append((request.path, payload))
+        delay = self._latency_for(kind)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        error = None
+        if self._forced_errors:
+            error = self._forced_errors.pop(0)
+        elif self.error_rate and self.random.random() < self.error_rate:
+            error = (500, 'Injected failure')
+        if error:
+            status, message = error
+            return payload, self._respond({'code': 'InternalError', 'message': message}, status)
+        return payload, None
+
+    def _respond(self, body: Dict, status: int = 200) -> web.Response:
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        return web.json_response(body, status=status)
+
+    def _completion(self, content, request_id: int) -> Dict:
+        return {
+            'request_id': f'fake-{request_id}',
+            'output': {
+                'choices': [{
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': content}
+                }]
+            },
+            'usage': {'input_tokens': 0, 'output_tokens': 0}
+        }
+
+    def plan_for(self, instruction: str) -> Union[str, List[Dict]]:
+        """生成执行计划：优先固定计划，其次自定义处理函数，最后点击指令文本"""
+        if instruction in self.plans:
+            return self.plans[instruction]
+        if self.text_handler is not None:
+            return self.text_handler(instruction)
+        return [{'type': 'click', 'params': {'target': instruction}}]
+
+    async def _handle_text(self, request: web.Request) -> web.Response:
+        payload, error = await self._prepare(request, 'text')
+        if error:
+            return error
+        prompt = payload.get('input', {}).get('prompt', '')
+        plan = self.plan_for(extract_instruction(prompt))
+        content = plan if isinstance(plan, str) else json.dumps(plan, ensure_ascii=False)
+        if request.headers.get('X-DashScope-SSE') == 'enable':
+            return await self._stream(request, content, len(self.requests))
+        return self._respond(self._completion(content, len(self.requests)))
+
+    async def _stream(self, request: web.Request, content: str, request_id: int) -> web.StreamResponse:
+        """按DashScope SSE增量输出的格式分段返回内容"""
+        self.status_counts[200] = self.status_counts.get(200, 0) + 1
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        size = self.stream_chunk_size
+        for number, start in enumerate(range(0, len(content), size), 1):
+            if self.stream_delay:
+                await asyncio.sleep(self.stream_delay)
+            event = self._completion(content[start:start + size], request_id)
+            if start + size < len(content):
+                event['output']['choices'][0]['finish_reason'] = 'null'
+            data = json.dumps(event, ensure_ascii=False)
+            await response.write(
+                f'id:{number}\nevent:result\n:HTTP_STATUS/200\ndata:{data}\n\n'.encode('utf-8')
+            )
+        await response.write_eof()
+        return response
+
+    def _locate(self, target: Optional[str], query: str, size: Optional[Tuple[int, int]]) -> Dict:
+        if self.vision_handler is not None:
+            return self.vision_handler(target, query, size)
+        return {'found': False, 'confidence': 0.0, 'box': [0, 0, 0, 0], 'description': ''}
+
+    async def _handle_multimodal(self, request: web.Request) -> web.Response:
+        payload, error = await self._prepare(request, 'multimodal')
+        if error:
+            return error
+        body = payload.get('input', {})
+
+        if 'messages' in body:
+            # OCR/语音/屏幕分析使用messages格式，返回内容为片段列表
+            parts = body['messages'][-1]['content']
+            text = next((part['text'] for part in parts if 'text' in part), '')
+            content = [{'text': text}]
+        else:
+            # 视觉定位：prompt + image，返回JSON字符串；批量请求返回按编号排列的数组
+            query = body.get('prompt', '')
+            size = image_size(body.get('image'))
+            batch = extract_batch_targets(query)
+            if batch:
+                result = [
+                    dict(self._locate(target, query, size), index=index)
+                    for index, target in enumerate(batch)
+                ]
+            else:
+                result = self._locate(extract_target(query), query, size)
+            content = json.dumps(result, ensure_ascii=False)
+        return self._respond(self._completion(content, len(self.requests)))
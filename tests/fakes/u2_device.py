@@ -0,0 +1,409 @@
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+from PIL import Image, ImageDraw
+
+# 各操作的模拟耗时(秒)，取自真机上uiautomator2调用的典型量级
+DEFAULT_LATENCY = {
+    'connect': 0.5,
+    'click': 0.05,
+    'swipe': 0.3,
+    'send_keys': 0.1,
+    'clear_text': 0.05,
+    'window_size': 0.01,
+    'screenshot': 0.25,
+    'dump_hierarchy': 0.3,
+    'exists': 0.05,
+    'get_text': 0.03,
+    'app_start': 1.0,
+    'app_stop': 0.2,
+    'app_current': 0.02,
+    'info': 0.02
+}
+
+@dataclass
+class FakeElementSpec:
+    """模拟屏幕上的一个控件"""
+    text: str
+    bounds: Tuple[int, int, int, int]  # 左、上、右、下
+    resource_id: str = ''
+    class_name: str = 'android.widget.TextView'
+    content_desc: str = ''
+    clickable: bool = True
+    editable: bool = False
+    goto: Optional[str] = None  # 点击后跳转到的屏幕
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        left, top, right, bottom = self.bounds
+        return (left + right) / 2, (top + bottom) / 2
+
+    def contains(self, x: float, y: float) -> bool:
+        left, top, right, bottom = self.bounds
+        return left <= x <= right and top <= y <= bottom
+
+@dataclass
+class FakeScreen:
+    """模拟的一个界面状态"""
+    name: str
+    package: str
+    activity: str
+    elements: List[FakeElementSpec] = field(default_factory=list)
+    on_swipe: Optional[str] = None  # 滑动后跳转到的屏幕
+    background: Tuple[int, int, int] = (245, 245, 245)
+
+    def find(self, **selector) -> Optional[FakeElementSpec]:
+        """按uiautomator2选择器查找控件"""
+        for element in self.elements:
+            if 'text' in selector and element.text != selector['text']:
+                continue
+            if 'textContains' in selector and selector['textContains'] not in element.text:
+                continue
+            if 'resourceId' in selector and element.resource_id != selector['resourceId']:
+                continue
+            if 'description' in selector and element.content_desc != selector['description']:
+                continue
+            if 'className' in selector and element.class_name != selector['className']:
+                continue
+            return element
+        return None
+
+def default_screens(width: int = 1080, height: int = 2340) -> Dict[str, FakeScreen]:
+    """一个包含桌面、设置和搜索页的简单脚本化应用"""
+    def row(index: int) -> Tuple[int, int, int, int]:
+        top = 300 + index * 180
+        return 40, top, width - 40, top + 150
+
+    launcher = FakeScreen('home', 'com.android.launcher', '.Launcher', [
+        FakeElementSpec('设置', (80, 400, 280, 600), 'com.android.launcher:id/icon', goto='settings'),
+        FakeElementSpec('浏览器', (320, 400, 520, 600), 'com.android.launcher:id/icon', goto='browser'),
+        FakeElementSpec('相机', (560, 400, 760, 600), 'com.android.launcher:id/icon')
+    ], background=(30, 60, 120))
+    settings = FakeScreen('settings', 'com.android.settings', '.Settings', [
+        FakeElementSpec('设置', (40, 120, 600, 220), 'android:id/title', clickable=False),
+        FakeElementSpec('WLAN', row(0), 'android:id/title', goto='wlan'),
+        FakeElementSpec('蓝牙', row(1), 'android:id/title'),
+        FakeElementSpec('显示', row(2), 'android:id/title'),
+        FakeElementSpec('声音', row(3), 'android:id/title'),
+        FakeElementSpec('返回', (20, 20, 140, 100), 'android:id/home', goto='home')
+    ], on_swipe='settings_more')
+    settings_more = FakeScreen('settings_more', 'com.android.settings', '.Settings', [
+        FakeElementSpec('电池', row(0), 'android:id/title'),
+        FakeElementSpec('存储', row(1), 'android:id/title'),
+        FakeElementSpec('关于手机', row(2), 'android:id/title'),
+        FakeElementSpec('返回', (20, 20, 140, 100), 'android:id/home', goto='settings')
+    ], on_swipe='settings', background=(235, 240, 250))
+    wlan = FakeScreen('wlan', 'com.android.settings', '.wifi.WifiSettings', [
+        FakeElementSpec('WLAN', (40, 120, 600, 220), 'android:id/title', clickable=False),
+        FakeElementSpec('开启WLAN', row(0), 'android:id/switch_widget', 'android.widget.Switch'),
+        FakeElementSpec('返回', (20, 20, 140, 100), 'android:id/home', goto='settings')
+    ], background=(250, 250, 235))
+    browser = FakeScreen('browser', 'com.android.browser', '.BrowserActivity', [
+        FakeElementSpec('', (40, 120, width - 40, 240), 'com.android.browser:id/url',
+                        'android.widget.EditText', editable=True),
+        FakeElementSpec('搜索', (width - 240, 260, width - 40, 360), 'com.android.browser:id/go'),
+        FakeElementSpec('返回', (20, 20, 140, 100), 'android:id/home', goto='home')
+    ], background=(255, 255, 255))
+    return {screen.name: screen for screen in (launcher, settings, settings_more, wlan, browser)}
+
+class FakeUiObject:
+    """模拟uiautomator2的UiObject"""
+
+    def __init__(self, device: 'FakeU2Device', selector: Dict):
+        self.device = device
+        self.selector = selector
+
+    def _element(self) -> Optional[FakeElementSpec]:
+        return self.device.current_screen.find(**self.selector)
+
+    @property
+    def exists(self) -> bool:
+        self.device._delay('exists')
+        return self._element() is not None
+
+    def wait(self, timeout: float = 10) -> bool:
+        """等待控件出现；模拟设备的界面只会因操作而变化，因此只检查一次"""
+        return self.exists
+
+    def click(self):
+        self.device._delay('click')
+        element = self._element()
+        if element is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+        self.device._tap(element)
+
+    def long_click(self, duration: float = 0.5):
+        self.device._delay('click', duration)
+        if self._element() is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+
+    def _pinch(self, operation: str):
+        self.device._delay(operation)
+        # 应用内容区域在模拟屏幕上没有对应控件，视为整个屏幕
+        if self.selector != {'resourceId': 'android:id/content'} and self._element() is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+
+    def pinch_in(self, percent: int = 100, steps: int = 50):
+        self._pinch('pinch_in')
+
+    def pinch_out(self, percent: int = 100, steps: int = 50):
+        self._pinch('pinch_out')
+
+    def get_text(self) -> Optional[str]:
+        self.device._delay('get_text')
+        element = self._element()
+        if element is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+        return self.device.field_values.get(id(element), element.text)
+
+    @property
+    def info(self) -> Dict:
+        element = self._element()
+        if element is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+        left, top, right, bottom = element.bounds
+        return {
+            'text': element.text,
+            'resourceName': element.resource_id,
+            'className': element.class_name,
+            'clickable': element.clickable,
+            'bounds': {'left': left, 'top': top, 'right': right, 'bottom': bottom}
+        }
+
+class FakeWatcher:
+    """模拟uiautomator2的watcher，只记录注册的规则"""
+
+    def __init__(self):
+        self.rules = []
+        self.running = False
+
+    def when(self, xpath: str) -> 'FakeWatcher':
+        self.rules.append(xpath)
+        return self
+
+    def click(self):
+        pass
+
+    def start(self, interval: float = 2.0):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+class FakeU2Device:
+    """模拟的uiautomator2设备：脚本化的屏幕状态机、可配置的调用延迟和截图生成"""
+
+    def __init__(
+        self,
+        serial: str = 'fake-0001',
+        screens: Optional[Dict[str, FakeScreen]] = None,
+        start_screen: str = 'home',
+        latency: Optional[Dict[str, float]] = None,
+        latency_scale: float = 1.0,
+        window_size: Tuple[int, int] = (1080, 2340),
+        screenshot_quality: int = 90
+    ):
+        self.serial = serial
+        self.width, self.height = window_size
+        self.screens = screens or default_screens(self.width, self.height)
+        self.screen_name = start_screen
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.latency_scale = latency_scale  # 0表示不模拟延迟
+        self.screenshot_quality = screenshot_quality
+        self.watcher = FakeWatcher()
+        self.field_values = {}  # id(输入框) -> 已输入的文本
+        self.focused = None
+        self.calls = Counter()
+        self.offline = False  # 模拟设备断开：之后的调用都抛出ConnectionError
+        self.history = []  # 屏幕跳转记录
+        self._back_stack = []  # 返回键可回到的屏幕
+        self._screenshots = {}  # (屏幕, 输入状态) -> JPEG数据
+        self._lock = threading.Lock()
+
+    @property
+    def current_screen(self) -> FakeScreen:
+        return self.screens[self.screen_name]
+
+    def _delay(self, operation: str, extra: float = 0.0):
+        self.calls[operation] += 1
+        if self.offline:
+            raise ConnectionError(f"Device {self.serial} is offline")
+        seconds = (self.latency.get(operation, 0.0) + extra) * self.latency_scale
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _goto(self, screen_name: Optional[str]):
+        if screen_name and screen_name != self.screen_name:
+            self.history.append((self.screen_name, screen_name))
+            self._back_stack.append(self.screen_name)
+            self.screen_name = screen_name
+            self.focused = None
+
+    def _tap(self, element: FakeElementSpec):
+        with self._lock:
+            if element.editable:
+                self.focused = element
+            self._goto(element.goto)
+
+    def __call__(self, **selector) -> FakeUiObject:
+        return FakeUiObject(self, selector)
+
+    def click(self, x: float, y: float):
+        """坐标点击，支持0-1之间的相对坐标"""
+        self._delay('click')
+        if x <= 1 and y <= 1:
+            x, y = x * self.width, y * self.height
+        for element in self.current_screen.elements:
+            if element.clickable and element.contains(x, y):
+                self._tap(element)
+                return
+
+    def long_click(self, x: float, y: float, duration: float = 0.5):
+        self._delay('click', duration)
+
+    def swipe(self, fx: float, fy: float, tx: float, ty: float, duration: float = None, steps: int = None):
+        self._delay('swipe', duration or 0.0)
+        with self._lock:
+            self._goto(self.current_screen.on_swipe)
+
+    def press(self, key: str):
+        self._delay('click')
+        if key == 'home':
+            with self._lock:
+                self._goto('home')
+        elif key == 'back':
+            with self._lock:
+                if self._back_stack:
+                    previous = self._back_stack.pop()
+                    self.history.append((self.screen_name, previous))
+                    self.screen_name = previous
+                    self.focused = None
+
+    def window_size(self) -> Tuple[int, int]:
+        self._delay('window_size')
+        return self.width, self.height
+
+    def send_keys(self, text: str, clear: bool = False):
+        self._delay('send_keys')
+        with self._lock:
+            if self.focused is None:
+                self.focused = next((e for e in self.current_screen.elements if e.editable), None)
+            if self.focused is not None:
+                previous = '' if clear else self.field_values.get(id(self.focused), '')
+                self.field_values[id(self.focused)] = previous + text
+
+    def clear_text(self):
+        self._delay('clear_text')
+        with self._lock:
+            if self.focused is not None:
+                self.field_values[id(self.focused)] = ''
+
+    def app_start(self, package: str, activity: str = None, wait: bool = False, stop: bool = False):
+        self._delay('app_start')
+        with self._lock:
+            screen = next((s for s in self.screens.values() if s.package == package), None)
+            if screen is None:
+                raise RuntimeError(f"App not installed: {package}")
+            self._goto(screen.name)
+
+    def app_stop(self, package: str):
+        self._delay('app_stop')
+        with self._lock:
+            if self.current_screen.package == package:
+                self._goto('home')
+
+    def wait_activity(self, activity: str, timeout: float = 10) -> bool:
+        return self.app_current()['activity'] == activity
+
+    def app_current(self) -> Dict:
+        self._delay('app_current')
+        screen = self.current_screen
+        return {'package': screen.package, 'activity': screen.activity}
+
+    @property
+    def info(self) -> Dict:
+        self._delay('info')
+        return {
+            'currentPackageName': self.current_screen.package,
+            'displayWidth': self.width,
+            'displayHeight': self.height,
+            'displayRotation': 0,
+            'productName': 'fake',
+            'screenOn': True,
+            'sdkInt': 30
+        }
+
+    def _render(self) -> bytes:
+        """绘制当前屏幕：背景色区分界面，控件以色块表示"""
+        screen = self.current_screen
+        state = tuple(sorted(
+            (index, self.field_values.get(id(element), ''))
+            for index, element in enumerate(screen.elements) if element.editable
+        ))
+        key = (screen.name, state)
+        data = self._screenshots.get(key)
+        if data is None:
+            img = Image.new('RGB', (self.width, self.height), screen.background)
+            draw = ImageDraw.Draw(img)
+            for element in screen.elements:
+                seed = zlib.crc32((element.text or element.resource_id).encode('utf-8'))
+                color = (seed & 0xFF, (seed >> 8) & 0xFF, (seed >> 16) & 0xFF)
+                draw.rectangle(element.bounds, fill=color, outline=(0, 0, 0))
+                value = self.field_values.get(id(element))
+                if value:
+                    # 输入内容用宽度与文本长度相关的色条表示
+                    left, top, _, bottom = element.bounds
+                    draw.rectangle((left + 10, top + 10, left + 10 + 24 * len(value), bottom - 10), fill=(0, 0, 0))
+            buffered = BytesIO()
+            img.save(buffered, format='JPEG', quality=self.screenshot_quality)
+            data = buffered.getvalue()
+            self._screenshots[key] = data
+        return data
+
+    def screenshot(self, filename: str = None, format: str = 'pillow'):
+        """截图：format='raw'返回JPEG数据，否则返回PIL Image"""
+        self._delay('screenshot')
+        with self._lock:
+            data = self._render()
+        if format == 'raw':
+            return data
+        return Image.open(BytesIO(data))
+
+    def dump_hierarchy(self, compressed: bool = False, pretty: bool = False, max_depth: int = None) -> str:
+        """导出与uiautomator相同格式的控件树XML"""
+        self._delay('dump_hierarchy')
+        screen = self.current_screen
+        nodes = []
+        for index, element in enumerate(screen.elements):
+            left, top, right, bottom = element.bounds
+            text = self.field_values.get(id(element), element.text)
+            nodes.append(
+                f'<node index="{index}" text={quoteattr(text)} resource-id={quoteattr(element.resource_id)} '
+                f'class={quoteattr(element.class_name)} package={quoteattr(screen.package)} '
+                f'content-desc={quoteattr(element.content_desc)} clickable="{str(element.clickable).lower()}" '
+                f'enabled="true" focused="{str(element is self.focused).lower()}" '
+                f'bounds="[{left},{top}][{right},{bottom}]" />'
+            )
+        return (
+            "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>"
+            '<hierarchy rotation="0">'
+            f'<node index="0" text="" resource-id="" class="android.widget.FrameLayout" '
+            f'package={quoteattr(screen.package)} content-desc="" clickable="false" enabled="true" '
+            f'focused="false" bounds="[0,0][{self.width},{self.height}]">'
+            + ''.join(nodes) +
+            '</node></hierarchy>'
+        )
+
+    def disconnect(self):
+        self.watcher.stop()
+
+def connect_fake_device(serial: str, **kwargs) -> FakeU2Device:
+    """与u2.connect签名一致的工厂函数，连接延迟同样可配置"""
+    device = FakeU2Device(serial, **kwargs)
+    device._delay('connect')
+    return device
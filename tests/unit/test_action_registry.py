@@ -0,0 +1,63 @@
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import (
+    ACTION_REGISTRY,
+    AVAILABLE_ACTIONS,
+    COMPOSITE_ACTIONS,
+    ActionType,
+    AutomationService
+)
+from app.services.plan_compiler import PlanCompiler
+from app.services.prompt_template import PromptTemplate
+from tests.fakes import connect_fake_device
+
+def test_registry_drives_catalogue_and_compiler():
+    """测试提示词目录和计划校验使用注册表中的同一份定义"""
+    for definition in ACTION_REGISTRY:
+        assert definition.handler is not None
+        assert AVAILABLE_ACTIONS[definition.type]['params'] is definition.params
+
+    catalogue = PromptTemplate(AVAILABLE_ACTIONS).catalogue
+    for action in ('long_click', 'pinch', 'back', 'home'):
+        assert f"\n{action}：" in catalogue
+    assert set(COMPOSITE_ACTIONS) == {
+        ActionType.SEQUENCE, ActionType.PARALLEL, ActionType.CONDITIONAL, ActionType.LOOP
+    }
+
+    compiler = PlanCompiler(AVAILABLE_ACTIONS, COMPOSITE_ACTIONS)
+    plan = compiler.compile_plan([
+        {'type': 'launch_app', 'params': {'package': 'com.android.settings'}},
+        {'type': 'loop', 'params': {'action': {'type': 'back', 'params': {}}, 'times': 3}}
+    ])
+    assert ACTION_REGISTRY.estimate(plan) == pytest.approx(2.0 + 3 * 0.3)
+    with pytest.raises(Exception, match="Invalid value for parameter 'direction'"):
+        compiler.compile_action({'type': 'pinch', 'params': {'direction': 'sideways'}})
+
+@pytest.mark.asyncio
+async def test_new_actions_execute_with_timing_hooks():
+    """测试长按、缩放、返回和桌面动作可执行，并触发计时钩子"""
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    timings = []
+    service.add_action_hook(lambda node, elapsed, error: timings.append((node.value, error)))
+    try:
+        await service.connect_device('fake-001')
+        device = service.devices['fake-001']
+        await service.execute_plan('fake-001', [
+            {'type': 'click', 'params': {'target': '设置'}},
+            {'type': 'long_click', 'params': {'target': 'WLAN', 'duration': 0.1}},
+            {'type': 'pinch', 'params': {'direction': 'out'}},
+            {'type': 'back', 'params': {}}
+        ])
+        assert device.screen_name == 'home'
+        await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '设置'}})
+        await service.execute_action('fake-001', {'type': 'home', 'params': {}})
+
+        assert device.screen_name == 'home'
+        assert device.calls['pinch_out'] == 1
+        assert timings[:4] == [('click', None), ('long_click', None), ('pinch', None), ('back', None)]
+    finally:
+        service.device_io.shutdown()
@@ -0,0 +1,193 @@
+import asyncio
+import pytest
+import threading
+import time
+import zlib
+from flask import Flask
+from app.models.device import Device, DeviceType
+from app.utils.cache import cache, cache_llm_response, llm_cache, LRUCache, SingleFlight, TwoTierCache
+
+@pytest.fixture
+def cache_app():
+    """使用本地内存缓存代替Redis"""
+    app = Flask(__name__)
+    app.config.update({'CACHE_TYPE': 'SimpleCache'})
+    cache.init_app(app)
+    with app.app_context():
+        yield app
+        llm_cache.clear()
+
+class FakeLLMService:
+    def __init__(self, model='qwen-plus'):
+        self.model = model
+        self.calls = 0
+
+    def cache_version(self, func_name):
+        return f"v1:{self.model}"
+
+    @cache_llm_response(timeout=60)
+    async def analyze(self, text, device=None, temperature=0.2):
+        self.calls += 1
+        return [{'type': 'click', 'params': {'target': text}}]
+
+@pytest.mark.asyncio
+async def test_cache_key_ignores_instance_and_device_identity(cache_app):
+    """测试缓存键不受实例和设备对象身份影响"""
+    first, second = FakeLLMService(), FakeLLMService()
+    device_a = Device('serial_a', 'A', DeviceType.ANDROID)
+    device_b = Device('serial_b', 'B', DeviceType.ANDROID)
+
+    await first.analyze('打开  微信', device_a)
+    await second.analyze('打开 微信', device_b, temperature=0.2)
+
+    assert first.calls == 1
+    assert second.calls == 0
+    assert FakeLLMService.analyze.cache_stats['hits'] >= 1
+
+@pytest.mark.asyncio
+async def test_cache_key_versioned_by_model(cache_app):
+    """测试更换模型后不会命中旧缓存"""
+    old, new = FakeLLMService('qwen-plus'), FakeLLMService('qwen-max')
+    await old.analyze('返回首页')
+    await new.analyze('返回首页')
+    assert old.calls == 1
+    assert new.calls == 1
+
+@pytest.mark.asyncio
+async def test_large_payload_is_hashed(cache_app):
+    """测试大负载参数以摘要形式进入缓存键"""
+    service = FakeLLMService()
+    screenshot = 'A' * 100000
+    await service.analyze(screenshot)
+    llm_cache.flush()
+    keys = list(cache.cache._cache.keys())
+    assert keys
+    assert all(len(key) < 200 for key in keys)
+
+class DictBackend:
+    """本地字典后端，模拟Redis"""
+    def __init__(self):
+        self.data = {}
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return self.data.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+
+    def clear(self):
+        self.data.clear()
+
+def test_lru_cache_evicts_by_size_and_ttl():
+    """测试L1按容量和TTL淘汰"""
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+
+    lru.set('short', 4, timeout=0.01)
+    time.sleep(0.02)
+    assert lru.get('short') is None
+
+def test_two_tier_cache_compresses_l2_and_serves_from_l1():
+    """测试L2压缩存储、L1命中时不访问L2"""
+    backend = DictBackend()
+    two_tier = TwoTierCache(backend)
+    value = [{'type': 'click', 'params': {'target': '发送'}}]
+
+    two_tier.set('key', value, timeout=60)
+    two_tier.flush()
+    assert isinstance(backend.data['key'], bytes)
+    assert b'click' in zlib.decompress(backend.data['key'])
+
+    assert two_tier.get('key') == value
+    assert backend.reads == 0
+
+    # 其他进程写入的值从L2回填到L1
+    two_tier.l1.clear()
+    assert two_tier.get('key') == value
+    assert two_tier.get('key') == value
+    assert backend.reads == 1
+
+def test_cached_values_are_not_shared_between_callers():
+    """测试命中L1时每次返回新的副本，调用方修改结果不影响缓存"""
+    two_tier = TwoTierCache(DictBackend())
+    two_tier.set('plan', [{'type': 'click', 'params': {'target': '发送'}}], timeout=60)
+
+    plan = two_tier.get('plan')
+    plan.append({'type': 'home'})
+    plan[0]['params']['target'] = '取消'
+    assert two_tier.get('plan') == [{'type': 'click', 'params': {'target': '发送'}}]
+    assert two_tier.get('plan') is not two_tier.get('plan')
+
+class SlowLLMService(FakeLLMService):
+    def __init__(self, fail=False):
+        super().__init__()
+        self.fail = fail
+
+    @cache_llm_response(timeout=60)
+    async def plan(self, text):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise RuntimeError('upstream error')
+        return [{'type': 'click', 'params': {'target': text}}]
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_calls_are_coalesced(cache_app):
+    """测试相同的并发请求只调用一次上游"""
+    service = SlowLLMService()
+    results = await asyncio.gather(*[service.plan('打开设置') for _ in range(5)])
+    assert service.calls == 1
+    assert all(result == results[0] for result in results)
+    assert SlowLLMService.plan.cache_stats['coalesced'] == 4
+
+@pytest.mark.asyncio
+async def test_coalesced_failure_propagates_and_is_not_cached(cache_app):
+    """测试失败传播给所有等待方且不被缓存"""
+    service = SlowLLMService(fail=True)
+    results = await asyncio.gather(
+        *[service.plan('打开相机') for _ in range(3)],
+        return_exceptions=True
+    )
+    assert service.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    service.fail = False
+    await service.plan('打开相机')
+    assert service.calls == 2
+
+def test_calls_from_different_event_loops_are_coalesced():
+    """测试不同线程、各自事件循环上的相同调用也只请求一次上游（每个异步视图请求都有自己的事件循环）"""
+    single_flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    async def fetch():
+        calls.append(threading.current_thread().name)
+        started.set()
+        await asyncio.sleep(0.2)
+        return [{'type': 'home'}]
+
+    results = {}
+
+    def request(name):
+        if name == 'second':
+            started.wait(5)
+        results[name] = asyncio.run(single_flight.do('plan', fetch))
+
+    threads = [threading.Thread(target=request, args=(name,), name=name) for name in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ['first']
+    assert results['first'] == ([{'type': 'home'}], False)
+    assert results['second'] == ([{'type': 'home'}], True)
+    assert single_flight.in_flight() == 0
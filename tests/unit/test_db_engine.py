@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from app import db
+from app.config import Config
+from app.utils.db import (
+    REPLICA_BIND, MeteredQueuePool, close_read_session, configure_database, engine_options, instrument_engines,
+    read_session
+)
+
+def make_app(tmp_path, **config) -> Flask:
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "primary.db"}', **config)
+    configure_database(app)
+    db.init_app(app)
+    app.teardown_appcontext(close_read_session)
+    with app.app_context():
+        instrument_engines(app)
+    return app
+
+@pytest.fixture
+def replica_bind():
+    """db是全局对象，init_app会为副本绑定注册元数据；测试后移除，否则其他应用的create_all找不到该绑定"""
+    yield
+    db.metadatas.pop(REPLICA_BIND, None)
+
+def test_engine_options_by_database():
+    """测试服务端数据库使用带指标的连接池，内存SQLite不设置池大小"""
+    options = engine_options('postgresql://user:password@db:5432/automation', vars(Config), 'replica')
+    assert options['poolclass'] is MeteredQueuePool
+    assert options['pool_size'] == Config.DB_POOL_SIZE and options['pool_pre_ping'] is True
+    assert options['pool_logging_name'] == 'replica'
+    assert 'pool_size' not in engine_options('sqlite://', vars(Config))
+
+def test_sqlite_engine_uses_wal_and_records_checkout_wait(tmp_path):
+    """测试SQLite文件库启用WAL、synchronous=NORMAL和忙等待，取连接时记录等待时间"""
+    app = make_app(tmp_path)
+    before = REGISTRY.get_sample_value('db_pool_checkout_wait_seconds_count', {'bind': 'primary'}) or 0
+    with app.app_context():
+        assert db.engine.pool.__class__ is MeteredQueuePool
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA synchronous')).scalar() == 1
+        assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == Config.DB_SQLITE_BUSY_TIMEOUT
+        # 未配置只读副本时读会话就是主库会话
+        assert read_session() is db.session
+    assert REGISTRY.get_sample_value('db_pool_checkout_wait_seconds_count', {'bind': 'primary'}) > before
+
+def test_read_session_uses_replica(tmp_path, replica_bind):
+    """测试配置只读副本后，读会话连接副本并随应用上下文关闭"""
+    app = make_app(tmp_path, DATABASE_REPLICA_URL=f'sqlite:///{tmp_path / "replica.db"}')
+    with app.app_context():
+        session = read_session()
+        assert session is not db.session and read_session() is session
+        assert session.get_bind() is db.engines['replica']
+        assert 'replica.db' in session.execute(text('PRAGMA database_list')).fetchone()[2]
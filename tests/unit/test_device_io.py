@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+import pytest
+from prometheus_client import REGISTRY
+from app.services.device_io import DeviceIO
+from tests.fakes.u2_device import FakeU2Device
+
+def test_calls_on_a_lane_run_in_submission_order():
+    """测试同一设备通道上的调用按提交顺序逐个执行，不会并发"""
+    device = FakeU2Device('lane-fifo', latency={'click': 0.01})
+    device_io = DeviceIO(max_workers=8)
+    order, active, overlaps = [], [], []
+
+    def tap(index):
+        active.append(index)
+        overlaps.append(len(active))
+        device.click(100, 100)
+        order.append(index)
+        active.remove(index)
+        return index
+
+    futures = [device_io.submit(device.serial, 'click', tap, index) for index in range(20)]
+    assert [future.result(timeout=5) for future in futures] == list(range(20))
+    assert order == list(range(20))
+    assert max(overlaps) == 1 and device.calls['click'] == 20
+    device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_lanes_of_different_devices_run_concurrently():
+    """测试不同设备的通道并行执行阻塞调用"""
+    devices = [FakeU2Device(f'lane-{index}', latency={'screenshot': 0.2}) for index in range(4)]
+    device_io = DeviceIO(max_workers=4)
+
+    started = time.perf_counter()
+    images = await asyncio.gather(*(
+        device_io.call(device.serial, 'screenshot', device.screenshot) for device in devices
+    ))
+    elapsed = time.perf_counter() - started
+    assert len(images) == 4 and elapsed < 0.5
+    device_io.shutdown()
+
+def test_queue_depth_accounting_and_shutdown():
+    """测试通道队列深度和调用统计，关闭时执行完已提交的调用并拒绝新调用"""
+    device = FakeU2Device('lane-depth', latency_scale=0)
+    device_io = DeviceIO(max_workers=2)
+    release = threading.Event()
+
+    blocker = device_io.submit(device.serial, 'wait', release.wait, 5)
+    time.sleep(0.05)
+    queued = [device_io.submit(device.serial, 'click', device.click, 10, 10) for _ in range(3)]
+    failed = device_io.submit(device.serial, 'click', device(text='不存在').click)
+
+    lane = device_io.get_stats()['lanes'][device.serial]
+    assert lane['queue_depth'] == 4 and lane['running'] is True
+    assert REGISTRY.get_sample_value('device_lane_queue_depth', {'device': device.serial}) == 4
+
+    release.set()
+    device_io.shutdown(wait=True)
+    assert blocker.result() is True
+    assert all(future.done() for future in queued)
+    assert 'UiObjectNotFoundError' in str(failed.exception())
+    lane = device_io.get_stats()['lanes'][device.serial]
+    assert lane == {'queue_depth': 0, 'running': False, 'completed': 4, 'failed': 1}
+    assert REGISTRY.get_sample_value('device_lane_queue_depth', {'device': device.serial}) == 0
+    with pytest.raises(RuntimeError):
+        device_io.submit(device.serial, 'click', device.click, 10, 10)
@@ -0,0 +1,102 @@
+import os
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.models.task import Task, TaskStepResult
+from app.services import execution_journal
+from app.services.automation_service import ActionType, AutomationService
+from app.services.execution_journal import ExecutionJournal, replay_journals
+from app.utils.exceptions import AutomationError
+from tests.fakes import connect_fake_device
+from app.services.plan_compiler import ActionNode
+
+def step(index):
+    return ActionNode(ActionType.CLICK, {}, str(index))
+
+def make_task(db_session):
+    task = Task(user_input='打开设置')
+    db_session.session.add(task)
+    db_session.session.commit()
+    return task
+
+def test_journal_flushes_in_batches(db_session, tmp_path):
+    """测试步骤结果按条数批量写入子表，结束时写入剩余结果并删除日志文件"""
+    task = make_task(db_session)
+    journal = ExecutionJournal(task.id, directory=str(tmp_path), batch_size=3, flush_interval=60)
+    for index in range(7):
+        journal.record(step(index), 0.1, RuntimeError('未找到') if index == 6 else None)
+        assert TaskStepResult.query.filter_by(task_id=task.id).count() == (index + 1) // 3 * 3
+
+    journal.close()
+    results = task.get_step_results()
+    assert [r['step_index'] for r in results] == list(range(7))
+    assert results[-1]['success'] is False and results[-1]['error'] == '未找到'
+    assert os.listdir(tmp_path) == []
+
+def test_replay_recovers_unflushed_results_after_crash(db_session, tmp_path):
+    """测试进程崩溃后从日志文件补写尚未入库的结果，重放可重复执行"""
+    task = make_task(db_session)
+    journal = ExecutionJournal(task.id, directory=str(tmp_path), batch_size=2, flush_interval=60)
+    for index in range(3):
+        journal.record(step(index), 0.1)
+    # 模拟崩溃：缓冲中的第3条未入库，日志文件属于已退出的进程，且最后一行只写了一半
+    journal._file.write('{"task_id": ')
+    journal._file.close()
+    os.rename(journal.path, tmp_path / f'{task.id}-999999999-{"0" * 12}-deadbeef.jsonl')
+
+    assert replay_journals(str(tmp_path)) == 1
+    assert replay_journals(str(tmp_path)) == 0
+    assert [r['step_index'] for r in task.get_step_results()] == [0, 1, 2]
+    # 重新执行时序号接着已入库的记录
+    assert ExecutionJournal(task.id).seq == 3
+
+def abandon(journal):
+    """模拟未能正常关闭的执行：日志文件留在磁盘上，结果未入库"""
+    journal._file.close()
+    execution_journal._open_journals.discard(journal.path)
+
+def test_journals_left_by_same_pid_are_replayed(db_session, tmp_path):
+    """测试容器重启后同一PID上一次运行的日志会补写；同一进程重新执行任务时先补写旧记录，序号不重复"""
+    task = make_task(db_session)
+    journal = ExecutionJournal(task.id, directory=str(tmp_path), batch_size=10, flush_interval=60)
+    live = ExecutionJournal(make_task(db_session).id, directory=str(tmp_path))
+    for index in range(3):
+        journal.record(step(index), 0.1)
+    abandon(journal)
+    # 上一次启动（PID相同、启动标识不同）留下的日志；仍在执行中的日志不处理
+    os.rename(journal.path, tmp_path / f'{task.id}-{os.getpid()}-{"0" * 12}-deadbeef.jsonl')
+    assert replay_journals(str(tmp_path)) == 3
+    assert os.listdir(tmp_path) == [os.path.basename(live.path)]
+
+    rerun = ExecutionJournal(task.id, directory=str(tmp_path), batch_size=10, flush_interval=60)
+    for index in range(2):
+        rerun.record(step(index), 0.1)
+    abandon(rerun)
+    again = ExecutionJournal(task.id, directory=str(tmp_path))
+    assert again.seq == 5
+    again.record(step(0), 0.1)
+    again.close()
+    live.close()
+    assert [r['step_index'] for r in task.get_step_results()] == [0, 1, 2, 0, 1, 0]
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.asyncio
+async def test_step_hook_failure_does_not_replace_step_error():
+    """测试记录步骤结果失败时只记录日志，步骤本身的错误照常抛出"""
+    service = AutomationService(llm_service=AsyncMock(), connector=partial(connect_fake_device, latency_scale=0))
+    calls = []
+
+    def failing_hook(node, elapsed, error):
+        calls.append(error)
+        raise RuntimeError('database is locked')
+
+    try:
+        await service.connect_device('fake-001')
+        assert await service.execute_plan('fake-001', [{'type': 'home'}], step_hook=failing_hook)
+        with pytest.raises(AutomationError, match='Assert failed'):
+            await service.execute_plan('fake-001', [
+                {'type': 'assert', 'params': {'target': '不存在', 'condition': 'exists'}}
+            ], step_hook=failing_hook)
+        assert calls[0] is None and isinstance(calls[1], AutomationError)
+    finally:
+        service.device_io.shutdown()
@@ -0,0 +1,46 @@
+import pytest
+from app.models.device import Device, DeviceStatus, DeviceType
+from app.services.llm_service import LLMService
+from app.services.screen_cache import dhash, hamming_distance
+from app.services.screenshot import ScreenshotPipeline
+from app.utils.cache import llm_cache
+from app.utils.exceptions import LLMError
+from tests.fakes import FakeDashScope, FakeU2Device
+
+def test_fake_device_screen_state_machine():
+    """测试模拟设备按脚本跳转屏幕，截图和控件树随屏幕变化"""
+    device = FakeU2Device(latency_scale=0)
+    pipeline = ScreenshotPipeline(max_edge=540)
+    home_hash = dhash(pipeline.capture(device).hash_image())
+
+    device(text='设置').click()
+    assert device.app_current()['package'] == 'com.android.settings'
+    assert 'WLAN' in device.dump_hierarchy()
+    assert hamming_distance(home_hash, dhash(pipeline.capture(device).hash_image())) > 8
+
+    device.swipe(0.5, 0.8, 0.5, 0.2)
+    assert device(text='关于手机').exists
+    device.press('home')
+    assert device.screen_name == 'home'
+    assert device.calls['click'] == 2
+
+@pytest.mark.asyncio
+async def test_llm_service_against_fake_dashscope():
+    """测试LLMService可以通过本地模拟服务完成规划，并传播注入的错误"""
+    plan = [{'type': 'launch_app', 'params': {'package': 'com.android.settings'}}]
+    device = Device('fake-001', 'Fake', DeviceType.ANDROID)
+    device.status = DeviceStatus.ONLINE
+    llm_cache.l1.clear()
+
+    async with FakeDashScope(plans={'打开设置': plan}) as fake:
+        service = LLMService(base_url=fake.base_url)
+        try:
+            assert await service.analyze_text_input('打开设置', device) == plan
+
+            fake.fail_next(status=503)
+            with pytest.raises(LLMError):
+                await service.analyze_text_input('打开蓝牙', device)
+        finally:
+            await service.close()
+
+    assert fake.status_counts == {200: 1, 503: 1}
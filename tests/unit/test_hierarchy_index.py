@@ -0,0 +1,68 @@
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import AutomationService
+from app.services.hierarchy_index import HierarchyIndex
+from tests.fakes import FakeElementSpec, FakeScreen, FakeU2Device, connect_fake_device
+
+def test_index_exact_and_fuzzy_lookup():
+    """测试按文本、resource-id精确匹配和三元组模糊匹配"""
+    device = FakeU2Device(start_screen='settings', latency_scale=0)
+    index = HierarchyIndex.from_xml(device.dump_hierarchy())
+
+    assert index.find_exact('ｗｌａｎ').text == 'WLAN'  # 全角与大小写归一化
+    assert index.find_exact('android:id/home').text == '返回'
+    assert index.find_exact('home').text == '返回'
+    assert index.find_exact('蓝牙设置') is None
+
+    match = index.find_fuzzy('蓝牙设置')
+    assert match.text == '蓝牙' and match.score < 1
+    assert index.find('关于手机') is None
+    assert match.center == (540.0, 555.0)
+
+def test_fuzzy_lookup_rejects_ambiguous_sibling_labels():
+    """测试共享子串的兄弟控件不被模糊匹配为较短的目标"""
+    screens = {'more': FakeScreen('more', 'com.android.settings', '.MoreSettings', [
+        FakeElementSpec('蓝牙设置', (40, 300, 1040, 420)),
+        FakeElementSpec('WLAN设置', (40, 420, 1040, 540)),
+        FakeElementSpec('通知管理', (40, 540, 1040, 660))
+    ])}
+    device = FakeU2Device(screens=screens, start_screen='more', latency_scale=0)
+    index = HierarchyIndex.from_xml(device.dump_hierarchy())
+
+    assert index.find_exact('设置') is None
+    assert index.find('设置', min_score=0.6) is None  # 得分0.75，但与"WLAN设置"不相上下
+    assert index.find('蓝牙', min_score=0.6) is None  # 短目标只靠包含关系得分，门槛更高
+    assert index.find('通知管理设置', min_score=0.6).text == '通知管理'
+
+    only = HierarchyIndex.from_xml(FakeU2Device(screens={'more': FakeScreen(
+        'more', 'com.android.settings', '.MoreSettings', [FakeElementSpec('蓝牙设置', (40, 300, 1040, 420))]
+    )}, start_screen='more', latency_scale=0).dump_hierarchy())
+    assert only.find('设置', min_score=0.6) is None
+
+@pytest.mark.asyncio
+async def test_dynamic_click_resolves_from_hierarchy_without_vision():
+    """测试动态点击优先使用控件索引，屏幕变化后索引失效"""
+    llm_service = AsyncMock()
+    service = AutomationService(
+        llm_service=llm_service,
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    try:
+        await service.connect_device('fake-001')
+        device = service.devices['fake-001']
+
+        await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '设置'}})
+        assert device.screen_name == 'settings'
+        await service.execute_action('fake-001', {'type': 'click', 'params': {'target': 'WLAN'}})
+        assert device.screen_name == 'wlan'
+
+        await service.execute_action(
+            'fake-001',
+            {'type': 'assert', 'params': {'target': '开启WLAN', 'condition': 'exists'}}
+        )
+        llm_service.analyze_image.assert_not_called()
+        assert device.calls['dump_hierarchy'] == 3
+        assert device.calls['exists'] == 0
+    finally:
+        service.device_io.shutdown()
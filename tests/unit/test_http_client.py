@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from app.api import routes
+from app.config import Config
+from app.services.llm_service import LLMService
+from app.utils.http_client import LoopThread, PooledHTTPClient
+from tests.fakes.dashscope_server import FakeDashScope
+
+def test_one_session_per_loop_reused_across_requests():
+    """测试同一事件循环上的请求共用一个会话并复用连接，close()关闭会话"""
+    client = PooledHTTPClient()
+
+    async def scenario():
+        async with FakeDashScope() as server:
+            url = server.base_url + Config.TEXT_GENERATION_PATH
+            session = client.get_session()
+            for _ in range(3):
+                async with client.post(url, json={'input': {'prompt': '打开设置'}}) as response:
+                    assert response.status == 200
+                    await response.read()
+            assert client.get_session() is session
+            stats = client.get_stats()
+            assert stats['sessions'] == 1 and stats['requests'] == 3
+            assert stats['connections_created'] == 1 and stats['connections_reused'] == 2
+            await client.close()
+            return session
+
+    session = asyncio.run(scenario())
+    assert session.closed
+    assert client.get_stats()['sessions'] == 0
+
+def test_sessions_are_per_loop_and_closed_from_any_loop():
+    """测试不同事件循环各自持有会话，close()也会关闭其他线程循环上的会话"""
+    client = PooledHTTPClient()
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def create():
+        return client.get_session()
+
+    async def scenario():
+        session = client.get_session()
+        other = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(create(), other_loop))
+        assert other is not session
+        assert client.get_stats()['sessions'] == 2
+        await client.close()
+        return session, other
+
+    try:
+        session, other = asyncio.run(scenario())
+        assert session.closed and other.closed
+        assert client.get_stats()['sessions'] == 0
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
+
+def test_request_path_llm_calls_share_one_session(client, test_user, test_device, monkeypatch):
+    """测试每个请求各自的事件循环上发起的规划调用在共享循环上执行，跨请求复用同一个会话和连接"""
+    server_loop = LoopThread('fake-dashscope')
+    server = FakeDashScope(plans={
+        '打开设置': [{'type': 'launch_app', 'params': {'package': 'com.android.settings'}}],
+        '返回桌面': [{'type': 'home'}]
+    })
+    server_loop.submit(server.start()).result(timeout=5)
+    llm_service = LLMService(base_url=server.base_url)
+    monkeypatch.setattr(routes, 'llm_service', llm_service)
+    with client.session_transaction() as session:
+        session['_user_id'] = str(test_user.id)
+
+    try:
+        for text in ('打开设置', '返回桌面'):
+            response = client.post('/api/test/llm', json={'input': text})
+            assert response.status_code == 200, response.get_json()
+        stats = llm_service.get_pool_stats()
+        assert stats['sessions'] == 1 and stats['requests'] == 2
+        assert stats['connections_created'] == 1 and stats['connections_reused'] == 1
+    finally:
+        routes.llm_loop.submit(llm_service.close()).result(timeout=5)
+        server_loop.submit(server.stop()).result(timeout=5)
+        server_loop.stop()
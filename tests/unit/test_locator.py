@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import AutomationService
+from app.services.screenshot import ScreenshotPipeline
+from tests.fakes import FakeElementSpec, FakeScreen, connect_fake_device
+
+SEARCH_ICON = (900, 40, 1040, 160)
+
+def icon_screens():
+    """只有图标、没有文字的搜索按钮"""
+    return {
+        'home': FakeScreen('home', 'com.example.shop', '.Main', [
+            FakeElementSpec('', SEARCH_ICON, 'com.example.shop:id/search', 'android.widget.ImageView', goto='search'),
+            FakeElementSpec('首页', (40, 300, 1040, 450))
+        ]),
+        'search': FakeScreen('search', 'com.example.shop', '.Search', [
+            FakeElementSpec('返回', (20, 20, 140, 100), goto='home')
+        ], background=(200, 220, 240))
+    }
+
+@pytest.fixture
+def service():
+    llm_service = AsyncMock()
+    llm_service.recognize_text.return_value = []
+    llm_service.analyze_image.return_value = {
+        'found': True, 'confidence': 0.9, 'box': list(SEARCH_ICON), 'description': '搜索图标'
+    }
+    service = AutomationService(
+        llm_service=llm_service,
+        connector=partial(connect_fake_device, latency_scale=0, screens=icon_screens())
+    )
+    service.screenshot_pipeline = ScreenshotPipeline(max_edge=0)
+    yield service
+    service.device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_vision_result_is_learned_as_cached_locator(service):
+    """测试视觉定位的结果被记录为定位器，之后不再调用视觉模型"""
+    await service.connect_device('fake-001')
+    device = service.devices['fake-001']
+
+    await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '搜索按钮'}})
+    assert device.screen_name == 'search'
+    await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '返回'}})
+    await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '搜索按钮'}})
+
+    assert device.screen_name == 'search'
+    assert service.llm_service.analyze_image.call_count == 1
+    assert service.locator.get_stats()['by_tier'] == {'vision': 1, 'hierarchy': 1, 'cache': 1}
+
+@pytest.mark.asyncio
+async def test_tier_budget_skips_slow_ocr(service):
+    """测试超出时间预算的层级被跳过"""
+    async def slow_ocr(image):
+        await asyncio.sleep(1)
+        return [{'text': '搜索按钮', 'box': list(SEARCH_ICON)}]
+
+    service.llm_service.recognize_text.side_effect = slow_ocr
+    service.locator.budgets = {'ocr': 0.05}
+    await service.connect_device('fake-001')
+
+    result = await service.locator.locate(service.devices['fake-001'], '搜索按钮')
+    assert result.tier == 'vision'
+    assert result.center == (970.0, 100.0)
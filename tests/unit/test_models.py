@@ -1,7 +1,7 @@
 import pytest
 from app.models.user import User
 from app.models.device import Device
-from app.models.task import Task
+from app.models.task import Task, TaskStatus
 
 def test_user_password_hashing(test_user):
     """测试用户密码哈希功能"""
@@ -20,14 +20,14 @@ def test_device_to_dict(test_device):
     device_dict = test_device.to_dict()
     assert device_dict['device_id'] == 'test_device_001'
     assert device_dict['name'] == 'Test Device'
-    assert device_dict['platform'] == 'Android'
+    assert device_dict['type'] == 'android'
 
 def test_task_to_dict(db_session, test_device):
     """测试任务模型序列化"""
     task = Task(
         device_id=test_device.device_id,
         user_input='test input',
-        status='pending'
+        status=TaskStatus.PENDING
     )
     db_session.session.add(task)
     db_session.session.commit()
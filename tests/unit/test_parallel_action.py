@@ -0,0 +1,60 @@
+import time
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.config import Config
+from app.services.automation_service import ACTION_REGISTRY, AutomationService
+from app.utils.exceptions import AutomationError
+from tests.fakes import connect_fake_device
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Config, 'SCREEN_WATCH_INTERVAL', 0.01)
+    monkeypatch.setattr(Config, 'SCREEN_SETTLE_TIME', 0.05)
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    yield service
+    service.device_io.shutdown()
+
+def wait_for(target: str, timeout: int = 10) -> dict:
+    return {'type': 'wait', 'params': {'target': target, 'timeout': timeout}}
+
+def click(target: str) -> dict:
+    return {'type': 'click', 'params': {'target': target}}
+
+@pytest.mark.asyncio
+async def test_parallel_keeps_gesture_order_and_overlaps_waits(service):
+    """测试手势按原顺序执行，等待动作与手势链重叠执行"""
+    action = {'type': 'parallel', 'params': {'actions': [
+        wait_for('开启WLAN', timeout=5), click('设置'), click('WLAN')
+    ]}}
+    node = service.compile(action)
+    assert ACTION_REGISTRY.is_exclusive(node)
+    assert not ACTION_REGISTRY.is_exclusive(node.params['actions'][0])
+
+    await service.connect_device('fake-001')
+    assert await service.execute_action('fake-001', action)
+    assert service.devices['fake-001'].screen_name == 'wlan'
+
+@pytest.mark.asyncio
+async def test_parallel_cancels_siblings_on_failure_and_timeout(service):
+    """测试任一分支失败或总体超时时立即取消其余分支"""
+    await service.connect_device('fake-001')
+
+    started = time.monotonic()
+    with pytest.raises(AutomationError, match="Assert failed"):
+        await service.execute_action('fake-001', {'type': 'parallel', 'params': {'actions': [
+            wait_for('不存在'),
+            {'type': 'assert', 'params': {'target': '相机', 'condition': 'not_exists'}}
+        ]}})
+    assert time.monotonic() - started < 2
+
+    started = time.monotonic()
+    with pytest.raises(AutomationError, match="timed out after 1s"):
+        await service.execute_action('fake-001', {'type': 'parallel', 'params': {
+            'actions': [wait_for('不存在'), click('设置')], 'timeout': 1
+        }})
+    assert time.monotonic() - started < 3
+    assert service.devices['fake-001'].screen_name == 'settings'
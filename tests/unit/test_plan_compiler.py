@@ -0,0 +1,70 @@
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import (
+    AVAILABLE_ACTIONS,
+    COMPOSITE_ACTIONS,
+    ActionType,
+    AutomationService
+)
+from app.services.plan_compiler import ActionNode, PlanCompiler
+from app.utils.exceptions import AutomationError
+from tests.fakes import connect_fake_device
+
+@pytest.fixture
+def compiler():
+    return PlanCompiler(AVAILABLE_ACTIONS, COMPOSITE_ACTIONS)
+
+def test_compile_fills_defaults_and_nested_actions(compiler):
+    """测试编译后填入默认值，组合动作的子动作也被编译为不可变节点"""
+    plan = compiler.compile_plan([
+        {'type': 'loop', 'params': {
+            'action': {'type': 'swipe', 'params': {'direction': 'up'}},
+            'until': {'type': 'assert', 'params': {'target': '关于手机', 'condition': 'exists'}}
+        }}
+    ])
+
+    loop = plan[0]
+    assert loop.type == ActionType.LOOP
+    assert loop.params['max_iterations'] == 100 and loop.params['times'] is None
+    assert isinstance(loop.params['action'], ActionNode)
+    assert loop.params['action'].params['duration'] == 0.5
+    assert loop.params['until'].path == '0.until'
+    with pytest.raises(TypeError):
+        loop.params['times'] = 3
+
+def test_compile_reports_invalid_nested_action_path(compiler):
+    """测试子动作无效时报告其在计划中的位置"""
+    with pytest.raises(AutomationError, match=r"at 1\.actions\.1"):
+        compiler.compile_plan([
+            {'type': 'wait', 'params': {}},
+            {'type': 'sequence', 'params': {'actions': [
+                {'type': 'input', 'params': {'text': 'a'}},
+                {'type': 'click', 'params': {'timeout': 5}}
+            ]}}
+        ])
+    with pytest.raises(AutomationError, match="unknown action type"):
+        compiler.compile_action({'type': 'teleport', 'params': {}})
+
+@pytest.mark.asyncio
+async def test_plan_is_validated_once_per_execution():
+    """测试执行计划只编译一次，循环迭代不再重新校验"""
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    compile_action = service.plan_compiler.compile_action
+    calls = []
+    service.plan_compiler.compile_action = lambda *args: calls.append(args) or compile_action(*args)
+    try:
+        await service.connect_device('fake-001')
+        await service.execute_plan('fake-001', [
+            {'type': 'loop', 'params': {
+                'action': {'type': 'input', 'params': {'text': 'hello'}},
+                'times': 5
+            }}
+        ])
+        assert service.devices['fake-001'].calls['send_keys'] == 5
+        assert [path for _, path in calls] == ['0', '0.action']
+    finally:
+        service.device_io.shutdown()
@@ -0,0 +1,87 @@
+import time
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.models.device import Device, DeviceStatus, DeviceType
+from app.services.automation_service import AutomationService
+from app.services.llm_service import LLMService
+from app.utils.exceptions import LLMError
+from app.utils.json_stream import JSONArrayStream
+from tests.fakes import FakeDashScope, connect_fake_device
+
+def click(target: str) -> dict:
+    return {'type': 'click', 'params': {'target': target}}
+
+def test_json_array_stream_emits_closed_elements():
+    """测试逐字符输入时每个顶层元素一闭合就返回，字符串中的括号和转义不影响解析"""
+    text = '```json\n[{"a": "x]}\\"", "b": [1, {"c": 2}]}, 3 , "s,"]\n```'
+    parser = JSONArrayStream()
+    emitted = []
+    for position, char in enumerate(text):
+        for element in parser.feed(char):
+            emitted.append((element, text[position]))
+    assert emitted == [({'a': 'x]}"', 'b': [1, {'c': 2}]}, '}'), (3, ','), ('s,', ']')]
+    parser.close()
+
+    parser = JSONArrayStream()
+    assert parser.feed('[{"type": "back"}, {"type": ') == [{'type': 'back'}]
+    with pytest.raises(ValueError, match="not closed after 1 elements"):
+        parser.close()
+
+@pytest.fixture
+def services():
+    device = Device('fake-001', 'Fake', DeviceType.ANDROID)
+    device.status = DeviceStatus.ONLINE
+    automation = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    yield device, automation
+    automation.device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_streamed_plan_executes_while_generating(services):
+    """测试流式规划时第一步在后续步骤生成完之前就开始执行"""
+    device, automation = services
+    await automation.connect_device('fake-001')
+    plan = [click('设置'), click('WLAN'), click('开启WLAN')]
+    executed = []
+    automation.add_action_hook(lambda node, elapsed, error: executed.append(time.monotonic()))
+
+    async with FakeDashScope(plans={'打开WLAN开关': plan}, stream_delay=0.02) as fake:
+        llm_service = LLMService(base_url=fake.base_url)
+        try:
+            received = []
+            assert await automation.execute_stream(
+                'fake-001', llm_service.stream_text_input('打开WLAN开关', device), plan=received
+            )
+            finished = time.monotonic()
+        finally:
+            await llm_service.close()
+
+    assert received == plan
+    assert automation.devices['fake-001'].screen_name == 'wlan'
+    # 每段16个字符、间隔20ms，最后一步至少在第一步执行后约100ms才生成完
+    assert finished - executed[0] > 0.1
+
+@pytest.mark.asyncio
+async def test_streamed_plan_aborts_on_invalid_later_step(services):
+    """测试后续步骤校验失败时中止，不再执行任何后续步骤"""
+    device, automation = services
+    await automation.connect_device('fake-001')
+    plan = [click('设置'), {'type': 'fly', 'params': {}}, click('WLAN')]
+
+    async with FakeDashScope(plans={'飞起来': plan}, stream_delay=0.01) as fake:
+        llm_service = LLMService(base_url=fake.base_url)
+        try:
+            received = []
+            with pytest.raises(LLMError, match="unknown action type 'fly'"):
+                await automation.execute_stream(
+                    'fake-001', llm_service.stream_text_input('飞起来', device), plan=received
+                )
+        finally:
+            await llm_service.close()
+
+    assert received == plan[:1]
+    assert automation.devices['fake-001'].screen_name == 'settings'
+    assert automation.lookahead == {}
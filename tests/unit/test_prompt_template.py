@@ -0,0 +1,59 @@
+import pytest
+from enum import Enum
+from dataclasses import dataclass
+from typing import Optional
+from app.models.device import Device, DeviceType, DeviceStatus
+from app.services.prompt_template import PromptTemplate
+
+class FakeActionType(Enum):
+    CLICK = "click"
+
+@dataclass
+class FakeParam:
+    required: bool = True
+    description: str = ""
+    default: Optional[int] = None
+
+@pytest.fixture
+def actions():
+    return {
+        FakeActionType.CLICK: {
+            "description": "点击指定元素",
+            "params": {"target": FakeParam(description="目标元素")}
+        }
+    }
+
+@pytest.fixture
+def android_device():
+    device = Device('serial_001', 'Pixel', DeviceType.ANDROID)
+    device.status = DeviceStatus.ONLINE
+    device.platform_version = '13'
+    return device
+
+def test_prefix_is_byte_stable(actions, android_device):
+    """测试静态前缀在不同请求间保持一致"""
+    template = PromptTemplate(actions)
+    first = template.render('打开微信', android_device, None)
+    second = template.render('打开设置', android_device, '之前的操作')
+    assert first.startswith(template.prefix)
+    assert second.startswith(template.prefix)
+    assert '打开设置' not in template.prefix
+
+def test_prefix_invalidated_when_actions_change(actions, android_device):
+    """测试动作目录变化后前缀重新渲染"""
+    template = PromptTemplate(actions)
+    template.render('x', android_device)
+    old_version = template.version
+    actions[FakeActionType.CLICK]['params']['timeout'] = FakeParam(False, "超时时间", 10)
+    prompt = template.render('x', android_device)
+    assert template.version != old_version
+    assert 'timeout: 超时时间 (可选，默认值：10)' in prompt
+
+def test_device_context_shared_by_fingerprint(actions, android_device):
+    """测试相同能力指纹的设备共用设备上下文"""
+    template = PromptTemplate(actions)
+    other = Device('serial_002', 'Pixel 2', DeviceType.ANDROID)
+    other.status = DeviceStatus.ONLINE
+    other.platform_version = '13'
+    assert other.capability_fingerprint() == android_device.capability_fingerprint()
+    assert template.get_device_context(other) is template.get_device_context(android_device)
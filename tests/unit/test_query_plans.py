@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from app.models.device import Device
+from app.models.task import Task
+from app.utils.db import add_db_indexes
+from app.utils.pagination import keyset_segments
+
+def query_plan(db_session, query):
+    """执行查询并返回SQLite的EXPLAIN QUERY PLAN结果"""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    engine = db_session.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        query.all()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    statement, parameters = statements[-1]
+    rows = db_session.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+    return [row[-1] for row in rows]
+
+def test_hot_queries_use_indexes(db_session):
+    """测试高频查询都走索引：不全表扫描，排序不使用临时B树"""
+    from app.models.user import User
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    queries = {
+        'tasks by context': Task.query.filter_by(context_id='ctx').order_by(Task.start_time),
+        'recent tasks': Task.query.filter(Task.end_time > week_ago),
+        'device by id': Device.query.filter_by(device_id='test_device_001'),
+        'user by api key': User.query.filter_by(api_key='key'),
+    }
+    # 任务列表的每个键集查询段：首页，以及游标落在未开始/已开始任务上的后续页
+    lists = {
+        'task list': Task.query,
+        'tasks by user': Task.query.filter_by(user_id=1),
+        'tasks by device': Task.query.filter_by(device_id='test_device_001'),
+    }
+    for name, query in lists.items():
+        for cursor in (None, (None, 100), (week_ago, 100)):
+            for index, (condition, order) in enumerate(keyset_segments(Task.start_time, Task.id, cursor)):
+                queries[f'{name} {cursor} #{index}'] = query.filter(condition).order_by(*order).limit(51)
+    for name, query in queries.items():
+        plan = query_plan(db_session, query)
+        assert not any(d.startswith('SCAN ') and 'INDEX' not in d for d in plan), (name, plan)
+        assert not any('TEMP B-TREE' in d for d in plan), (name, plan)
+
+def test_add_db_indexes_creates_missing_indexes(db_session):
+    """测试为已有的表补建缺少的索引，重复执行不再创建"""
+    with db_session.engine.begin() as connection:
+        connection.exec_driver_sql('DROP INDEX ix_task_end_time')
+        connection.exec_driver_sql('DROP INDEX ix_device_status')
+    assert add_db_indexes() == ['ix_device_status', 'ix_task_end_time']
+    assert add_db_indexes() == []
+
+def test_add_db_indexes_skips_columns_missing_from_legacy_tables(tmp_path):
+    """测试旧库的表缺少索引列时跳过该索引而不是报错，其他索引照常创建"""
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE task (id INTEGER PRIMARY KEY, device_id VARCHAR(100), user_input TEXT, status VARCHAR(20))'
+        )
+        connection.exec_driver_sql('CREATE TABLE device (id INTEGER PRIMARY KEY, device_id VARCHAR(64), status VARCHAR(7))')
+    assert add_db_indexes(engine) == ['ix_device_status']
+    engine.dispose()
@@ -0,0 +1,68 @@
+import random
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import ActionType, AutomationService
+from app.services.retry_policy import RetryBudget, RetryEngine, RetryPolicy
+from app.utils.exceptions import AutomationError, DeviceError
+from tests.fakes import connect_fake_device
+
+NO_DELAY = RetryPolicy(max_attempts=3, base_delay=0, jitter=0)
+
+def test_backoff_and_policy_selection():
+    """测试指数退避带抖动，错误类型策略优先于动作类型策略"""
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0, jitter=0.5)
+    rng = random.Random(1)
+    delays = [policy.delay(retry, rng) for retry in (1, 2, 3, 4)]
+    assert 0.25 <= delays[0] <= 0.5 and 0.5 <= delays[1] <= 1.0
+    assert 1.5 <= delays[3] <= 3.0
+
+    engine = RetryEngine(
+        default=NO_DELAY,
+        action_policies={'assert': RetryPolicy(max_attempts=1)},
+        error_policies={'DeviceError': RetryPolicy(max_attempts=1)}
+    )
+    try:
+        try:
+            raise DeviceError("adb offline")
+        except DeviceError:
+            # 处理函数把底层异常包装为AutomationError
+            raise AutomationError("Click operation failed")
+    except AutomationError as wrapped:
+        assert engine.policy_for('click', wrapped).max_attempts == 1
+    assert engine.policy_for('assert').max_attempts == 1
+    assert engine.policy_for('click', AutomationError("not found")) is NO_DELAY
+
+@pytest.mark.asyncio
+async def test_nested_failure_retried_only_at_leaf():
+    """测试嵌套组合动作中的失败只在叶子动作上重试，并计入任务预算"""
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    service.retry_engine = RetryEngine(default=NO_DELAY)
+    failing_input = AsyncMock(side_effect=RuntimeError("input method crashed"))
+    service._handlers[ActionType.INPUT] = failing_input
+    budget = RetryBudget(60)
+    nested = {'type': 'input', 'params': {'text': 'hello'}}
+    for _ in range(3):
+        nested = {'type': 'sequence', 'params': {'actions': [nested]}}
+    try:
+        await service.connect_device('fake-001')
+        with pytest.raises(AutomationError):
+            await service.execute_plan('fake-001', [nested], budget)
+        assert failing_input.call_count == 3
+        assert budget.retries == 2
+    finally:
+        service.device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_stops_retries():
+    """测试重试预算用尽后不再重试"""
+    engine = RetryEngine(default=RetryPolicy(max_attempts=5, base_delay=10, jitter=0))
+    attempt = AsyncMock(side_effect=RuntimeError("flaky"))
+    budget = RetryBudget(1)
+
+    with pytest.raises(RuntimeError):
+        await engine.run('click', attempt, budget)
+    assert attempt.call_count == 1 and budget.retries == 0
@@ -0,0 +1,147 @@
+import asyncio
+import pytest
+from functools import partial
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from app.services.automation_service import AutomationService
+from app.services.scheduler import DevicePool, TaskScheduler
+from app.utils.exceptions import DeviceError
+from tests.fakes import connect_fake_device
+
+@pytest.mark.asyncio
+async def test_lease_is_exclusive_and_queued_per_device():
+    """测试同一设备同时只租给一个任务，其他任务排队等待"""
+    pool = DevicePool()
+    pool.register('phone-1')
+
+    first = await pool.acquire(1, device_id='phone-1')
+    waiting = asyncio.ensure_future(pool.acquire(2, device_id='phone-1'))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    assert pool.get_stats()['queue_length'] == 1
+
+    pool.release(first)
+    second = await asyncio.wait_for(waiting, 1)
+    assert second.task_id == 2
+    assert pool.get_stats()['utilisation'] == 1.0
+
+@pytest.mark.asyncio
+async def test_unpinned_task_placed_on_matching_idle_device():
+    """测试未指定设备的任务分配到满足能力要求的空闲设备"""
+    pool = DevicePool()
+    pool.register('ios-1', {'supports_touch': False})
+    pool.register('android-1', {'supports_touch': True})
+    pool.register('android-2', {'supports_touch': True})
+
+    first = await pool.acquire(1, requirements={'supports_touch': True})
+    second = await pool.acquire(2, requirements={'supports_touch': True})
+    assert {first.device_id, second.device_id} == {'android-1', 'android-2'}
+
+    with pytest.raises(asyncio.TimeoutError):
+        await pool.acquire(3, requirements={'supports_touch': True}, timeout=0.05)
+    assert pool.get_stats()['queue_length'] == 0
+
+@pytest.mark.asyncio
+async def test_per_user_limit_does_not_block_other_users():
+    """测试单用户并发上限只限制该用户，不阻塞其他用户"""
+    pool = DevicePool(max_tasks_per_user=1)
+    for index in range(3):
+        pool.register(f'phone-{index}')
+
+    await pool.acquire(1, user_id=7)
+    blocked = asyncio.ensure_future(pool.acquire(2, user_id=7))
+    other = await asyncio.wait_for(pool.acquire(3, user_id=8), 1)
+    await asyncio.sleep(0)
+
+    assert other.user_id == 8
+    assert not blocked.done()
+    blocked.cancel()
+
+def test_scheduler_fails_over_on_device_error():
+    """测试设备故障时任务转移到另一台设备，故障设备被标记"""
+    attempts = []
+
+    async def runner(task_id, device_id, can_failover):
+        attempts.append((device_id, can_failover))
+        if device_id == 'broken':
+            raise DeviceError("adb offline")
+
+    pool = DevicePool(unhealthy_cooldown=0)
+    scheduler = TaskScheduler(pool, runner)
+    try:
+        scheduler.sync_devices([
+            SimpleNamespace(device_id='broken', capabilities={}),
+            SimpleNamespace(device_id='healthy', capabilities={})
+        ])
+        scheduler.submit(1).result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+    assert attempts == [('broken', True), ('healthy', True)]
+    assert not pool.is_idle('broken')
+    assert pool.is_idle('healthy')
+
+def test_pinned_task_does_not_fail_over():
+    """测试指定设备的任务在设备故障时直接失败"""
+    async def runner(task_id, device_id, can_failover):
+        assert not can_failover
+        raise DeviceError("adb offline")
+
+    scheduler = TaskScheduler(DevicePool(unhealthy_cooldown=0), runner)
+    try:
+        with pytest.raises(DeviceError):
+            scheduler.submit(1, device_id='phone-1').result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+def test_pool_reads_run_on_scheduler_loop():
+    """测试其他线程读取设备池时在调度循环上执行，能看到刚提交登记的设备"""
+    async def runner(task_id, device_id, can_failover):
+        await asyncio.sleep(0.05)
+
+    scheduler = TaskScheduler(DevicePool(), runner)
+    try:
+        scheduler.sync_devices([SimpleNamespace(device_id=f'phone-{index}', capabilities={}) for index in range(50)])
+        assert scheduler.is_idle('phone-49')
+        future = scheduler.submit(1, device_id='phone-0')
+        assert scheduler.call(lambda: scheduler.pool.get_stats()['devices']) == 50
+        future.result(timeout=5)
+        stats = scheduler.get_stats()
+        assert stats['devices'] == 50 and stats['leased'] == 0
+    finally:
+        scheduler.shutdown()
+
+def test_device_dropping_mid_plan_fails_over():
+    """测试设备在计划执行中途断开时抛出DeviceError，任务转移到另一台设备重新执行"""
+    service = AutomationService(llm_service=AsyncMock(), connector=partial(connect_fake_device, latency_scale=0))
+    plan = [
+        {'type': 'click', 'params': {'target': '设置'}},
+        {'type': 'click', 'params': {'target': 'WLAN'}}
+    ]
+    attempts = []
+
+    async def runner(task_id, device_id, can_failover):
+        attempts.append(device_id)
+        await service.connect_device(device_id)
+
+        def drop_first_device(node, elapsed, error):
+            if device_id == 'fake-a':
+                service.devices[device_id].offline = True
+
+        await service.execute_plan(device_id, plan, step_hook=drop_first_device)
+
+    pool = DevicePool(unhealthy_cooldown=0)
+    scheduler = TaskScheduler(pool, runner)
+    try:
+        scheduler.sync_devices([
+            SimpleNamespace(device_id='fake-a', capabilities={}),
+            SimpleNamespace(device_id='fake-b', capabilities={})
+        ])
+        scheduler.submit(1).result(timeout=10)
+    finally:
+        scheduler.shutdown()
+        service.device_io.shutdown()
+
+    assert attempts == ['fake-a', 'fake-b']
+    assert service.devices['fake-b'].screen_name == 'wlan'
+    assert not pool.is_idle('fake-a')
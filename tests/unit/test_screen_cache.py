@@ -0,0 +1,59 @@
+from PIL import ImageDraw
+from app.services.screen_cache import ScreenStateCache, dhash, hamming_distance
+from tests.fakes.u2_device import FakeU2Device
+
+LOCATION = {'found': True, 'confidence': 0.95, 'box': [40, 300, 1040, 450]}
+
+def screenshot(device, screen_name):
+    device.screen_name = screen_name
+    return device.screenshot()
+
+def test_slightly_changed_screen_hits_cache():
+    """测试同一屏幕的细微变化（状态栏时间、光标）仍命中缓存"""
+    device = FakeU2Device(latency_scale=0)
+    image = screenshot(device, 'settings')
+    changed = image.copy()
+    draw = ImageDraw.Draw(changed)
+    draw.rectangle((900, 10, 1060, 60), fill=(0, 0, 0))  # 状态栏时间
+    draw.rectangle((300, 330, 304, 420), fill=(20, 20, 20))  # 光标
+
+    assert 0 < hamming_distance(dhash(image), dhash(changed)) <= 8
+    cache = ScreenStateCache(max_distance=8)
+    cache.store(device.serial, dhash(image), 'WLAN', LOCATION)
+    assert cache.lookup(device.serial, dhash(changed), 'WLAN') == LOCATION
+    assert cache.lookup(device.serial, dhash(changed), '蓝牙') is None
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 1
+
+def test_different_screen_misses_cache():
+    """测试切换到其他屏幕后不使用旧屏幕上的元素位置"""
+    device = FakeU2Device(latency_scale=0)
+    settings = dhash(screenshot(device, 'settings'))
+    cache = ScreenStateCache(max_distance=8)
+    cache.store(device.serial, settings, 'WLAN', LOCATION)
+
+    # dHash比较的是亮度梯度（布局），布局不同的屏幕距离超出阈值
+    for screen_name in ('settings_more', 'browser', 'home'):
+        other = dhash(screenshot(device, screen_name))
+        assert hamming_distance(settings, other) > 8
+        assert cache.lookup(device.serial, other, 'WLAN') is None
+    # 其他设备上的同一屏幕也不共用缓存
+    assert cache.lookup('fake-0002', settings, 'WLAN') is None
+
+def test_invalidate_and_ttl():
+    """测试按设备清除缓存，过期的屏幕状态不再命中"""
+    device = FakeU2Device(latency_scale=0)
+    settings = dhash(screenshot(device, 'settings'))
+    cache = ScreenStateCache()
+    cache.store('a', settings, 'WLAN', LOCATION)
+    cache.store('b', settings, 'WLAN', LOCATION)
+
+    cache.invalidate('a')
+    assert cache.lookup('a', settings, 'WLAN') is None
+    assert cache.lookup('b', settings, 'WLAN') == LOCATION
+    cache.invalidate()
+    assert cache.get_stats()['devices'] == 0
+
+    expired = ScreenStateCache(ttl=0)
+    expired.store('a', settings, 'WLAN', LOCATION)
+    assert expired.lookup('a', settings, 'WLAN') is None
+    assert expired.get_stats()['screens'] == 0
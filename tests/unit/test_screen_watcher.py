@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.config import Config
+from app.services.automation_service import AutomationService
+from app.services.screen_watcher import ScreenWatcher
+from app.utils.exceptions import AutomationError
+from tests.fakes import connect_fake_device
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Config, 'SCREEN_WATCH_INTERVAL', 0.01)
+    monkeypatch.setattr(Config, 'SCREEN_SETTLE_TIME', 0.05)
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0)
+    )
+    yield service
+    service.device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_watcher_detects_change_and_settle():
+    """测试窗口摘要变化时唤醒等待方，摘要稳定后视为界面稳定"""
+    frames = iter(['a', 'a', 'b', 'c', 'c', 'c'])
+    last = ['a']
+
+    async def dump():
+        last[0] = next(frames, last[0])
+        return last[0]
+
+    watcher = ScreenWatcher(dump, interval=0.01, settle=0.05)
+    version = await watcher.poll()
+    assert await watcher.wait_for_change(version, timeout=1)
+    assert await watcher.wait_settled(timeout=1)
+    assert watcher.version == 2
+    assert not await watcher.wait_for_change(timeout=0.05)
+
+@pytest.mark.asyncio
+async def test_wait_wakes_when_target_appears(service):
+    """测试等待目标元素时屏幕一变化就返回，不必等到超时"""
+    await service.connect_device('fake-001')
+    device = service.devices['fake-001']
+    threading.Timer(0.1, lambda: device(text='设置').click()).start()
+
+    started = time.monotonic()
+    await service.execute_action('fake-001', {'type': 'wait', 'params': {'target': 'WLAN', 'timeout': 5}})
+    assert time.monotonic() - started < 1
+    assert device.calls['exists'] == 0
+
+@pytest.mark.asyncio
+async def test_wait_without_target_keeps_plan_duration(service):
+    """测试不指定目标的等待仍等满计划中的时长，界面早已稳定也不提前结束"""
+    await service.connect_device('fake-001')
+    started = time.monotonic()
+    await service.execute_action('fake-001', {'type': 'wait', 'params': {'timeout': 1}})
+    assert time.monotonic() - started >= 1
+
+@pytest.mark.asyncio
+async def test_loop_stops_when_screen_stops_changing(service):
+    """测试until循环在屏幕不再变化时提前结束，而不是跑满最大次数"""
+    scroll_to_about = {'type': 'loop', 'params': {
+        'action': {'type': 'swipe', 'params': {'direction': 'up', 'duration': 0.0}},
+        'until': {'type': 'assert', 'params': {'target': '关于手机', 'condition': 'exists'}}
+    }}
+    await service.connect_device('fake-001')
+    device = service.devices['fake-001']
+    await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '设置'}})
+    await service.execute_action('fake-001', scroll_to_about)
+    assert device.screen_name == 'settings_more' and device.calls['swipe'] == 1
+
+    await service.execute_action('fake-001', {'type': 'home', 'params': {}})
+    await service.execute_action('fake-001', {'type': 'click', 'params': {'target': '浏览器'}})
+    with pytest.raises(AutomationError, match="stopped making progress"):
+        await service.execute_action('fake-001', scroll_to_about)
+    assert device.calls['swipe'] == 1 + Config.LOOP_MAX_IDLE_ITERATIONS
@@ -0,0 +1,46 @@
+import pytest
+from app.services.screenshot import ScreenshotPipeline
+from tests.fakes.u2_device import FakeU2Device
+
+def browser_icon(device):
+    return device.screens['home'].find(text='浏览器').bounds
+
+def test_downscaled_box_maps_back_to_device():
+    """测试缩小后的截图上的边界框映射回设备坐标"""
+    device = FakeU2Device(latency_scale=0)
+    screen = ScreenshotPipeline(max_edge=1280).capture(device)
+    assert screen.device_size == (1080, 2340) and screen.size == (591, 1280)
+
+    bounds = browser_icon(device)
+    box = [value * screen.scale for value in bounds]
+    assert screen.to_device_box(box) == pytest.approx(bounds, abs=0.1)
+    # 未缩放的截图坐标不变
+    full = ScreenshotPipeline(max_edge=0).capture(device)
+    assert full.to_device_box(list(bounds)) == list(bounds)
+
+def test_cropped_box_maps_back_with_origin():
+    """测试裁剪并缩放后的区域上的边界框加上区域原点映射回设备坐标"""
+    device = FakeU2Device(latency_scale=0)
+    pipeline = ScreenshotPipeline(max_edge=1280)
+    screen = pipeline.capture(device)
+    crop = pipeline.crop(screen, (0, 234, 1080, 2106), max_edge=640)
+    assert crop.origin == (0, 234) and crop.device_size == (1080, 1872)
+    assert max(crop.size) == 640
+
+    bounds = browser_icon(device)
+    box = [(value - (0, 234)[i % 2]) * crop.scale for i, value in enumerate(bounds)]
+    assert crop.to_device_box(box) == pytest.approx(bounds, abs=0.5)
+
+def test_boxes_and_regions_are_clamped():
+    """测试越界的边界框截断到截图区域内，越界的裁剪区域截断到屏幕内"""
+    device = FakeU2Device(latency_scale=0)
+    pipeline = ScreenshotPipeline(max_edge=1280)
+    screen = pipeline.capture(device)
+    assert screen.to_device_box([-20, -5, 700, 1400]) == [0, 0, 1080, 2340]
+
+    crop = pipeline.crop(screen, (0, 234, 1080, 2106), max_edge=640)
+    assert crop.to_device_box([-10, -10, 10000, 10000]) == [0, 234, 1080, 2106]
+
+    edge = pipeline.crop(screen, (-100, 2000, 1200, 2600))
+    assert edge.origin == (0, 2000) and edge.device_size == (1080, 340)
+    assert edge.to_device_box([0, 0, edge.size[0], edge.size[1]]) == pytest.approx([0, 2000, 1080, 2340], abs=0.5)
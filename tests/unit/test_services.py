@@ -1,17 +1,16 @@
 import pytest
-from unittest.mock import Mock, patch
+from functools import partial
+from unittest.mock import AsyncMock, Mock, patch
+from app.models.device import Device, DeviceType
 from app.services.automation_service import AutomationService
 from app.services.llm_service import LLMService
 from app.utils.exceptions import DeviceError
+from tests.fakes import FakeDashScope, connect_fake_device
 
 @pytest.fixture
 def automation_service():
     return AutomationService()
 
-@pytest.fixture
-def llm_service():
-    return LLMService()
-
 @pytest.mark.asyncio
 async def test_connect_device(automation_service):
     """测试设备连接"""
@@ -26,26 +25,28 @@ async def test_connect_device(automation_service):
 @pytest.mark.asyncio
 async def test_execute_action(automation_service):
     """测试执行自动化操作"""
-    with patch.dict(automation_service.devices, {'test_device': Mock()}):
-        action = {
-            'type': 'click',
-            'params': {'text': 'Button'}
-        }
-        result = await automation_service.execute_action('test_device', action)
-        assert result is True
+    automation_service.connector = partial(connect_fake_device, latency_scale=0)
+    # 视觉模型找不到时按文本点击
+    automation_service.llm_service = AsyncMock()
+    automation_service.llm_service.analyze_image.return_value = {'found': False}
+    await automation_service.connect_device('test_device')
+    action = {
+        'type': 'click',
+        'params': {'target': '设置'}
+    }
+    result = await automation_service.execute_action('test_device', action)
+    assert result is True
 
 @pytest.mark.asyncio
-async def test_analyze_text_input(llm_service):
+async def test_analyze_text_input():
     """测试文本分析"""
-    with patch('aiohttp.ClientSession.post') as mock_post:
-        mock_post.return_value.__aenter__.return_value.json.return_value = {
-            'output': {
-                'choices': [{
-                    'message': {'content': 'Click Button A\nInput Text'}
-                }]
-            }
-        }
-        
-        result = await llm_service.analyze_text_input('test input')
-        assert isinstance(result, list)
-        assert len(result) > 0 
\ No newline at end of file
+    plan = [
+        {'type': 'click', 'params': {'target': 'Button A'}},
+        {'type': 'input', 'params': {'text': 'Input Text'}}
+    ]
+    async with FakeDashScope(plans={'test input': plan}) as server:
+        llm_service = LLMService(base_url=server.base_url)
+        result = await llm_service.analyze_text_input('test input', Device('test_device', device_type=DeviceType.ANDROID))
+        await llm_service.close()
+    assert isinstance(result, list)
+    assert len(result) > 0
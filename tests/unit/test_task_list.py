@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models.task import Task, TaskStatus
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_rows
+
+def test_cursor_round_trip():
+    """测试游标编码后可还原，格式错误时抛出ValueError"""
+    started = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    assert decode_cursor(encode_cursor(started, 42)) == (started, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    for cursor in ('not-a-cursor', encode_cursor(started, 1)[:-3], 'WyJ4Il0'):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+def test_keyset_pages_cover_all_tasks_once(db_session):
+    """测试按(start_time, id)翻页不重复、不遗漏，未开始的任务在最前，同一时间开始的任务按id排序"""
+    base = datetime(2024, 5, 1)
+    times = [None, base, base, base + timedelta(minutes=1), None, base, base + timedelta(minutes=2)]
+    for start_time in times:
+        db_session.session.add(Task(user_input='打开设置', start_time=start_time))
+    db_session.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = list(keyset_rows(Task.query, Task.start_time, Task.id, cursor, limit=3))
+        seen.extend(task.id for task in page)
+        if len(page) < 3:
+            break
+        cursor = decode_cursor(encode_cursor(page[-1].start_time, page[-1].id))
+
+    assert seen == [5, 1, 7, 4, 6, 3, 2]
+
+def test_to_dict_only_includes_requested_fields():
+    """测试to_dict按fields只计算指定字段"""
+    task = Task(id=3, user_input='打开设置', status=TaskStatus.PENDING, execution_steps=[{'type': 'click'}])
+    assert task.to_dict(['id', 'status']) == {'id': 3, 'status': 'pending'}
+    assert set(Task.FIELDS) - set(Task.HEAVY_FIELDS) >= {'id', 'status', 'start_time'}
+
+def test_get_tasks_pages_filters_and_projects(client, test_user, db_session):
+    """测试任务列表接口：按游标翻页、按状态过滤、默认不返回大字段"""
+    base = datetime(2024, 5, 1)
+    for minute in range(5):
+        db_session.session.add(Task(
+            user_id=test_user.id, user_input='打开设置', start_time=base + timedelta(minutes=minute),
+            status=TaskStatus.COMPLETED if minute % 2 else TaskStatus.FAILED, execution_steps=[{'type': 'home'}]
+        ))
+    db_session.session.add(Task(user_id=test_user.id + 1, user_input='其他用户的任务'))
+    db_session.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(test_user.id)
+
+    first = client.get('/api/tasks?limit=3').get_json()
+    assert [task['start_time'][-5:-3] for task in first['items']] == ['04', '03', '02']
+    assert 'execution_steps' not in first['items'][0] and first['next_cursor']
+    second = client.get(f"/api/tasks?limit=3&cursor={first['next_cursor']}").get_json()
+    assert len(second['items']) == 2 and second['next_cursor'] is None
+
+    completed = client.get('/api/tasks?status=completed&fields=id,status').get_json()
+    assert [set(task) for task in completed['items']] == [{'id', 'status'}] * 2
+    assert client.get('/api/tasks?fields=password').status_code == 400
+    assert client.get('/api/tasks?cursor=bad').status_code == 400
@@ -0,0 +1,93 @@
+import asyncio
+import time
+import pytest
+from functools import partial
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from app.config import Config
+from app.services.automation_service import AutomationService
+from app.services.scheduler import DevicePool, TaskScheduler
+from app.services.task_prestart import TaskPrestart, first_launch, predict_launch
+from tests.fakes import connect_fake_device
+
+@pytest.fixture
+def service():
+    service = AutomationService(
+        llm_service=AsyncMock(),
+        connector=partial(connect_fake_device, latency_scale=0.2)
+    )
+    yield service
+    service.device_io.shutdown()
+
+def test_predict_launch_from_instruction():
+    """测试从指令开头的应用名预测第一步要启动的应用"""
+    assert predict_launch('打开微信，找到张三发送"在吗？"', Config.APP_PACKAGES) == 'com.tencent.mm'
+    assert predict_launch('请打开 设置 里的WLAN', Config.APP_PACKAGES) == 'com.android.settings'
+    assert predict_launch('给张三发微信', Config.APP_PACKAGES) is None
+    assert first_launch([{'type': 'launch_app', 'params': {'package': 'com.tencent.mm'}}]) == 'com.tencent.mm'
+    assert first_launch([{'type': 'click', 'params': {'target': '设置'}}]) is None
+
+@pytest.mark.asyncio
+async def test_prestart_overlaps_planning_and_keeps_predicted_app(service):
+    """测试规划期间完成连接、预热和提前启动，计划命中时保留"""
+    async def plan():
+        await asyncio.sleep(0.8)
+        return [
+            {'type': 'launch_app', 'params': {'package': 'com.android.settings'}},
+            {'type': 'click', 'params': {'target': 'WLAN'}}
+        ]
+
+    started = time.monotonic()
+    prestart = TaskPrestart(service, 'fake-001', 'com.android.settings').start()
+    assert await prestart.reconcile(await plan())
+    assert time.monotonic() - started < 1.0
+
+    device = service.devices['fake-001']
+    assert device.screen_name == 'settings'
+    assert service.hierarchy_cache.get('fake-001') is not None
+    assert device.calls['screenshot'] == 1
+
+@pytest.mark.asyncio
+async def test_prestart_rolls_back_when_plan_disagrees(service):
+    """测试计划第一步与预测不一致或规划失败时回滚提前启动的应用"""
+    prestart = TaskPrestart(service, 'fake-001', 'com.android.settings').start()
+    assert not await prestart.reconcile([
+        {'type': 'launch_app', 'params': {'package': 'com.android.browser'}}
+    ])
+    device = service.devices['fake-001']
+    assert device.screen_name == 'home' and device.calls['app_stop'] == 1
+
+    prestart = TaskPrestart(service, 'fake-001', 'com.android.settings').start()
+    await asyncio.sleep(0.15)
+    await prestart.abort()
+    assert device.screen_name == 'home' and device.calls['app_stop'] == 2
+
+def test_reconcile_runs_in_background_before_task_executes(service):
+    """测试规划后的预热收尾交给调度循环，请求不等待；任务执行前等待其完成"""
+    events = []
+
+    async def runner(task_id, device_id, can_failover):
+        events.append(('execute', service.devices[device_id].screen_name))
+
+    scheduler = TaskScheduler(DevicePool(), runner)
+    plan = [{'type': 'launch_app', 'params': {'package': 'com.android.browser'}}]
+
+    async def request():
+        # 与创建任务的请求相同：预热在调度循环上开始，规划后把收尾登记到任务上即返回
+        prestart = scheduler.call(TaskPrestart(service, 'fake-001', 'com.android.settings').start)
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        future = scheduler.prepare(1, prestart.reconcile(plan))
+        future.add_done_callback(lambda f: events.append(('reconciled', None)))
+        return time.monotonic() - started
+
+    try:
+        scheduler.sync_devices([SimpleNamespace(device_id='fake-001', capabilities={})])
+        assert asyncio.run(request()) < 0.05  # 请求的事件循环已结束，预热仍在进行
+        scheduler.submit(1, device_id='fake-001').result(timeout=10)
+    finally:
+        scheduler.shutdown()
+
+    # 预测的应用与计划不一致，执行前已回滚
+    assert events == [('reconciled', None), ('execute', 'home')]
+    assert service.devices['fake-001'].calls['app_stop'] == 1
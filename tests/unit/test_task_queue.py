@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from app.models.task import Task, TaskStatus
+from app.models.task_job import JobStatus, TaskJob
+from app.services.task_queue import TaskQueue
+
+def make_tasks(db_session, count):
+    tasks = [Task(user_input=f'任务{index}') for index in range(count)]
+    db_session.session.add_all(tasks)
+    db_session.session.commit()
+    return tasks
+
+def expire(job_id):
+    """模拟worker失联：可见性超时已过"""
+    TaskJob.query.filter_by(id=job_id).update({TaskJob.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+
+def test_claim_orders_by_priority_and_never_hands_out_twice(db_session):
+    """测试按优先级领取，同一任务不会被两个worker同时领取"""
+    queue = TaskQueue(priorities={'high': 10, 'normal': 0, 'low': -10})
+    low, normal, high = make_tasks(db_session, 3)
+    queue.enqueue(low.id, priority=queue.priority_of('low'))
+    queue.enqueue(normal.id)
+    queue.enqueue(high.id, priority=queue.priority_of('high'))
+
+    first = queue.claim('worker-a', limit=2)
+    second = queue.claim('worker-b', limit=2)
+    assert [job.task_id for job in first] == [high.id, normal.id]
+    assert [job.task_id for job in second] == [low.id]
+    assert queue.claim('worker-c', limit=2) == []
+    assert queue.get_stats()['jobs']['running'] == 3
+
+    queue.complete(first[0].id, 'worker-a')
+    queue.complete(first[0].id, 'worker-b')  # 非领取者的确认被忽略
+    assert TaskJob.query.get(first[0].id).status == JobStatus.DONE
+
+def test_orphaned_jobs_are_requeued_until_attempts_run_out(db_session):
+    """测试worker失联后任务被其他worker重新领取，超过最多尝试次数后标记失败"""
+    queue = TaskQueue(visibility_timeout=60, max_attempts=2)
+    task, = make_tasks(db_session, 1)
+    job = queue.enqueue(task.id)
+
+    assert [j.id for j in queue.claim('worker-a')] == [job.id]
+    assert queue.heartbeat('worker-a', [job.id]) == []
+    expire(job.id)
+    assert [j.id for j in queue.claim('worker-b')] == [job.id]
+    # 原worker续期时发现任务已被接管
+    assert queue.heartbeat('worker-a', [job.id]) == [job.id]
+
+    expire(job.id)
+    assert queue.claim('worker-c') == []
+    job = TaskJob.query.get(job.id)
+    assert job.status == JobStatus.FAILED and job.attempts == 3
+    assert Task.query.get(task.id).status == TaskStatus.FAILED
+
+def test_release_returns_job_without_counting_attempt(db_session):
+    """测试worker停止时交还的任务可立即被领取，且不计入尝试次数"""
+    queue = TaskQueue()
+    task, = make_tasks(db_session, 1)
+    job = queue.enqueue(task.id)
+
+    queue.claim('worker-a')
+    queue.release(job.id, 'worker-a')
+    claimed, = queue.claim('worker-b')
+    assert claimed.id == job.id and claimed.attempts == 1 and claimed.locked_by == 'worker-b'
+
+def test_device_busy_sees_jobs_claimed_by_any_worker(db_session):
+    """测试按队列判断设备是否被占用：领取了指定设备的任务，或未指定设备的任务已在该设备上执行"""
+    queue = TaskQueue()
+    pinned, unpinned, done = make_tasks(db_session, 3)
+    queue.enqueue(pinned.id, device_id='device-a')
+    queue.enqueue(unpinned.id)
+    assert not queue.device_busy('device-a')
+
+    first, second = queue.claim('worker-a', limit=2)
+    assert queue.device_busy('device-a') and not queue.device_busy('device-b')
+    unpinned.device_id = 'device-b'
+    unpinned.start_execution()
+    assert queue.device_busy('device-b')
+
+    queue.complete(first.id, 'worker-a')
+    queue.complete(second.id, 'worker-a')
+    assert not queue.device_busy('device-a') and not queue.device_busy('device-b')
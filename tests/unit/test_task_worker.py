@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from app.models.task import Task
+from app.models.task_job import JobStatus, TaskJob
+from app.services.task_queue import TaskQueue
+from app.services.task_worker import TaskWorker
+
+class RecordingScheduler:
+    """记录提交的任务及所在线程，立即完成"""
+
+    def __init__(self):
+        self.threads = []
+
+    def sync_devices(self, devices):
+        pass
+
+    def submit(self, task_id, **kwargs):
+        self.threads.append(threading.current_thread())
+        future = Future()
+        future.set_result(None)
+        return future
+
+def test_worker_thread_polls_off_the_callers_loop(app, db_session):
+    """测试start_thread()在单独线程的事件循环上领取任务，调用方的事件循环不被同步的数据库操作阻塞"""
+    queue = TaskQueue()
+    task = Task(user_input='打开设置')
+    db_session.session.add(task)
+    db_session.session.commit()
+    job = queue.enqueue(task.id)
+    scheduler = RecordingScheduler()
+    worker = TaskWorker(app, queue, scheduler, poll_interval=0.01)
+
+    async def serve():
+        thread = worker.start_thread()
+        assert thread is not threading.current_thread() and thread.is_alive()
+        deadline = time.monotonic() + 5
+        while not scheduler.threads and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(worker.stop_thread, 5)
+        return thread
+
+    thread = asyncio.run(serve())
+    assert scheduler.threads == [thread] and not thread.is_alive()
+    db_session.session.expire_all()
+    assert TaskJob.query.get(job.id).status == JobStatus.DONE
+    worker.stop_thread()  # 重复停止无副作用
@@ -0,0 +1,89 @@
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock
+from app.services.automation_service import AVAILABLE_ACTIONS, COMPOSITE_ACTIONS, AutomationService, plan_lookahead
+from app.services.llm_service import LLMService
+from app.services.plan_compiler import PlanCompiler
+from app.services.screenshot import ScreenshotPipeline
+from app.utils.cache import llm_cache
+from tests.fakes import FakeDashScope, FakeElementSpec, FakeScreen, connect_fake_device
+
+FAVORITE_ICON = (740, 40, 860, 160)
+SEARCH_ICON = (900, 40, 1040, 160)
+
+def icon_screens():
+    """两个没有文字的图标，收藏不跳转，搜索跳转到搜索页"""
+    return {
+        'home': FakeScreen('home', 'com.example.shop', '.Main', [
+            FakeElementSpec('', FAVORITE_ICON, class_name='android.widget.ImageView'),
+            FakeElementSpec('', SEARCH_ICON, class_name='android.widget.ImageView', goto='search')
+        ]),
+        'search': FakeScreen('search', 'com.example.shop', '.Search', [], background=(200, 220, 240))
+    }
+
+def test_plan_lookahead_stops_at_screen_change():
+    """测试向后查看只收集点击目标，在第一个点击或必然切换屏幕的动作处停止"""
+    compiler = PlanCompiler(AVAILABLE_ACTIONS, COMPOSITE_ACTIONS)
+    steps = compiler.compile_plan([
+        {'type': 'input', 'params': {'text': 'hello'}},
+        {'type': 'click', 'params': {'target': '搜索'}},
+        {'type': 'click', 'params': {'target': '第一个结果'}}
+    ])
+    # 点击之后通常已是另一个屏幕
+    assert plan_lookahead(steps, limit=3) == ['搜索']
+    assert plan_lookahead(steps[1:], limit=3) == ['搜索']
+    assert plan_lookahead(steps[2:], limit=3) == ['第一个结果']
+
+    steps = compiler.compile_plan([
+        {'type': 'input', 'params': {'text': 'hello'}},
+        {'type': 'launch_app', 'params': {'package': 'com.android.settings'}},
+        {'type': 'click', 'params': {'target': 'WLAN'}}
+    ])
+    assert plan_lookahead(steps, limit=3) == []
+
+@pytest.mark.asyncio
+async def test_plan_locates_targets_on_same_screen_with_one_request():
+    """测试执行计划时同一屏幕上的多个目标只发起一次视觉请求"""
+    llm_service = AsyncMock()
+    llm_service.recognize_text.return_value = []
+    llm_service.analyze_image_batch.return_value = [
+        {'found': True, 'confidence': 0.9, 'box': list(FAVORITE_ICON), 'description': '收藏'},
+        {'found': True, 'confidence': 0.9, 'box': list(SEARCH_ICON), 'description': '搜索'}
+    ]
+    service = AutomationService(
+        llm_service=llm_service,
+        connector=partial(connect_fake_device, latency_scale=0, screens=icon_screens())
+    )
+    service.screenshot_pipeline = ScreenshotPipeline(max_edge=0)
+    try:
+        await service.connect_device('fake-001')
+        await service.execute_plan('fake-001', [
+            {'type': 'click', 'params': {'target': '收藏图标'}},
+            {'type': 'click', 'params': {'target': '搜索图标'}}
+        ])
+
+        assert service.devices['fake-001'].screen_name == 'search'
+        llm_service.analyze_image_batch.assert_called_once()
+        assert llm_service.analyze_image_batch.call_args.kwargs['targets'] == ['收藏图标', '搜索图标']
+        llm_service.analyze_image.assert_not_called()
+        assert service.lookahead == {}
+    finally:
+        service.device_io.shutdown()
+
+@pytest.mark.asyncio
+async def test_batch_results_are_validated_per_target():
+    """测试批量结果逐个校验，格式错误的目标不影响其他目标"""
+    def vision(target, query, size):
+        box = [10, 10, 50] if target == '坏' else [10, 10, 50, 50]
+        return {'found': True, 'confidence': 0.9, 'box': box, 'description': target}
+
+    llm_cache.l1.clear()
+    async with FakeDashScope(vision_handler=vision) as fake:
+        service = LLMService(base_url=fake.base_url)
+        try:
+            results = await service.analyze_image_batch('data:image/jpeg;base64,', ['好', '坏', '也好'])
+        finally:
+            await service.close()
+
+    assert [result['found'] for result in results] == [True, False, True]
+    assert len(fake.requests) == 1
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import logging
+import signal
+from app import create_app
+from app.config import Config
+from app.services.task_worker import TaskWorker
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+app = create_app()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='从持久化任务队列领取并执行任务，可启动多个进程横向扩展')
+    parser.add_argument('--concurrency', type=int, default=Config.TASK_WORKER_CONCURRENCY,
+                        help='同时执行的任务数')
+    parser.add_argument('--lane', action='append', choices=sorted(Config.TASK_QUEUE_PRIORITIES),
+                        help='只领取指定优先级通道的任务，可重复指定；默认领取全部')
+    parser.add_argument('--grace', type=float, default=30,
+                        help='停止时等待执行中任务的时间(秒)，超时的任务交还队列')
+    return parser.parse_args()
+
+async def shutdown():
+    """停止任务调度，释放LLM服务持有的HTTP连接池"""
+    from app.api.routes import llm_service, automation_service, task_scheduler
+    for service in (llm_service, automation_service.llm_service):
+        try:
+            await service.close()
+        except Exception as e:
+            logger.error(f"Failed to close LLM HTTP pool: {str(e)}")
+    task_scheduler.shutdown()
+
+async def main(args):
+    from app.api.routes import task_queue, task_scheduler
+
+    # 收到SIGINT/SIGTERM后停止领取新任务，等待执行中的任务
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows不支持add_signal_handler
+            pass
+
+    worker = TaskWorker(
+        app,
+        task_queue,
+        task_scheduler,
+        concurrency=args.concurrency,
+        poll_interval=Config.TASK_QUEUE_POLL_INTERVAL,
+        priorities=[task_queue.priority_of(lane) for lane in args.lane] if args.lane else None
+    )
+    try:
+        await worker.run(stop, grace=args.grace)
+    finally:
+        await shutdown()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        logger.info("Worker shutdown requested")